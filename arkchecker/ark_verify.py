@@ -0,0 +1,281 @@
+"""
+ark_verify.py
+Dependencies: requests, and the geometadataedit package (pip install -e
+geometadataedit) for its HTTP client, NOID client and ARK index.
+Description: Checks that every ARK in a directory of OGM Aardvark metadata is
+bound in NOID with a `where` pointing at its GeoDiscovery catalog page.
+NOID fetches run on a bounded thread pool over the pooled HTTP client, whose
+retry policy backs off on 429 and 5xx responses and dropped connections. By
+default nothing is changed and the report shows the ARKs whose `where` differs
+(a dry-run diff); with --apply a `bind set` is issued only for those ARKs. The
+report is written as CSV or JSON, chosen by the file extension. With
+--batch-size the fetches and binds are instead sent as multi-command POSTs
+through geometadataedit's NoidBatchClient, a few requests for the whole run.
+With --index the ARKs are read from a geometadataedit ark_index index, refreshed for the
+changed files only, and the `where` found for each ARK is stored back in it.
+
+Usage: python ark_verify.py DIR [--noid URL] [--workers N] [--apply] [--report FILE]
+"""
+
+import argparse
+import csv
+import json
+import logging
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+import requests
+
+from geometadataedit.ark_index import ArkIndex, iter_arks
+from geometadataedit.http_client import HttpClient, settings_from_env
+from geometadataedit.noid import NoidBatchClient, expected_where
+from geometadataedit.noid import NoidError as NoidBatchError
+
+NOID_PROD = "https://digilib-admin.uwm.edu/noidu_gmgs"
+WORKERS = 8
+
+NOID_LINE = re.compile(r"^([\w.-]+):\s*(.*)$")
+
+REPORT_FIELDS = ("ark", "file", "status", "current_where", "expected_where", "error")
+
+
+class NoidError(Exception):
+    pass
+
+
+class ArkRecord(NamedTuple):
+    ark: str
+    file: Path
+
+
+class ArkResult(NamedTuple):
+    ark: str
+    file: str
+    # ok, would-update, updated or error
+    status: str
+    current_where: Optional[str]
+    expected_where: str
+    error: Optional[str] = None
+
+
+def find_arks(directory: Path) -> List[ArkRecord]:
+    """Every ARK named in the dct_identifier_sm of the records under directory."""
+    return [ArkRecord(entry.ark, entry.file) for entry in iter_arks(directory)]
+
+
+def parse_noid_record(text: str) -> Dict[str, str]:
+    """The element: value lines of a NOID fetch response."""
+    elements = {}
+    for line in text.splitlines():
+        match = NOID_LINE.match(line.strip())
+        if match:
+            elements[match[1]] = match[2].strip()
+    return elements
+
+
+class NoidClient:
+    def __init__(self, base_url: str = NOID_PROD, http: Optional[HttpClient] = None):
+        self.base_url = base_url
+        self.http = http or HttpClient.from_config(settings_from_env())
+
+    def _get(self, command: str) -> str:
+        # NOID takes its command as a "+"-separated query string.
+        response = self.http.get(f"{self.base_url}?{command}")
+        if response.status_code != 200:
+            raise NoidError(f"NOID returned {response.status_code} for {command}")
+        if response.text.lstrip().lower().startswith("error"):
+            raise NoidError(f"NOID rejected {command}: {response.text.strip()}")
+        return response.text
+
+    def fetch(self, ark: str) -> Dict[str, str]:
+        # Example: ?fetch+77981/gmgs0c4sj3x
+        return parse_noid_record(self._get(f"fetch+{ark}"))
+
+    def bind_where(self, ark: str, where: str) -> None:
+        # Example: ?bind+set+77981/gmgs0c4sj3x+where+https://geodiscovery...
+        self._get(f"bind+set+{ark}+where+{where}")
+
+
+def verify_ark(noid: NoidClient, record: ArkRecord, apply: bool = False) -> ArkResult:
+    where = expected_where(record.ark)
+    current = None
+    try:
+        current = noid.fetch(record.ark).get("where")
+        if current == where:
+            status = "ok"
+        elif not apply:
+            status = "would-update"
+        else:
+            noid.bind_where(record.ark, where)
+            status = "updated"
+    except (NoidError, requests.RequestException) as e:
+        return ArkResult(record.ark, str(record.file), "error", current, where, str(e))
+    return ArkResult(record.ark, str(record.file), status, current, where)
+
+
+def verify_arks(
+    records: List[ArkRecord],
+    noid: NoidClient,
+    apply: bool = False,
+    workers: int = WORKERS,
+) -> List[ArkResult]:
+    """Verify records concurrently; results are in the order of records."""
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(
+            executor.map(lambda record: verify_ark(noid, record, apply), records)
+        )
+
+
+def verify_arks_batched(
+    records: List[ArkRecord], client: NoidBatchClient, apply: bool = False
+) -> List[ArkResult]:
+    """verify_arks() with every fetch, then every bind, in batched POSTs."""
+    try:
+        current, fetch_errors = client.fetch(
+            dict.fromkeys(record.ark for record in records)
+        )
+    except (NoidBatchError, requests.RequestException) as e:
+        return [
+            ArkResult(r.ark, str(r.file), "error", None, expected_where(r.ark), str(e))
+            for r in records
+        ]
+    differing = {
+        record.ark: {"where": expected_where(record.ark)}
+        for record in records
+        if record.ark in current
+        and current[record.ark].get("where") != expected_where(record.ark)
+    }
+    errors = {}
+    if apply and differing:
+        try:
+            errors = client.bind(differing)
+        except (NoidBatchError, requests.RequestException) as e:
+            errors = {ark: str(e) for ark in differing}
+    results = []
+    for record in records:
+        where = expected_where(record.ark)
+        status, error = "ok", None
+        if record.ark in fetch_errors:
+            # Only the ARKs NOID could not fetch fail; the rest of the batch stands.
+            status, error = "error", fetch_errors[record.ark]
+        elif record.ark in differing:
+            status = "would-update"
+            if apply:
+                error = errors.get(record.ark)
+                status = "error" if error else "updated"
+        results.append(
+            ArkResult(
+                record.ark,
+                str(record.file),
+                status,
+                current.get(record.ark, {}).get("where"),
+                where,
+                error,
+            )
+        )
+    return results
+
+
+def write_report(results: List[ArkResult], path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix.lower() == ".json":
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump([result._asdict() for result in results], file, indent=2)
+            file.write("\n")
+        return
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=REPORT_FIELDS)
+        writer.writeheader()
+        writer.writerows(result._asdict() for result in results)
+
+
+def bound_wheres(results: List[ArkResult]) -> Dict[str, Optional[str]]:
+    """The where each ARK is bound to after the run, for those that were read."""
+    wheres = {}
+    for result in results:
+        if result.status in ("ok", "updated"):
+            wheres[result.ark] = result.expected_where
+        elif result.status == "would-update":
+            wheres[result.ark] = result.current_where
+    return wheres
+
+
+def summarize(results: List[ArkResult]) -> Dict[str, int]:
+    counts = {"ok": 0, "would-update": 0, "updated": 0, "error": 0}
+    for result in results:
+        counts[result.status] += 1
+    return counts
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    arg_parser = argparse.ArgumentParser(
+        description="Verify that the ARKs of Aardvark records resolve to GeoDiscovery."
+    )
+    arg_parser.add_argument("directory", type=Path, help="Aardvark metadata directory")
+    arg_parser.add_argument("--noid", default=NOID_PROD, help="NOID binder URL")
+    arg_parser.add_argument("--workers", type=int, default=WORKERS)
+    arg_parser.add_argument(
+        "--apply",
+        action="store_true",
+        help="Bind the expected where for ARKs that differ (default: report only)",
+    )
+    arg_parser.add_argument("--report", type=Path, help="Write a .csv or .json report")
+    arg_parser.add_argument(
+        "--batch-size",
+        type=int,
+        help="Send fetches and binds as POSTs of up to this many NOID commands",
+    )
+    arg_parser.add_argument(
+        "--index", type=Path, help="Read ARKs from and record wheres in this index"
+    )
+    arg_parser.add_argument("--retries", type=int, help="Override HTTP_RETRIES")
+    arg_parser.add_argument("--backoff", type=float, help="Override HTTP_BACKOFF")
+    args = arg_parser.parse_args(argv)
+
+    settings = settings_from_env()
+    settings["pool_maxsize"] = max(args.workers, settings.get("pool_maxsize", 0))
+    if args.retries is not None:
+        settings["retries"] = args.retries
+    if args.backoff is not None:
+        settings["backoff_factor"] = args.backoff
+    http = HttpClient.from_config(settings)
+    index = None
+    if args.index:
+        index = ArkIndex(args.index)
+        index.update(args.directory)
+        records = [
+            ArkRecord(entry.ark, entry.file) for entry in index.entries(args.directory)
+        ]
+    else:
+        records = find_arks(args.directory)
+    if args.batch_size:
+        client = NoidBatchClient(args.noid, http, max_commands=args.batch_size)
+        results = verify_arks_batched(records, client, args.apply)
+    else:
+        noid = NoidClient(args.noid, http)
+        results = verify_arks(records, noid, args.apply, args.workers)
+    for result in results:
+        if result.status != "ok":
+            detail = (
+                result.error or f"{result.current_where} -> {result.expected_where}"
+            )
+            print(f"{result.ark}: {result.status}: {detail}")
+    counts = summarize(results)
+    print(", ".join(f"{count} {status}" for status, count in counts.items()))
+    if args.report:
+        write_report(results, args.report)
+    if index is not None:
+        index.set_wheres(bound_wheres(results))
+        index.close()
+    for line in http.metrics_lines():
+        print(line)
+    http.close()
+    return 1 if counts["error"] else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    sys.exit(main())
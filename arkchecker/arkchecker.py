@@ -1,20 +1,28 @@
 # This python file will loop through a directory of OGM Aardvark metadata
 # and check with NOID if the Ark ID is properly bound and redirected.
-import json
-import requests
-import re
+import sys
 
 from pathlib import Path
 
+# The pooled HTTP client, NOID client and ARK index come from the
+# geometadataedit package (pip install -e geometadataedit).
+from geometadataedit.ark_index import ARK_PATTERN, DEFAULT_INDEX, iter_arks
+from geometadataedit.http_client import HttpClient, settings_from_env
+
+import ark_verify
+
 # Constants
 AARDVARK_DIR = (
     r"C:\Users\srappel\Documents\GitHub\GeoDiscovery-Utils\uwm_fixture\Aardvark"
 )
 NOID_PROD = r"https://digilib-admin.uwm.edu/noidu_gmgs"
 
+# Every NOID fetch and bind reuses kept-alive connections to the binder.
+HTTP = HttpClient.from_config(settings_from_env())
+
 # Assertions
 # pip install pip_system_certs if receiving a SSL error.
-assert requests.get(NOID_PROD).status_code == 200
+assert HTTP.get(NOID_PROD).status_code == 200
 assert Path(AARDVARK_DIR).is_dir()
 
 
@@ -23,45 +31,23 @@ def searchForID(text) -> list:
     # Group 0 will be the whole string
     # Group 1 will be the *Name Assigning Authority Number*
     # Group 2 will be the *Assigned Name*
-    arkregex = re.compile(r"(\d{5})\/(\w{11})")
-    arkid = arkregex.search(text)
-    return arkid
+    return ARK_PATTERN.search(text)
 
 
 def listMetadata(dir) -> list[str]:
     dir = Path(dir)  # ensure is Path object
     assert dir.is_dir
 
-    mdlist = []
-    for mdfilePath in dir.rglob("*.json"):
-        with open(mdfilePath, "r", encoding="utf8") as mdfile:
-            md = json.load(mdfile)
-
-            assert md.__class__ == dict
-            assert len(md) > 0
-
-            # TODO, what if it doesnt have an identifier at all?
-            assert "dct_identifier_sm" in md
-
-            if len(md["dct_identifier_sm"]) > 1:
-                for identifier in md["dct_identifier_sm"]:
-                    match = searchForID(identifier)
-                    if match is not None:
-                        print(f"found a matching arkid in: {mdfilePath}")
-                        mdlist.append(match[0])
-                    else:
-                        print(f"did not find a matching arkid in: {mdfilePath}")
-            else:
-                mdlist.append(searchForID(md["dct_identifier_sm"][0])[0])
-
-    return mdlist
+    # ark_index.iter_arks reads one file at a time and logs files without an
+    # ARK instead of asserting; ArkIndex keeps the result between runs.
+    return [entry.ark for entry in iter_arks(dir)]
 
 
 # Fetch the current NOID data for the given ID
 def NOIDfetch(arkid) -> str:
     # Example: https://digilib-admin.uwm.edu/noidu_gmgs?fetch+77981/gmgs0c4sj3x
     fetchURL = NOID_PROD + "?fetch+" + arkid
-    fetch_r = requests.get(fetchURL)
+    fetch_r = HTTP.get(fetchURL)
 
     # TODO: Handle a non 200 status code
     assert fetch_r.status_code == 200
@@ -91,7 +77,7 @@ def whereEditor(arkid) -> str:
         NOID_PROD
         + f"?bind+set+{arkid[0]}+where+https://geodiscovery.uwm.edu/catalog/ark:-{arkid[1]}-{arkid[2]}"
     )
-    edit_r = requests.get(editURL)
+    edit_r = HTTP.get(editURL)
 
     # TODO: Handle a non 200 status code
     assert edit_r.status_code == 200
@@ -102,10 +88,19 @@ def whereEditor(arkid) -> str:
 if __name__ == "__main__":
     assert Path(AARDVARK_DIR).is_dir
 
-    for md_id in listMetadata(AARDVARK_DIR):
-        # Fetch the ID
-        arkid = searchForID(NOIDfetch(md_id))
-        editURL = whereEditor(arkid)
-        print(f"{md_id} complete!")
-        print(editURL)
-        print("-----------------------")
+    # ark_verify.py fetches and binds in batched POSTs and only binds ARKs
+    # whose where differs; run it directly for a dry-run report.
+    sys.exit(
+        ark_verify.main(
+            [
+                AARDVARK_DIR,
+                "--noid",
+                NOID_PROD,
+                "--apply",
+                "--batch-size",
+                "500",
+                "--index",
+                str(DEFAULT_INDEX),
+            ]
+        )
+    )
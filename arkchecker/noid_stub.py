@@ -0,0 +1,148 @@
+"""
+noid_stub.py
+Dependencies: none outside the standard library.
+Description: A local stand-in for the NOID binder, used by the tests and
+for trying arkchecker changes without touching production bindings. It
+answers `?fetch+ARK` with the element: value lines NOID prints and applies
+`?bind+set+ARK+ELEMENT+VALUE`, mints sequential test ARKs, and runs a POST
+to `?-` as one command per line, ending each command's output with a blank
+line as NOID's batch mode does. It can also fail the next requests with a
+status code, to exercise retries, and records every request along with the
+highest number it served at once.
+
+Usage: python noid_stub.py [--port 8080] [--delay SECONDS]
+"""
+
+import argparse
+import shlex
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Set
+from urllib.parse import unquote
+
+
+class NoidStub:
+    def __init__(self, port: int = 0, delay: float = 0.0, naan: str = "77981"):
+        self.bindings: Dict[str, Dict[str, str]] = {}
+        self.requests: List[str] = []
+        self.naan = naan
+        self.minted = 0
+        self.failures: List[int] = []
+        # ARKs whose fetch NOID answers with an error block.
+        self.broken: Set[str] = set()
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self.handler())
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/noidu_gmgs"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self) -> "NoidStub":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def bind(self, ark: str, **elements: str) -> None:
+        self.bindings.setdefault(ark, {}).update(elements)
+
+    def fail_next(self, *status_codes: int) -> None:
+        """Answer the next requests with these status codes, in order."""
+        with self._lock:
+            self.failures.extend(status_codes)
+
+    def respond(self, query: str, body: str = ""):
+        """(status, body) for a raw NOID query string and POST body."""
+        with self._lock:
+            self.requests.append(query)
+            if self.failures:
+                return self.failures.pop(0), "error: unavailable\n"
+        if query == "-":
+            outputs = [
+                self.run(shlex.split(line))[1]
+                for line in body.splitlines()
+                if line.strip()
+            ]
+            return 200, "".join(output + "\n" for output in outputs)
+        return self.run(query.split("+", 4))
+
+    def run(self, parts: List[str]):
+        """(status, output) of one NOID command given as its words."""
+        if len(parts) == 2 and parts[0] == "fetch":
+            ark = parts[1]
+            if ark in self.broken:
+                return 200, f"error: {ark}: database is unavailable\n"
+            elements = self.bindings.get(ark)
+            if not elements:
+                return 200, f"id:    {ark}\nnote: no elements bound under {ark}.\n"
+            lines = [f"id:    {ark} hold"]
+            lines += [f"{key}: {value}" for key, value in sorted(elements.items())]
+            return 200, "\n".join(lines) + "\n"
+        if len(parts) == 2 and parts[0] == "mint" and parts[1].isdigit():
+            arks = []
+            with self._lock:
+                for _ in range(int(parts[1])):
+                    self.minted += 1
+                    arks.append(f"{self.naan}/test{self.minted:07d}")
+            return 200, "".join(f"id: {ark}\n" for ark in arks)
+        if len(parts) == 5 and parts[:2] == ["bind", "set"]:
+            _, _, ark, element, value = parts
+            self.bind(ark, **{element: value})
+            return 200, f"Status:  ok, {len(value)} bytes written\n"
+        if len(parts) == 4 and parts[:2] == ["bind", "purge"]:
+            self.bindings.get(parts[2], {}).pop(parts[3], None)
+            return 200, "Status:  ok, 0 bytes written\n"
+        return 400, f"error: unsupported command {' '.join(parts)!r}\n"
+
+    def handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                self.serve("")
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                self.serve(self.rfile.read(length).decode("utf-8"))
+
+            def serve(self, body: str):
+                with stub._lock:
+                    stub.active += 1
+                    stub.max_active = max(stub.max_active, stub.active)
+                try:
+                    if stub.delay:
+                        time.sleep(stub.delay)
+                    query = unquote(self.path.partition("?")[2])
+                    status, output = stub.respond(query, body)
+                finally:
+                    with stub._lock:
+                        stub.active -= 1
+                data = output.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "text/plain; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    arg_parser = argparse.ArgumentParser(description="Run a local NOID stand-in.")
+    arg_parser.add_argument("--port", type=int, default=8080)
+    arg_parser.add_argument("--delay", type=float, default=0.0)
+    args = arg_parser.parse_args(argv)
+    stub = NoidStub(args.port, args.delay)
+    print(f"Serving NOID at {stub.url}")
+    stub.server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+import csv
+import json
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+ARKCHECKER_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ARKCHECKER_ROOT))
+# The geometadataedit package, as `pip install -e geometadataedit` would provide.
+sys.path.insert(0, str(ARKCHECKER_ROOT.parent / "geometadataedit"))
+
+from ark_verify import NoidClient
+from ark_verify import expected_where
+from ark_verify import find_arks
+from ark_verify import main
+from ark_verify import verify_arks
+from ark_verify import verify_arks_batched
+from ark_verify import write_report
+from geometadataedit.ark_index import ArkIndex
+from geometadataedit.http_client import HttpClient
+from geometadataedit.noid import NoidBatchClient
+from noid_stub import NoidStub
+
+FIXTURES = ARKCHECKER_ROOT.parent / "uwm_fixture" / "Aardvark"
+
+
+class ArkVerifyTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.http = HttpClient(retries=2, backoff_factor=0)
+        self.addCleanup(self.http.close)
+        self.records = find_arks(FIXTURES)
+        self.stub = NoidStub()
+        self.stub.__enter__()
+        self.addCleanup(self.stub.__exit__, None, None, None)
+        self.noid = NoidClient(self.stub.url, self.http)
+        # Two ARKs are bound correctly, one points elsewhere and the rest
+        # have no where element yet.
+        for record in self.records[:2]:
+            self.stub.bind(record.ark, where=expected_where(record.ark))
+        self.stub.bind(self.records[2].ark, where="https://example.com/old")
+
+    def bind_commands(self):
+        return [query for query in self.stub.requests if query.startswith("bind")]
+
+    def test_finds_the_fixture_arks(self):
+        self.assertEqual(len(self.records), 5)
+        self.assertEqual(self.records[0].ark, "77981/gmgs0c4sj3x")
+        self.assertEqual(
+            expected_where(self.records[0].ark),
+            "https://geodiscovery.uwm.edu/catalog/ark:-77981-gmgs0c4sj3x",
+        )
+
+    def test_dry_run_reports_the_diff_without_binding(self):
+        results = verify_arks(self.records, self.noid, workers=4)
+
+        self.assertEqual(
+            [result.status for result in results],
+            ["ok", "ok", "would-update", "would-update", "would-update"],
+        )
+        self.assertEqual(results[2].current_where, "https://example.com/old")
+        self.assertIsNone(results[3].current_where)
+        self.assertEqual(self.bind_commands(), [])
+
+    def test_apply_binds_only_differing_arks(self):
+        results = verify_arks(self.records, self.noid, apply=True, workers=4)
+
+        self.assertEqual([result.status for result in results].count("updated"), 3)
+        self.assertEqual(len(self.bind_commands()), 3)
+        for record in self.records:
+            self.assertEqual(
+                self.stub.bindings[record.ark]["where"], expected_where(record.ark)
+            )
+        # A second pass finds nothing left to bind.
+        self.assertTrue(
+            all(
+                result.status == "ok"
+                for result in verify_arks(self.records, self.noid, apply=True)
+            )
+        )
+
+    def test_fetches_are_concurrent_but_bounded(self):
+        self.stub.delay = 0.05
+        records = self.records * 4
+
+        verify_arks(records, self.noid, workers=3)
+
+        self.assertEqual(self.stub.max_active, 3)
+
+    def test_server_errors_are_retried_then_reported(self):
+        self.stub.fail_next(503, 503)
+        results = verify_arks(self.records[:1], self.noid, workers=1)
+        self.assertEqual(results[0].status, "ok")
+
+        self.stub.fail_next(503, 503, 503)
+        results = verify_arks(self.records[:1], self.noid, workers=1)
+        self.assertEqual(results[0].status, "error")
+        self.assertIn("503", results[0].error)
+
+    def test_reports_and_exit_status(self):
+        results = verify_arks(self.records, self.noid)
+        csv_path = Path(self.tmpdir.name) / "report.csv"
+        json_path = Path(self.tmpdir.name) / "report.json"
+        write_report(results, csv_path)
+        write_report(results, json_path)
+
+        with open(csv_path, encoding="utf-8", newline="") as file:
+            rows = list(csv.DictReader(file))
+        self.assertEqual(rows[2]["status"], "would-update")
+        self.assertEqual(rows[2]["current_where"], "https://example.com/old")
+        self.assertEqual(json.loads(json_path.read_text())[0]["status"], "ok")
+
+        broken = Path(self.tmpdir.name) / "metadata"
+        shutil.copytree(FIXTURES, broken)
+        self.stub.fail_next(*[400] * 5)
+        self.assertEqual(
+            main([str(broken), "--noid", self.stub.url, "--retries", "0"]), 1
+        )
+
+    def test_verify_records_wheres_in_the_index(self):
+        metadata = Path(self.tmpdir.name) / "metadata"
+        shutil.copytree(FIXTURES, metadata)
+        index_path = Path(self.tmpdir.name) / "index.sqlite3"
+
+        self.assertEqual(
+            main([str(metadata), "--noid", self.stub.url, "--index", str(index_path)]),
+            0,
+        )
+
+        with ArkIndex(index_path) as index:
+            self.assertEqual(
+                index.lookup(self.records[2].ark).where, "https://example.com/old"
+            )
+            self.assertIsNone(index.lookup(self.records[3].ark).where)
+
+
+class BatchedVerifyTest(unittest.TestCase):
+    def test_batched_verify_binds_only_differing_arks(self):
+        http = HttpClient(retries=0, backoff_factor=0)
+        self.addCleanup(http.close)
+        records = find_arks(FIXTURES)
+        with NoidStub() as stub:
+            stub.bind(records[0].ark, where=expected_where(records[0].ark))
+            client = NoidBatchClient(stub.url, http)
+
+            dry_run = verify_arks_batched(records, client)
+            applied = verify_arks_batched(records, client, apply=True)
+
+            self.assertEqual(
+                [result.status for result in dry_run], ["ok"] + ["would-update"] * 4
+            )
+            self.assertEqual(
+                [result.status for result in applied], ["ok"] + ["updated"] * 4
+            )
+            # One fetch POST per pass and one bind POST.
+            self.assertEqual(stub.requests, ["-", "-", "-"])
+            for record in records:
+                self.assertEqual(
+                    stub.bindings[record.ark]["where"], expected_where(record.ark)
+                )
+
+    def test_batched_fetch_errors_fail_only_their_arks(self):
+        http = HttpClient(retries=0, backoff_factor=0)
+        self.addCleanup(http.close)
+        records = find_arks(FIXTURES)
+        with NoidStub() as stub:
+            stub.broken.add(records[1].ark)
+
+            results = verify_arks_batched(
+                records, NoidBatchClient(stub.url, http), apply=True
+            )
+
+        self.assertEqual(
+            [result.status for result in results],
+            ["updated", "error", "updated", "updated", "updated"],
+        )
+        self.assertIn("database is unavailable", results[1].error)
+        self.assertNotIn(records[1].ark, stub.bindings)
+
+
+if __name__ == "__main__":
+    unittest.main()
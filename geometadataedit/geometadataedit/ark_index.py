@@ -0,0 +1,299 @@
+"""
+ark_index.py
+Dependencies: orjson is optional; sqlite3 ships with Python.
+Description: A persistent index of the ARKs named in a tree of OGM Aardvark
+metadata, mapping each ARK to the file and record id it comes from and, once
+arkchecker's ark_verify.py has fetched it, the `where` currently bound in NOID. Records are
+read one file at a time and their dct_identifier_sm values matched with a
+precompiled pattern. update() only re-reads files whose mtime or size changed
+since the last run and drops the ARKs of deleted files, so looking an ARK up
+is a primary-key query rather than a rescan of the tree. An ARK named in
+several files has a row for each and stays indexed until none names it. The
+NOID `where` values are kept when a file is re-read.
+
+Usage: python ark_index.py [--db PATH] update DIR
+       python ark_index.py [--db PATH] lookup ARK [ARK ...]
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+DEFAULT_INDEX = Path(
+    os.getenv("ARK_INDEX_PATH", Path(__file__).resolve().parent / "ark_index.sqlite3")
+)
+
+# Group 1 is the Name Assigning Authority Number, group 2 the assigned name.
+ARK_PATTERN = re.compile(r"(\d{5})/(\w{11})")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS arks (
+    ark TEXT NOT NULL,
+    file TEXT NOT NULL REFERENCES files (path) ON DELETE CASCADE,
+    id TEXT,
+    PRIMARY KEY (ark, file)
+);
+CREATE INDEX IF NOT EXISTS arks_file ON arks (file);
+-- Filled in from NOID, so not tied to the file the ARK was found in.
+CREATE TABLE IF NOT EXISTS bindings (
+    ark TEXT PRIMARY KEY,
+    where_url TEXT,
+    checked TEXT NOT NULL
+);
+"""
+
+
+class ArkEntry(NamedTuple):
+    ark: str
+    file: Path
+    id: Optional[str]
+    where: Optional[str] = None
+
+
+class IndexStats(NamedTuple):
+    scanned: int
+    updated: int
+    removed: int
+    arks: int
+    seconds: float
+
+
+def record_arks(record: Dict) -> Iterator[str]:
+    """The ARKs named in a record's dct_identifier_sm, in order."""
+    identifiers = record.get("dct_identifier_sm") or []
+    if isinstance(identifiers, str):
+        identifiers = [identifiers]
+    for identifier in identifiers:
+        match = ARK_PATTERN.search(str(identifier))
+        if match:
+            yield match[0]
+
+
+def load(path: Path):
+    with open(path, "rb") as file:
+        text = file.read()
+    if orjson is not None:
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            # Let the standard library parse or report it.
+            pass
+    return json.loads(text)
+
+
+def file_arks(path: Path) -> Iterator[ArkEntry]:
+    """Each distinct ARK of the records in one metadata file."""
+    data = load(path)
+    found = set()
+    for record in data if isinstance(data, list) else [data]:
+        if not isinstance(record, dict):
+            continue
+        record_id = record.get("id")
+        for ark in record_arks(record):
+            if ark not in found:
+                found.add(ark)
+                yield ArkEntry(ark, Path(path), record_id)
+
+
+def iter_arks(directory: Path) -> Iterator[ArkEntry]:
+    """Stream the ARKs of every record under directory, one file at a time."""
+    for path in sorted(Path(directory).rglob("*.json")):
+        try:
+            entries = list(file_arks(path))
+        except (OSError, ValueError) as e:
+            logging.warning(f"Skipping unreadable file {path}: {e}")
+            continue
+        if not entries:
+            logging.warning(f"No ARK found in {path}")
+        yield from entries
+
+
+class ArkIndex:
+    def __init__(self, path: Union[str, Path] = DEFAULT_INDEX):
+        self.path = path
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(str(path))
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.executescript(SCHEMA)
+        keys = {
+            row[1]: row[5] for row in self.connection.execute("PRAGMA table_info(arks)")
+        }
+        if not keys["file"]:
+            # Indexes from before an ARK had a row per file; re-read every file.
+            with self.connection:
+                self.connection.execute("DROP TABLE arks")
+                self.connection.execute("DELETE FROM files")
+            self.connection.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self) -> "ArkIndex":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def update(self, directory: Path) -> IndexStats:
+        """
+        Bring the index up to date with directory: files whose mtime or size
+        changed are re-read and files that no longer exist are dropped.
+        """
+        start = time.perf_counter()
+        directory = Path(directory).resolve()
+        prefix = str(directory) + os.sep
+        known = {
+            path: (mtime_ns, size)
+            for path, mtime_ns, size in self.connection.execute(
+                "SELECT path, mtime_ns, size FROM files "
+                "WHERE substr(path, 1, ?) = ?",
+                (len(prefix), prefix),
+            )
+        }
+        scanned = updated = arks = 0
+        with self.connection:
+            for path in directory.rglob("*.json"):
+                scanned += 1
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                key = str(path)
+                signature = (stat.st_mtime_ns, stat.st_size)
+                if known.pop(key, None) == signature:
+                    continue
+                updated += 1
+                arks += self._replace_file(key, signature)
+            self.connection.executemany(
+                "DELETE FROM files WHERE path = ?", [(path,) for path in known]
+            )
+        stats = IndexStats(
+            scanned, updated, len(known), arks, time.perf_counter() - start
+        )
+        logging.info(
+            f"ARK index update of {directory}: scanned {stats.scanned} files, "
+            f"re-read {stats.updated}, removed {stats.removed} "
+            f"in {stats.seconds:.2f}s"
+        )
+        return stats
+
+    def _replace_file(self, path: str, signature) -> int:
+        try:
+            entries = list(file_arks(Path(path)))
+        except (OSError, ValueError) as e:
+            logging.warning(f"ARK index skipped unreadable file {path}: {e}")
+            entries = []
+        if not entries:
+            logging.warning(f"No ARK found in {path}")
+        # Deleting the old row cascades to the ARKs found in it, and only those:
+        # other files naming the same ARKs keep their rows.
+        self.connection.execute("DELETE FROM files WHERE path = ?", (path,))
+        self.connection.execute(
+            "INSERT INTO files (path, mtime_ns, size) VALUES (?, ?, ?)",
+            (path, *signature),
+        )
+        self.connection.executemany(
+            "INSERT INTO arks (ark, file, id) VALUES (?, ?, ?)",
+            [(entry.ark, path, entry.id) for entry in entries],
+        )
+        return len(entries)
+
+    def _entries(self, clause: str = "", params: Iterable = ()) -> List[ArkEntry]:
+        return [
+            ArkEntry(ark, Path(file), record_id, where)
+            for ark, file, record_id, where in self.connection.execute(
+                "SELECT arks.ark, arks.file, arks.id, bindings.where_url "
+                "FROM arks LEFT JOIN bindings ON bindings.ark = arks.ark"
+                f"{clause} ORDER BY arks.file, arks.rowid",
+                tuple(params),
+            )
+        ]
+
+    def lookup(self, ark: str) -> Optional[ArkEntry]:
+        entries = self._entries(" WHERE arks.ark = ?", (ark,))
+        return entries[0] if entries else None
+
+    def __contains__(self, ark: str) -> bool:
+        return self.lookup(ark) is not None
+
+    def __len__(self) -> int:
+        (count,) = self.connection.execute(
+            "SELECT count(DISTINCT ark) FROM arks"
+        ).fetchone()
+        return count
+
+    def entries(self, directory: Optional[Path] = None) -> List[ArkEntry]:
+        """Every indexed ARK, or those found under directory, by file."""
+        if directory is None:
+            return self._entries()
+        prefix = str(Path(directory).resolve()) + os.sep
+        return self._entries(
+            " WHERE substr(arks.file, 1, ?) = ?", (len(prefix), prefix)
+        )
+
+    def set_wheres(self, wheres: Dict[str, Optional[str]]) -> None:
+        """Record the `where` each ARK was last seen bound to in NOID."""
+        checked = time.strftime("%Y-%m-%dT%H:%M:%S")
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO bindings (ark, where_url, checked) "
+                "VALUES (?, ?, ?)",
+                [(ark, where, checked) for ark, where in wheres.items()],
+            )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    arg_parser = argparse.ArgumentParser(
+        description="Build and query an index of the ARKs in Aardvark metadata."
+    )
+    arg_parser.add_argument("--db", type=Path, default=DEFAULT_INDEX)
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+    update_parser = commands.add_parser("update", help="Index new and changed files")
+    update_parser.add_argument("directory", type=Path)
+    lookup_parser = commands.add_parser("lookup", help="Show where ARKs are found")
+    lookup_parser.add_argument("arks", nargs="+")
+    args = arg_parser.parse_args(argv)
+
+    with ArkIndex(args.db) as index:
+        if args.command == "update":
+            stats = index.update(args.directory)
+            print(
+                f"{args.directory}: scanned {stats.scanned} files, "
+                f"re-read {stats.updated}, removed {stats.removed}, "
+                f"{stats.arks} ARKs in {stats.seconds:.2f}s"
+            )
+            return 0
+        missing = 0
+        for ark in args.arks:
+            entry = index.lookup(ark)
+            if entry is None:
+                print(f"{ark}: not indexed")
+                missing += 1
+            else:
+                print(f"{ark}: {entry.file} id={entry.id} where={entry.where}")
+        return 1 if missing else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
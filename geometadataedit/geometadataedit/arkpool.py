@@ -0,0 +1,305 @@
+"""
+Pre-minted ARK pool.
+
+Identifier.mint() sends one `mint+1` request per dataset in the middle of an
+ingest. ArkPool mints ARKs ahead of time in batches (`mint N`, through
+NoidBatchClient) and keeps them in a small SQLite queue next to the ingest
+logs, so take() hands one out without touching NOID until the pool runs low.
+
+An ARK that is taken is leased, not removed: consume() drops it once its
+dataset is bound and ingested, and release() puts it back when the ingest
+failed and its bindings were purged. Every lease records its owner, the
+host, pid and run that took it, since two processes can share a pool file.
+reclaim() settles only the leases of owners that are gone: processes on this
+host that are no longer running, or the owners named with `reclaim --owner`
+(a crashed run on another host). It fetches them from NOID and only returns
+the ones that still have nothing bound. Point NOID_URL at
+arkchecker/noid_stub.py to run the pool against a local stand-in.
+
+Usage: python arkpool.py [--db PATH] fill N | status | reclaim [--owner OWNER]
+"""
+
+import argparse
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from geometadataedit.noid import NoidBatchClient
+
+DEFAULT_POOL = Path(
+    os.getenv("ARK_POOL_PATH", Path(__file__).resolve().parent / "ark_pool.sqlite3")
+)
+# Mint this many ARKs whenever the pool runs dry.
+REFILL_SIZE = int(os.getenv("ARK_POOL_REFILL", 100))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS arks (
+    position INTEGER PRIMARY KEY,
+    ark TEXT NOT NULL UNIQUE,
+    minted TEXT NOT NULL,
+    leased TEXT,
+    -- host:pid:run of the process holding the lease.
+    owner TEXT
+);
+CREATE INDEX IF NOT EXISTS arks_free ON arks (position) WHERE leased IS NULL;
+"""
+
+
+class ArkPoolError(Exception):
+    pass
+
+
+def timestamp() -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def lease_owner(run_id: Optional[str] = None) -> str:
+    """host:pid:run naming this process and one run of it."""
+    return f"{socket.gethostname()}:{os.getpid()}:{run_id or uuid.uuid4().hex[:8]}"
+
+
+def process_running(pid: int) -> bool:
+    if os.name == "nt":
+        import ctypes
+
+        # os.kill() terminates the process on Windows, so ask the kernel.
+        kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # QUERY_LIMITED_INFORMATION
+        if not handle:
+            # ERROR_ACCESS_DENIED: running, as another user.
+            return ctypes.get_last_error() == 5
+        try:
+            code = ctypes.c_ulong()
+            kernel32.GetExitCodeProcess(handle, ctypes.byref(code))
+            return code.value == 259  # STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def owner_gone(owner: Optional[str]) -> bool:
+    """Whether the process that holds a lease has certainly stopped."""
+    if owner is None:
+        # Leased before the pool recorded owners.
+        return True
+    host, pid, _ = owner.rsplit(":", 2)
+    if host != socket.gethostname():
+        # Processes on other hosts cannot be checked from here.
+        return False
+    return not process_running(int(pid))
+
+
+class ArkPool:
+    def __init__(
+        self,
+        client: NoidBatchClient,
+        path: Union[str, Path] = DEFAULT_POOL,
+        refill_size: int = REFILL_SIZE,
+        owner: Optional[str] = None,
+    ):
+        self.client = client
+        self.refill_size = refill_size
+        self.path = path
+        self.owner = owner or lease_owner()
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        # The lock lets threads share a pool and the timeout covers two
+        # processes sharing a pool file.
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(
+            str(path), timeout=30, check_same_thread=False
+        )
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.executescript(SCHEMA)
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(arks)")]
+        if "owner" not in columns:
+            # Pool files created before leases recorded their owner.
+            with self.connection:
+                self.connection.execute("ALTER TABLE arks ADD COLUMN owner TEXT")
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self) -> "ArkPool":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def free(self) -> int:
+        with self.lock:
+            (count,) = self.connection.execute(
+                "SELECT count(*) FROM arks WHERE leased IS NULL"
+            ).fetchone()
+            return count
+
+    def leased(self) -> List[str]:
+        with self.lock:
+            return [
+                ark
+                for (ark,) in self.connection.execute(
+                    "SELECT ark FROM arks WHERE leased IS NOT NULL ORDER BY position"
+                )
+            ]
+
+    def owners(self) -> Dict[Optional[str], List[str]]:
+        """Leased ARKs by the owner holding them."""
+        owners: Dict[Optional[str], List[str]] = {}
+        with self.lock:
+            for ark, owner in self.connection.execute(
+                "SELECT ark, owner FROM arks WHERE leased IS NOT NULL ORDER BY position"
+            ):
+                owners.setdefault(owner, []).append(ark)
+        return owners
+
+    def fill(self, count: int) -> List[str]:
+        """Mint count ARKs into the pool."""
+        with self.lock:
+            arkids = self.client.mint(count)
+            minted = timestamp()
+            with self.connection:
+                self.connection.executemany(
+                    "INSERT INTO arks (ark, minted) VALUES (?, ?)",
+                    [(arkid, minted) for arkid in arkids],
+                )
+            return arkids
+
+    def ensure(self, count: int) -> int:
+        """Mint ahead so at least count ARKs are free; returns how many were minted."""
+        missing = count - self.free()
+        if missing > 0:
+            self.fill(missing)
+        return max(missing, 0)
+
+    def take(self) -> str:
+        """Lease the oldest free ARK, minting a batch first if there is none."""
+        with self.lock:
+            for _ in range(2):
+                with self.connection:
+                    # BEGIN IMMEDIATE so two processes cannot lease the same ARK.
+                    self.connection.execute("BEGIN IMMEDIATE")
+                    row = self.connection.execute(
+                        "SELECT position, ark FROM arks WHERE leased IS NULL "
+                        "ORDER BY position LIMIT 1"
+                    ).fetchone()
+                    if row is not None:
+                        self.connection.execute(
+                            "UPDATE arks SET leased = ?, owner = ? WHERE position = ?",
+                            (timestamp(), self.owner, row[0]),
+                        )
+                        return row[1]
+                self.fill(self.refill_size)
+            raise ArkPoolError("NOID minted no ARKs for the pool")
+
+    def consume(self, arkid: str) -> None:
+        """Drop a leased ARK that is now bound to a dataset."""
+        with self.lock:
+            with self.connection:
+                self.connection.execute(
+                    "DELETE FROM arks WHERE ark = ? AND leased IS NOT NULL", (arkid,)
+                )
+
+    def release(self, arkid: str) -> bool:
+        """
+        Return a leased ARK to the pool. Only release ARKs whose bindings were
+        purged (or never made); returns False if arkid was not leased from it.
+        """
+        with self.lock:
+            with self.connection:
+                cursor = self.connection.execute(
+                    "UPDATE arks SET leased = NULL, owner = NULL "
+                    "WHERE ark = ? AND leased IS NOT NULL",
+                    (arkid,),
+                )
+            return cursor.rowcount == 1
+
+    @contextmanager
+    def lease(self) -> Iterator[str]:
+        """take() an ARK, consumed if the block succeeds and released if it raises."""
+        arkid = self.take()
+        try:
+            yield arkid
+        except BaseException:
+            self.release(arkid)
+            raise
+        self.consume(arkid)
+
+    def reclaim(
+        self, owners: Optional[Iterable[str]] = None
+    ) -> Tuple[List[str], List[str]]:
+        """
+        Settle leases left by an interrupted run: ARKs with elements bound in
+        NOID are consumed, the rest go back to the pool. Only the leases of
+        owners, or by default of owners that are no longer running, are
+        settled; ARKs NOID could not fetch stay leased until a later reclaim.
+        Returns (released, consumed).
+        """
+        settle = owner_gone if owners is None else set(owners).__contains__
+        leased = [
+            arkid
+            for owner, arkids in self.owners().items()
+            if settle(owner)
+            for arkid in arkids
+        ]
+        if not leased:
+            return [], []
+        records, errors = self.client.fetch(leased)
+        for arkid, error in errors.items():
+            print(f"Leaving {arkid} leased: {error}")
+        released = [arkid for arkid in records if not records[arkid]]
+        consumed = [arkid for arkid in records if records[arkid]]
+        for arkid in released:
+            self.release(arkid)
+        for arkid in consumed:
+            self.consume(arkid)
+        return released, consumed
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    arg_parser = argparse.ArgumentParser(description="Manage the pre-minted ARK pool.")
+    arg_parser.add_argument("--db", type=Path, default=DEFAULT_POOL)
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+    fill_parser = commands.add_parser("fill", help="Mint until N ARKs are free")
+    fill_parser.add_argument("count", type=int)
+    commands.add_parser("status", help="Count free and leased ARKs")
+    reclaim_parser = commands.add_parser(
+        "reclaim", help="Settle leases left by an interrupted run"
+    )
+    reclaim_parser.add_argument(
+        "--owner",
+        action="append",
+        help="Settle this owner's leases, e.g. a run that crashed on another host",
+    )
+    args = arg_parser.parse_args(argv)
+
+    # Only the command line reads .env; the pool itself takes a client.
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    with ArkPool(NoidBatchClient(os.getenv("NOID_URL")), args.db) as pool:
+        if args.command == "fill":
+            print(f"Minted {pool.ensure(args.count)} ARKs")
+        elif args.command == "reclaim":
+            released, consumed = pool.reclaim(args.owner)
+            print(f"Released {len(released)} ARKs, consumed {len(consumed)}")
+        for owner, arkids in pool.owners().items():
+            print(f"{len(arkids)} leased by {owner}")
+        print(f"{pool.free()} free, {len(pool.leased())} leased")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,255 @@
+"""
+File server consistency audit.
+
+Checks that every dataset on the file server has a metadata record and vice
+versa without an exists() call per ARK on the network share. Each of
+metadata/, public/ and restricted-uw-system/ is listed once with os.scandir()
+into sets keyed by assigned name, and the orphans on either side are set
+differences, so the audit is one directory listing per folder however many
+datasets there are.
+
+Optionally the deliverable zip of every dataset is checked against its
+zippackage manifest on a thread pool (--verify-zips, re-hashing the zips with
+--deep), and the datasets are cross-checked with an ark_index.py index: ARKs
+in the OGM records without data on the server, datasets without an OGM
+record, and ARKs last seen in NOID with a `where` that does not point at
+their catalog page. Findings are written as CSV or JSON, chosen by the
+report's extension.
+
+Usage: python audit.py [ROOT] [--report FILE] [--verify-zips [--deep]]
+                       [--ark-index PATH] [--workers N]
+"""
+
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set
+
+from geometadataedit.ark_index import ArkIndex
+from geometadataedit.noid import expected_where
+from zippackage import manifest_path, verify_package
+
+METADATA_DIR = "metadata"
+RIGHTS_DIRS = ("public", "restricted-uw-system")
+# Metadata files are named after the ARK's assigned name, e.g. gmgs0c4sj3x_ISO.xml
+METADATA_NAME = re.compile(r"^(\w{11})_ISO\.xml$")
+WORKERS = 16
+
+REPORT_FIELDS = ("kind", "name", "path", "detail")
+
+
+class Finding(NamedTuple):
+    kind: str
+    # The ARK's assigned name, or the entry name when it is not one.
+    name: str
+    path: str
+    detail: str = ""
+
+
+class Listing(NamedTuple):
+    # Assigned names with an ISO metadata file.
+    metadata: Set[str]
+    # Assigned names with a data directory, by rights directory.
+    data: Dict[str, Set[str]]
+    findings: List[Finding]
+
+
+def list_file_server(root: Path) -> Listing:
+    """One scandir() of each top-level directory; flags unexpected entries."""
+    root = Path(root)
+    findings = []
+    metadata = set()
+    with os.scandir(root / METADATA_DIR) as entries:
+        for entry in entries:
+            match = METADATA_NAME.match(entry.name)
+            if match and entry.is_file():
+                metadata.add(match[1])
+            else:
+                findings.append(
+                    Finding("unexpected-metadata-entry", entry.name, entry.path)
+                )
+    data = {}
+    for rights in RIGHTS_DIRS:
+        names = data[rights] = set()
+        with os.scandir(root / rights) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    names.add(entry.name)
+                else:
+                    findings.append(Finding("not-a-directory", entry.name, entry.path))
+    return Listing(metadata, data, findings)
+
+
+def audit_listing(root: Path, listing: Listing) -> List[Finding]:
+    """Orphans and duplicates between the metadata and data directories."""
+    root = Path(root)
+    findings = list(listing.findings)
+    datasets = set().union(*listing.data.values())
+    for name in sorted(listing.metadata - datasets):
+        findings.append(
+            Finding(
+                "metadata-without-data",
+                name,
+                str(root / METADATA_DIR / f"{name}_ISO.xml"),
+                f"not found in {' or '.join(RIGHTS_DIRS)}",
+            )
+        )
+    for rights, names in listing.data.items():
+        for name in sorted(names - listing.metadata):
+            findings.append(
+                Finding("data-without-metadata", name, str(root / rights / name))
+            )
+    public, restricted = (listing.data[rights] for rights in RIGHTS_DIRS)
+    for name in sorted(public & restricted):
+        findings.append(
+            Finding(
+                "public-and-restricted",
+                name,
+                str(root / RIGHTS_DIRS[0] / name),
+                f"also in {RIGHTS_DIRS[1]}",
+            )
+        )
+    return findings
+
+
+def verify_dataset_zips(directory: Path, deep: bool = False) -> List[Finding]:
+    name = directory.name
+    with os.scandir(directory) as entries:
+        files = {entry.name for entry in entries if entry.is_file()}
+    zips = sorted(file for file in files if file.lower().endswith(".zip"))
+    if not zips:
+        return [Finding("missing-zip", name, str(directory))]
+    findings = []
+    for zip_name in zips:
+        zip_path = directory / zip_name
+        if manifest_path(zip_path).name not in files:
+            findings.append(Finding("no-manifest", name, str(zip_path)))
+            continue
+        try:
+            problems = verify_package(zip_path, deep=deep)
+        except (OSError, ValueError, KeyError) as error:
+            problems = [str(error)]
+        findings.extend(
+            Finding("zip-mismatch", name, str(zip_path), problem)
+            for problem in problems
+        )
+    return findings
+
+
+def verify_zips(
+    root: Path, listing: Listing, deep: bool = False, workers: int = WORKERS
+) -> List[Finding]:
+    """verify_dataset_zips() for every dataset, on a thread pool."""
+    directories = [
+        Path(root) / rights / name
+        for rights, names in listing.data.items()
+        for name in sorted(names)
+    ]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(
+            lambda directory: verify_dataset_zips(directory, deep), directories
+        )
+        return [finding for findings in results for finding in findings]
+
+
+def cross_check_index(entries: Iterable, listing: Listing) -> List[Finding]:
+    """Compare ark_index.ArkEntry rows (ARK, OGM file, id, where) with the server."""
+    datasets = set().union(*listing.data.values())
+    indexed = set()
+    findings = []
+    for entry in entries:
+        name = entry.ark.split("/")[1]
+        indexed.add(name)
+        if name not in datasets:
+            findings.append(
+                Finding("indexed-without-data", name, str(entry.file), entry.ark)
+            )
+        if entry.where is not None and entry.where != expected_where(entry.ark):
+            findings.append(
+                Finding("noid-where-mismatch", name, str(entry.file), entry.where)
+            )
+    for name in sorted(datasets - indexed):
+        findings.append(
+            Finding("data-without-record", name, name, "no OGM record names this ARK")
+        )
+    return findings
+
+
+def write_report(findings: List[Finding], path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix.lower() == ".json":
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump([finding._asdict() for finding in findings], file, indent=2)
+            file.write("\n")
+        return
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=REPORT_FIELDS)
+        writer.writeheader()
+        writer.writerows(finding._asdict() for finding in findings)
+
+
+def summarize(findings: List[Finding]) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for finding in findings:
+        counts[finding.kind] = counts.get(finding.kind, 0) + 1
+    return counts
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    arg_parser = argparse.ArgumentParser(
+        description="Check the file server's metadata and data directories agree."
+    )
+    arg_parser.add_argument(
+        "root",
+        type=Path,
+        nargs="?",
+        help="File server root (default: FILE_SERVER_PATH)",
+    )
+    arg_parser.add_argument("--report", type=Path, help="Write a .csv or .json report")
+    arg_parser.add_argument(
+        "--verify-zips",
+        action="store_true",
+        help="Check every zip against its checksum manifest",
+    )
+    arg_parser.add_argument(
+        "--deep", action="store_true", help="Re-hash the zips when verifying"
+    )
+    arg_parser.add_argument(
+        "--ark-index", type=Path, help="Cross-check with an ark_index.py index"
+    )
+    arg_parser.add_argument("--workers", type=int, default=WORKERS)
+    args = arg_parser.parse_args(argv)
+
+    root = args.root
+    if root is None:
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        root = Path(os.getenv("FILE_SERVER_PATH"))
+
+    listing = list_file_server(root)
+    print(f"There are {len(listing.metadata)} metadata records")
+    print(f"There are {sum(map(len, listing.data.values()))} datasets")
+    findings = audit_listing(root, listing)
+    if args.verify_zips:
+        findings += verify_zips(root, listing, args.deep, args.workers)
+    if args.ark_index:
+        with ArkIndex(args.ark_index) as index:
+            findings += cross_check_index(index.entries(), listing)
+
+    for finding in findings:
+        print(f"{finding.kind}: {finding.name} {finding.detail}".rstrip())
+    counts = summarize(findings)
+    print(", ".join(f"{count} {kind}" for kind, count in counts.items()) or "OK")
+    if args.report:
+        write_report(findings, args.report)
+    return 1 if findings else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,6 +5,8 @@ from pathlib import Path
 
 from dotenv import load_dotenv
 
+from pipeline import Pipeline, Stage
+
 load_dotenv()
 
 warnings = []
@@ -24,40 +26,130 @@ logwriter = csv.writer(csvfile)
 logwriter.writerow(["INPATH", "STATUS", "ARKID", "WARNING", "ERROR"])
 
 
-def main():
-    ### Purge BIND if status is failing:
-    def purge():
-        if status == "failing":
-            try:
-                dataset.metadata.bind(purge=True)
-            except Exception as error:
-                print(error)
-                warnings.append(error)
-            print()
-            print("###PURGE###")
-            print()
-            # Delete the zipfile:
-            try:
-                if dataset.fileserver_zip.exists():
-                    dataset.fileserver_zip.unlink()
-            except Exception as error:
-                print(error)
-                warnings.append(error)
-            # Delete the directory
-            try:
-                if dataset.fileserver_dir.exists():
-                    dataset.fileserver_dir.rmdir()
-            except Exception as error:
-                print(error)
-                warnings.append(error)
-            # Delete the metadata
-            try:
-                if dataset.fileserver_metadata.exists():
-                    dataset.fileserver_metadata.unlink()
-            except Exception as error:
-                print(error)
-                warnings.append(error)
+# Workers per pipeline stage. arcpy is not documented as safe off the main
+# thread, so datasets are prepared one at a time on it; binding and copying
+# to the file server overlap on worker threads.
+BIND_WORKERS = int(os.getenv("INGEST_BIND_WORKERS", 4))
+COPY_WORKERS = int(os.getenv("INGEST_COPY_WORKERS", 2))
+
+
+class IngestJob:
+    def __init__(self, path: Path):
+        self.path = path
+        self.dataset = None
+        # The warning logged if the current step fails.
+        self.warning = ""
+        # Whether a failure from here on needs its NOID bindings and file
+        # server copies purged.
+        self.purge = False
+
+    def step(self, warning: str, purge: bool = True) -> None:
+        self.warning = f"{warning} {str(self.path)}\n"
+        self.purge = purge
+
+    @property
+    def arkid(self) -> str:
+        try:
+            return self.dataset.metadata.identifier.assignedName
+        except AttributeError:
+            return "none assigned"
+
+
+def prepare(job: IngestJob) -> None:
+    job.step("Failed to create Dataset object for", purge=False)
+    job.dataset = updatemetadata.Dataset(job.path)
+
+    job.step("Failed to create existing_identifier object for", purge=False)
+    existing_identifier = job.dataset.metadata.get_existing_identifier_or_mint()
+
+    job.step("Failed to create and write identifiers for")
+    job.dataset.metadata.write_identifiers(existing_identifier)
+
+    job.step("Failed to update AGSL hours for")
+    job.dataset.metadata.update_agsl_hours()
+
+    job.step("Failed to export metadata for")
+    job.dataset.metadata.dual_metadata_export()
+
+
+def bind(job: IngestJob) -> None:
+    job.step("Failed to NOID bind for")
+    job.dataset.metadata.bind()
 
+
+def ingest(job: IngestJob) -> None:
+    job.step("Failed to ingest")
+    job.outputs = job.dataset.ingest()
+
+
+### Purge BIND if status is failing:
+def purge(dataset) -> None:
+    try:
+        if dataset.metadata.bind(purge=True) is not None:
+            # Nothing is bound to a pooled ARK anymore; it can be reused.
+            dataset.metadata.identifier.release()
+    except Exception as error:
+        print(error)
+        warnings.append(error)
+    print()
+    print("###PURGE###")
+    print()
+    # Delete the zipfile:
+    try:
+        if dataset.fileserver_zip.exists():
+            dataset.fileserver_zip.unlink()
+    except Exception as error:
+        print(error)
+        warnings.append(error)
+    # Delete the zip's checksum manifest:
+    try:
+        if dataset.fileserver_manifest.exists():
+            dataset.fileserver_manifest.unlink()
+    except Exception as error:
+        print(error)
+        warnings.append(error)
+    # Delete the directory
+    try:
+        if dataset.fileserver_dir.exists():
+            dataset.fileserver_dir.rmdir()
+    except Exception as error:
+        print(error)
+        warnings.append(error)
+    # Delete the metadata
+    try:
+        if dataset.fileserver_metadata.exists():
+            dataset.fileserver_metadata.unlink()
+    except Exception as error:
+        print(error)
+        warnings.append(error)
+
+
+def failed(job: IngestJob, stage: Stage, error: BaseException) -> None:
+    print(job.warning)
+    print(error)
+    warnings.append(job.warning)
+    warnings.append(error)
+    status = "failing"
+    logwriter.writerow([job.path, status, job.arkid, job.warning, error])
+    if job.purge:
+        purge(job.dataset)
+
+
+def succeeded(job: IngestJob) -> None:
+    fsdir, fszip, fsmetadata = job.outputs
+    ### Testing/Logging
+    if fsdir.exists() and fszip.exists() and fsmetadata.exists():
+        print(f"Successfully updated and ingested {str(job.path)}!\n")
+        print(f"The file server directory is {fsdir}")
+        print(f"The file server zip file is {fszip}")
+        print(f"The fileserver metadata is {fsmetadata}")
+    status = "passing"
+    job.dataset.metadata.identifier.consume()
+    logwriter.writerow([job.path, status, job.arkid, "", ""])
+    job.dataset = None  # Release the dataset once it is logged.
+
+
+def main():
     # Loop through each directory in the parent folder
     def list_all_dirs(rootdir) -> list[tuple[Path, int]]:
         rootdir = Path(rootdir)
@@ -69,166 +161,31 @@ def main():
                 all_directories.append(path_tuple)
         return all_directories
 
-    for dataset_directory in list_all_dirs(target_directory):
-        status = "passing"
-        if dataset_directory[1] == 1:  # Only children of root
-
-            try:
-                dataset = updatemetadata.Dataset(Path(dataset_directory[0]))
-            except Exception as error:
-                warning = (
-                    f"Failed to create Dataset object for {str(dataset_directory[0])}\n"
-                )
-                print(warning)
-                print(error)
-                warnings.append(warning)
-                warnings.append(error)
-                status = "failing"
-                logwriter.writerow(
-                    [dataset_directory[0], status, "none assigned", warning, error]
-                )
-                continue  # Will go to the next Dataset.
-
-            try:
-                existing_identifier = dataset.metadata.get_existing_identifier_or_mint()
-            except Exception as error:
-                warning = f"Failed to create existing_identifier object for {str(dataset_directory[0])}\n"
-                print(warning)
-                print(error)
-                warnings.append(warning)
-                warnings.append(error)
-                status = "failing"
-                logwriter.writerow(
-                    [dataset_directory[0], status, "none assigned", warning, error]
-                )
-                # purge() No need to purge
-                continue  # Will go to the next Dataset.
-            try:
-                dataset.metadata.write_identifiers(existing_identifier)
-            except Exception as error:
-                warning = f"Failed to create and write identifiers for {str(dataset_directory[0])}\n"
-                print(warning)
-                print(error)
-                warnings.append(warning)
-                warnings.append(error)
-                status = "failing"
-                logwriter.writerow(
-                    [
-                        dataset_directory[0],
-                        status,
-                        dataset.metadata.identifier.assignedName,
-                        warning,
-                        error,
-                    ]
-                )
-                purge()
-                continue
-
-            try:
-                dataset.metadata.update_agsl_hours()
-            except Exception as error:
-                warning = (
-                    f"Failed to update AGSL hours for {str(dataset_directory[0])}\n"
-                )
-                print(warning)
-                print(error)
-                warnings.append(warning)
-                warnings.append(error)
-                status = "failing"
-                logwriter.writerow(
-                    [
-                        dataset_directory[0],
-                        status,
-                        dataset.metadata.identifier.assignedName,
-                        warning,
-                        error,
-                    ]
-                )
-                purge()
-                continue
-
-            try:
-                dataset.metadata.dual_metadata_export()
-            except Exception as error:
-                warning = f"Failed to export metadata for {str(dataset_directory[0])}\n"
-                print(warning)
-                print(error)
-                warnings.append(warning)
-                warnings.append(error)
-                status = "failing"
-                logwriter.writerow(
-                    [
-                        dataset_directory[0],
-                        status,
-                        dataset.metadata.identifier.assignedName,
-                        warning,
-                        error,
-                    ]
-                )
-                purge()
-                continue
-
-            try:
-                dataset.metadata.bind()
-            except Exception as error:
-                warning = f"Failed to NOID bind for {str(dataset_directory[0])}\n"
-                print(warning)
-                print(error)
-                warnings.append(warning)
-                warnings.append(error)
-                status = "failing"
-                logwriter.writerow(
-                    [
-                        dataset_directory[0],
-                        status,
-                        dataset.metadata.identifier.assignedName,
-                        warning,
-                        error,
-                    ]
-                )
-                purge()
-                continue
-
-            try:
-                fsdir, fszip, fsmetadata = dataset.ingest()
-            except Exception as error:
-                warning = f"Failed to ingest {str(dataset_directory[0])}\n"
-                print(warning)
-                print(error)
-                warnings.append(warning)
-                warnings.append(error)
-                status = "failing"
-                logwriter.writerow(
-                    [
-                        dataset_directory[0],
-                        status,
-                        dataset.metadata.identifier.assignedName,
-                        warning,
-                        error,
-                    ]
-                )
-                purge()
-                continue
-
-            ### Testing/Logging
-            if fsdir.exists() and fszip.exists() and fsmetadata.exists():
-                print(
-                    f"Successfully updated and ingested {str(dataset_directory[0])}!\n"
-                )
-                print(f"The file server directory is {fsdir}")
-                print(f"The file server zip file is {fszip}")
-                print(f"The fileserver metadata is {fsmetadata}")
-            status = "passing"
-            logwriter.writerow(
-                [
-                    dataset_directory[0],
-                    status,
-                    dataset.metadata.identifier.assignedName,
-                    "",
-                    "",
-                ]
-            )
-            dataset = None  # This will make sure we aren't passing the existing dataset to further steps once complete.
+    # Only children of root
+    jobs = [
+        IngestJob(Path(directory))
+        for directory, depth in list_all_dirs(target_directory)
+        if depth == 1
+    ]
+    if updatemetadata.ARK_POOL is not None:
+        # Settle ARKs leased by runs that are no longer running (never those
+        # of another ingest sharing the pool), then mint enough ARKs for every
+        # dataset in one go.
+        updatemetadata.ARK_POOL.reclaim()
+        updatemetadata.ARK_POOL.ensure(len(jobs))
+
+    # Each dataset is prepared, bound, then zipped and copied to the file
+    # server; a failure logs the dataset and purges it if needed.
+    pipeline = Pipeline(
+        [
+            Stage("prepare", prepare, workers=0),
+            Stage("bind", bind, BIND_WORKERS),
+            Stage("ingest", ingest, COPY_WORKERS),
+        ],
+        on_failure=failed,
+        on_success=succeeded,
+    )
+    pipeline.run(jobs)
 
     # if it is successful:
     # write to log the path on the webserver
@@ -0,0 +1,162 @@
+"""
+Pooled HTTP client shared by the NOID tools, arkchecker and opendataharvest.
+
+HttpClient keeps one requests.Session per scheme and host so repeated calls to
+the same portal, NOID binder or schema host reuse kept-alive connections
+instead of opening a new TCP/TLS connection each time, with a urllib3 retry
+policy, a default timeout and per-host request metrics. This is the only copy:
+everything imports it as geometadataedit.http_client, which needs this package
+installed (`pip install -e geometadataedit`). Settings come from the HTTP_*
+environment variables (settings_from_env) or, for the harvesters, the `http`
+section of opendataharvest's config.yaml.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+def settings_from_env() -> Dict:
+    """HttpClient.from_config() settings from the HTTP_* entries of .env."""
+    return {
+        "pool_maxsize": int(os.getenv("HTTP_POOL_MAXSIZE", 4)),
+        "timeout": float(os.getenv("HTTP_TIMEOUT", 30)),
+        "retries": int(os.getenv("HTTP_RETRIES", 3)),
+        "backoff_factor": float(os.getenv("HTTP_BACKOFF", 1)),
+    }
+
+
+class HttpClient:
+    """Pooled per-host sessions with retries, default timeouts and metrics."""
+
+    def __init__(
+        self,
+        pool_connections: int = 4,
+        pool_maxsize: int = 16,
+        timeout: float = 10,
+        retries: int = 3,
+        backoff_factor: float = 1,
+        status_forcelist=(429, 500, 502, 503, 504),
+        user_agent: Optional[str] = None,
+    ):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.status_forcelist = tuple(status_forcelist)
+        self.user_agent = user_agent
+        self._sessions: Dict[str, requests.Session] = {}
+        self._lock = threading.Lock()
+        self._metrics = defaultdict(
+            lambda: {"requests": 0, "errors": 0, "seconds": 0.0, "bytes": 0}
+        )
+
+    @classmethod
+    def from_config(cls, settings: Dict) -> "HttpClient":
+        keys = (
+            "pool_connections",
+            "pool_maxsize",
+            "timeout",
+            "retries",
+            "backoff_factor",
+            "status_forcelist",
+            "user_agent",
+        )
+        return cls(**{key: settings[key] for key in keys if key in settings})
+
+    @staticmethod
+    def host_key(url: str) -> str:
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}"
+
+    def session_for(self, url: str) -> requests.Session:
+        """Return the pooled session for the scheme and host of url."""
+        key = self.host_key(url)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = self._new_session(key)
+                self._sessions[key] = session
+        return session
+
+    def _new_session(self, key: str) -> requests.Session:
+        retry = Retry(
+            total=self.retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=self.status_forcelist,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            max_retries=retry,
+        )
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        if self.user_agent:
+            session.headers["User-Agent"] = self.user_agent
+        session.hooks["response"].append(
+            lambda response, *args, **kwargs: self._record(key, response)
+        )
+        return session
+
+    def _record(self, key: str, response: requests.Response) -> None:
+        with self._lock:
+            metrics = self._metrics[key]
+            metrics["requests"] += 1
+            metrics["seconds"] += response.elapsed.total_seconds()
+            metrics["bytes"] += int(response.headers.get("Content-Length") or 0)
+            if response.status_code >= 400:
+                metrics["errors"] += 1
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        session = self.session_for(url)
+        start = time.perf_counter()
+        try:
+            return session.request(method, url, **kwargs)
+        except requests.RequestException:
+            with self._lock:
+                metrics = self._metrics[self.host_key(url)]
+                metrics["requests"] += 1
+                metrics["errors"] += 1
+                metrics["seconds"] += time.perf_counter() - start
+            raise
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def metrics(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {key: dict(value) for key, value in self._metrics.items()}
+
+    def metrics_lines(self):
+        return [
+            f"HTTP {key}: {metrics['requests']} requests, "
+            f"{metrics['errors']} errors, {metrics['seconds']:.2f}s, "
+            f"{metrics['bytes']} bytes"
+            for key, metrics in sorted(self.metrics().items())
+        ]
+
+    def log_metrics(self, level: int = logging.INFO) -> None:
+        for line in self.metrics_lines():
+            logging.log(level, line)
+
+    def close(self) -> None:
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions = {}
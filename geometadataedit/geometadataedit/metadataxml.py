@@ -0,0 +1,129 @@
+"""
+ArcGIS metadata XML edits without arcpy.
+
+AGSLMetadata used to serialize its tree into the arcpy metadata object, save
+it and parse the result again after every edit, and bind() and main() parsed
+xml_text once more to read single elements. A MetadataEditSession holds the
+one parsed tree of a dataset's metadata for all of its edits: lookups of the
+SEARCH_STRING_DICT paths are cached until an edit adds elements, and the
+caller writes the tree back once with tostring() when the session is dirty.
+
+The edits of write_identifiers() and update_agsl_hours() are plain functions
+of a session here, so they can be tested with ElementTree alone.
+"""
+
+import xml.etree.ElementTree as ET
+from typing import Dict, List, Optional, Union
+
+SEARCH_STRING_DICT = {
+    "altTitle": ".//idCitation/resAltTitle",
+    "rights": ".//othConsts",
+    "identCode": ".//citId/identCode",
+    "citationIdentifier": ".dataIdInfo/idCitation",
+    "metadataFileID": ".//mdFileID",
+    "datasetURI": ".//dataSetURI",
+    "contact": ".//rpCntInfo/cntHours/../..",  # code smell. This is only finding contacts that have hours listed.
+    "contactDisplayName": "./displayName",
+    "contactHours": ".//cntHours",
+    "timeRangeBegin": ".//tmBegin",
+    "timeRangeEnd": ".//tmEnd",
+    "timeInstantExtent": ".//tmPosition",
+}
+
+AGSL_HOURS = "Monday – Friday: 9:00am – 4:30pm"
+
+
+class MetadataEditSession:
+    def __init__(self, xml: Union[str, bytes, ET.Element]):
+        self.root: ET.Element = ET.fromstring(xml) if not ET.iselement(xml) else xml
+        self.dirty = False
+        self._cache: Dict[str, List[ET.Element]] = {}
+
+    @staticmethod
+    def path(key: str) -> str:
+        """The ElementPath for a SEARCH_STRING_DICT key, or key itself."""
+        return SEARCH_STRING_DICT.get(key, key)
+
+    def findall(self, key: str) -> List[ET.Element]:
+        # Most keys are ".//" searches of the whole tree; each runs once per
+        # session unless an edit changes the tree's structure.
+        if key not in self._cache:
+            self._cache[key] = self.root.findall(self.path(key))
+        return self._cache[key]
+
+    def find(self, key: str) -> Optional[ET.Element]:
+        found = self.findall(key)
+        return found[0] if found else None
+
+    def text(self, key: str) -> Optional[str]:
+        element = self.find(key)
+        return None if element is None else element.text
+
+    def set_text(self, element: ET.Element, text: str) -> None:
+        if element.text != text:
+            element.text = text
+            self.dirty = True
+
+    def subelement(self, parent: ET.Element, tag: str, **attrib) -> ET.Element:
+        element = ET.SubElement(parent, tag, **attrib)
+        self._cache.clear()
+        self.dirty = True
+        return element
+
+    def tostring(self) -> bytes:
+        return ET.tostring(self.root)
+
+    def flushed(self) -> None:
+        """Mark the tree as written back to the metadata object."""
+        self.dirty = False
+
+
+def write_identifiers(
+    session: MetadataEditSession, ark_uri: str, md_file_id: str, download_uri: str
+) -> None:
+    """Write the citation identifier, metadata file ID and dataset URI."""
+    identCode_Element = session.find("identCode")
+    if identCode_Element is None:
+        dataset_idCitation_Element = session.find("citationIdentifier")
+        citId_Element = session.subelement(dataset_idCitation_Element, "citId", xmls="")
+        identCode_Element = session.subelement(citId_Element, "identCode")
+    session.set_text(identCode_Element, ark_uri)
+
+    # Write the Metadata File ID Code:
+    dataset_mdFileID_Element = session.find("metadataFileID")
+    if dataset_mdFileID_Element is None:
+        dataset_mdFileID_Element = session.subelement(session.root, "mdFileID")
+    session.set_text(dataset_mdFileID_Element, md_file_id)
+
+    # Write the Dataset URI:
+    dataset_dataSetURI_Element = session.find("datasetURI")
+    if dataset_dataSetURI_Element is None:
+        dataset_dataSetURI_Element = session.subelement(session.root, "dataSetURI")
+    session.set_text(dataset_dataSetURI_Element, download_uri)
+
+
+def update_agsl_hours(session: MetadataEditSession, hours: str = AGSL_HOURS) -> int:
+    """Set the hours of every AGSL contact; returns how many were updated."""
+    contact_list = session.findall("contact")
+
+    if len(contact_list) < 1:
+        print("No contacts found!")
+        return 0
+    print(f"{len(contact_list)} contacts found.")
+
+    updated = 0
+    for contact in contact_list:
+        org = contact.find(SEARCH_STRING_DICT["contactDisplayName"])
+
+        if org is None:
+            print("no org text!")
+            return updated
+
+        if "American Geographical" in org.text:
+            hours_Element = contact.find(SEARCH_STRING_DICT["contactHours"])
+            session.set_text(hours_Element, hours)
+            updated += 1
+            print(
+                f"Updated {contact.tag}/rpCntInfo/cntHours.text to {hours_Element.text}"
+            )
+    return updated
@@ -1,18 +1,356 @@
 """
-Move datasets according to a csv of dataset directory paths
+Move datasets according to a csv of dataset directory paths.
+
+Each row of the manifest is a dataset directory and, optionally, where it
+should go; rows with only a source are moved into the destination directory
+given on the command line. The moves are planned before anything is touched:
+a source and destination on the same device are renamed, which is instant
+even for a large geodatabase, and everything else is copied, several
+datasets at a time on a thread pool.
+
+A copy goes to a NAME.partial directory next to its destination, hashing
+every file as it is written; the copy is read back and compared with those
+hashes before it is renamed into place and the source is deleted. The state
+of every move is kept in a SQLite journal next to the manifest, so running
+the same command again after an interruption skips the moves that finished,
+finishes the ones that were verified and starts the rest over without any
+manual cleanup. A verified copy that has gone missing is copied again; the
+source is only deleted once its copy is at the destination.
+
+Usage: python movedatasets.py MANIFEST [DEST_DIR] [--journal PATH]
+                              [--workers N] [--dry-run]
 """
 
-from pathlib import Path
+import argparse
 import csv
+import errno
+import hashlib
+import os
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+
+COPY_WORKERS = 4
+CHUNK_SIZE = 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS moves (
+    source TEXT PRIMARY KEY,
+    destination TEXT NOT NULL,
+    method TEXT NOT NULL,
+    state TEXT NOT NULL,
+    error TEXT,
+    updated TEXT NOT NULL
+);
+"""
+
+# Journal states, in the order a move goes through them.
+PLANNED = "planned"
+COPYING = "copying"
+# Copied and checked; the copy may still be at its .partial path.
+VERIFIED = "verified"
+DONE = "done"
+FAILED = "failed"
+
+
+class MoveError(Exception):
+    pass
+
+
+class Move(NamedTuple):
+    source: Path
+    destination: Path
+    # "rename" on the same device, otherwise "copy".
+    method: str
+
+
+class MoveResult(NamedTuple):
+    move: Move
+    state: str
+    error: Optional[str] = None
+
+
+def timestamp() -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def partial_path(destination: Path) -> Path:
+    return destination.with_name(f"{destination.name}.partial")
+
+
+def read_manifest(
+    path: Path, destination_dir: Optional[Path] = None
+) -> List[Tuple[Path, Path]]:
+    """(source, destination) pairs from rows of `source[,destination]`."""
+    pairs = []
+    with open(path, newline="", encoding="utf-8-sig") as file:
+        for line, row in enumerate(csv.reader(file), start=1):
+            row = [column.strip() for column in row]
+            if not row or not row[0]:
+                continue
+            source = Path(row[0])
+            if len(row) > 1 and row[1]:
+                destination = Path(row[1])
+            elif destination_dir is not None:
+                destination = Path(destination_dir) / source.name
+            else:
+                raise MoveError(f"{path}:{line}: no destination for {source}")
+            pairs.append((source, destination))
+    return pairs
+
+
+def same_device(source: Path, destination: Path) -> bool:
+    """Whether source can be renamed to destination (or its nearest parent)."""
+    parent = destination.parent
+    while not parent.exists() and parent != parent.parent:
+        parent = parent.parent
+    return os.stat(source).st_dev == os.stat(parent).st_dev
+
+
+def hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while chunk := file.read(CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def copy_file(source: Path, destination: Path) -> str:
+    """Copy one file, returning the sha256 of what was read."""
+    digest = hashlib.sha256()
+    with open(source, "rb") as reader, open(destination, "wb") as writer:
+        while chunk := reader.read(CHUNK_SIZE):
+            digest.update(chunk)
+            writer.write(chunk)
+    shutil.copystat(source, destination)
+    return digest.hexdigest()
+
+
+def copy_tree(source: Path, destination: Path) -> Dict[str, str]:
+    """Copy a directory tree; returns {relative path: sha256} of its files."""
+    hashes = {}
+    for dirpath, dirnames, filenames in os.walk(source):
+        relative = Path(dirpath).relative_to(source)
+        (destination / relative).mkdir(parents=True, exist_ok=True)
+        for filename in filenames:
+            hashes[(relative / filename).as_posix()] = copy_file(
+                Path(dirpath) / filename, destination / relative / filename
+            )
+    return hashes
+
+
+def verify_tree(directory: Path, hashes: Dict[str, str]) -> List[str]:
+    """Differences between the files under directory and hashes."""
+    problems = []
+    found = set()
+    for dirpath, _, filenames in os.walk(directory):
+        for filename in filenames:
+            path = Path(dirpath) / filename
+            name = path.relative_to(directory).as_posix()
+            found.add(name)
+            if name not in hashes:
+                problems.append(f"{name}: not in the source")
+            elif hash_file(path) != hashes[name]:
+                problems.append(f"{name}: sha256 differs from the source")
+    problems.extend(f"{name}: missing" for name in sorted(hashes.keys() - found))
+    return problems
+
+
+class MoveJournal:
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Copy workers record their progress from their own threads.
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.db.close()
+
+    def __enter__(self) -> "MoveJournal":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def state(self, source: Path) -> Optional[str]:
+        with self._lock:
+            row = self.db.execute(
+                "SELECT state FROM moves WHERE source = ?", (str(source),)
+            ).fetchone()
+        return row[0] if row else None
+
+    def record(self, move: Move, state: str, error: Optional[str] = None) -> None:
+        with self._lock, self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO moves VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    str(move.source),
+                    str(move.destination),
+                    move.method,
+                    state,
+                    error,
+                    timestamp(),
+                ),
+            )
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(
+                self.db.execute("SELECT state, COUNT(*) FROM moves GROUP BY state")
+            )
+
+
+class Relocator:
+    def __init__(self, journal: MoveJournal, workers: int = COPY_WORKERS):
+        self.journal = journal
+        self.workers = workers
+
+    def plan(self, pairs: List[Tuple[Path, Path]]) -> List[Move]:
+        """Moves for the manifest's pairs; raises MoveError for bad rows."""
+        moves, problems = [], []
+        sources, destinations = set(), set()
+        for source, destination in pairs:
+            if source in sources or destination in destinations:
+                problems.append(f"{source} -> {destination}: listed twice")
+                continue
+            sources.add(source)
+            destinations.add(destination)
+            state = self.journal.state(source)
+            if state in (DONE, VERIFIED) or (
+                not source.exists() and destination.exists()
+            ):
+                # Finished, or moved before the journal could record it.
+                moves.append(Move(source, destination, "copy"))
+            elif not source.is_dir():
+                problems.append(f"{source}: not a directory")
+            elif destination.exists():
+                problems.append(f"{destination}: already exists")
+            else:
+                method = "rename" if same_device(source, destination) else "copy"
+                moves.append(Move(source, destination, method))
+        if problems:
+            raise MoveError("\n".join(problems))
+        return moves
+
+    def run(self, moves: List[Move]) -> List[MoveResult]:
+        """Renames in order, then the copies in parallel; results in the order of moves."""
+        results: List[Optional[MoveResult]] = [None] * len(moves)
+        copies = []
+        for position, move in enumerate(moves):
+            if self.journal.state(move.source) == DONE:
+                results[position] = MoveResult(move, DONE)
+            elif not move.source.exists() and move.destination.exists():
+                self.journal.record(move, DONE)
+                results[position] = MoveResult(move, DONE)
+            elif move.method == "rename":
+                results[position] = self._attempt(self.rename, move)
+            else:
+                copies.append(position)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            copied = executor.map(
+                lambda position: self._attempt(self.copy, moves[position]), copies
+            )
+            for position, result in zip(copies, copied):
+                results[position] = result
+        return results
+
+    def _attempt(self, how, move: Move) -> MoveResult:
+        try:
+            how(move)
+        except (OSError, MoveError) as error:
+            # A verified copy stays verified, so the next run only finishes it.
+            state = self.journal.state(move.source)
+            self.journal.record(
+                move, VERIFIED if state == VERIFIED else FAILED, str(error)
+            )
+            return MoveResult(move, FAILED, str(error))
+        self.journal.record(move, DONE)
+        return MoveResult(move, DONE)
+
+    def rename(self, move: Move) -> None:
+        self.journal.record(move, PLANNED)
+        move.destination.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            move.source.rename(move.destination)
+        except OSError as error:
+            if error.errno != errno.EXDEV:
+                raise
+            # Mount points the device check could not see; copy instead.
+            self.copy(move._replace(method="copy"))
+
+    def copy(self, move: Move) -> None:
+        partial = partial_path(move.destination)
+        state = self.journal.state(move.source)
+        if state == VERIFIED and not (partial.exists() or move.destination.exists()):
+            # The verified copy is gone; the source is all there is.
+            self.journal.record(move, PLANNED)
+            state = PLANNED
+        if state != VERIFIED:
+            if not move.source.is_dir():
+                raise MoveError(f"{move.source}: not a directory")
+            # Whatever an interrupted copy left behind is started over.
+            if partial.exists():
+                shutil.rmtree(partial)
+            self.journal.record(move, COPYING)
+            hashes = copy_tree(move.source, partial)
+            problems = verify_tree(partial, hashes)
+            if problems:
+                raise MoveError(f"{move.destination}: " + "; ".join(problems))
+            self.journal.record(move, VERIFIED)
+        if partial.exists():
+            partial.rename(move.destination)
+        # Only a copy that is in place lets the source go.
+        if move.destination.exists() and move.source.exists():
+            shutil.rmtree(move.source)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    arg_parser = argparse.ArgumentParser(
+        description="Move dataset directories listed in a csv manifest."
+    )
+    arg_parser.add_argument("manifest", type=Path, help="csv of source[,destination]")
+    arg_parser.add_argument(
+        "destination", type=Path, nargs="?", help="For rows without a destination"
+    )
+    arg_parser.add_argument(
+        "--journal", type=Path, help="Default: MANIFEST.journal.sqlite3"
+    )
+    arg_parser.add_argument("--workers", type=int, default=COPY_WORKERS)
+    arg_parser.add_argument(
+        "--dry-run", action="store_true", help="Print the plan and stop"
+    )
+    args = arg_parser.parse_args(argv)
+    journal_path = args.journal or args.manifest.with_suffix(".journal.sqlite3")
+
+    with MoveJournal(journal_path) as journal:
+        relocator = Relocator(journal, args.workers)
+        try:
+            moves = relocator.plan(read_manifest(args.manifest, args.destination))
+        except MoveError as error:
+            print(error, file=sys.stderr)
+            return 2
+        if args.dry_run:
+            for move in moves:
+                state = journal.state(move.source) or move.method
+                print(f"{state}: {move.source} -> {move.destination}")
+            return 0
+        results = relocator.run(moves)
+
+    failed = [result for result in results if result.state == FAILED]
+    for result in failed:
+        print(f"Failed: {result.move.source}: {result.error}", file=sys.stderr)
+    print(f"Moved {len(results) - len(failed)} of {len(results)} datasets")
+    if failed:
+        print(f"Run again to retry; progress is kept in {journal_path}")
+    return 1 if failed else 0
+
 
-movecsv_path = Path(r"C:\Users\srappel\Desktop\redo.csv")
-destpath = Path(
-    r"S:\GeoBlacklight\project-files\fileProcessing\failed_metadata_processing"
-)
-movecsv = open(movecsv_path, "r")
-reader = csv.reader(movecsv)
-
-for row in reader:
-    dirpath = Path(row[0])
-    output = destpath / dirpath.stem
-    dirpath.rename(output)
+if __name__ == "__main__":
+    sys.exit(main())
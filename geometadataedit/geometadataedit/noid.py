@@ -0,0 +1,172 @@
+"""
+Batched NOID client.
+
+NOID runs every line of a POST to `NOID_URL-` as a separate command and ends
+each command's output with a blank line, which is how AGSLMetadata.bind()
+already sends its `bind set` lines in one request. NoidBatchClient does the
+same for mint, fetch and bind across many ARKs: commands are packed into POST
+bodies of at most max_commands lines and max_bytes bytes, and the output is
+split back into one block per command, so re-pointing 5,000 ARKs takes a
+handful of requests instead of one GET per ARK.
+"""
+
+import os
+import re
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+from geometadataedit.http_client import HttpClient
+
+ARK_REGEX = r"(\d{5})\/(\w{11})"
+NOID_LINE = re.compile(r"^([\w.-]+):\s*(.*)$")
+# Every ARK's `where` points at its record in the GeoDiscovery catalog.
+CATALOG_URL = "https://geodiscovery.uwm.edu/catalog/"
+
+MAX_COMMANDS = int(os.getenv("NOID_BATCH_COMMANDS", 500))
+MAX_BYTES = int(os.getenv("NOID_BATCH_BYTES", 256 * 1024))
+
+
+class NoidError(Exception):
+    pass
+
+
+def expected_where(ark: str) -> str:
+    naan, name = re.fullmatch(ARK_REGEX, ark).groups()
+    return f"{CATALOG_URL}ark:-{naan}-{name}"
+
+
+def bind_command(how: str, arkid: str, element: str, value: str = "") -> str:
+    """One `bind` line, quoted like AGSLMetadata.bind() writes them."""
+    if how == "purge":
+        return f"bind purge {arkid} {element}"
+    value = " ".join(str(value).splitlines())
+    return f'bind {how} {arkid} {element} "{value}"'
+
+
+def parse_elements(block: str) -> Dict[str, str]:
+    """The element: value lines of a fetch output block."""
+    elements = {}
+    for line in block.splitlines():
+        match = NOID_LINE.match(line.strip())
+        if match:
+            elements[match[1]] = match[2].strip()
+    return elements
+
+
+def split_blocks(text: str) -> List[str]:
+    """Split batch output into the blank-line terminated block of each command."""
+    blocks, lines = [], []
+    for line in text.splitlines():
+        if line.strip():
+            lines.append(line)
+        else:
+            blocks.append("\n".join(lines))
+            lines = []
+    if lines:
+        blocks.append("\n".join(lines))
+    return blocks
+
+
+def is_error(block: str) -> bool:
+    return block.lstrip().lower().startswith("error")
+
+
+class NoidBatchClient:
+    def __init__(
+        self,
+        noid_url: str,
+        http: Optional[HttpClient] = None,
+        max_commands: int = MAX_COMMANDS,
+        max_bytes: int = MAX_BYTES,
+    ):
+        # NOID_URL in .env ends with the "?" that starts the command.
+        self.base_url = noid_url.rstrip("?")
+        self.http = http or HttpClient()
+        self.max_commands = max_commands
+        self.max_bytes = max_bytes
+        self.requests = 0
+
+    def batches(self, commands: Iterable[str]) -> Iterator[List[str]]:
+        batch, size = [], 0
+        for command in commands:
+            length = len(command.encode("utf-8")) + 1
+            if batch and (
+                len(batch) >= self.max_commands or size + length > self.max_bytes
+            ):
+                yield batch
+                batch, size = [], 0
+            batch.append(command)
+            size += length
+        if batch:
+            yield batch
+
+    def run(self, commands: Iterable[str]) -> List[str]:
+        """Run commands in batched POSTs; returns one output block per command."""
+        outputs = []
+        for batch in self.batches(commands):
+            response = self.http.post(
+                f"{self.base_url}?-", data="\n".join(batch) + "\n"
+            )
+            self.requests += 1
+            if response.status_code != 200:
+                raise NoidError(
+                    f"NOID returned {response.status_code} for a batch of "
+                    f"{len(batch)} commands"
+                )
+            blocks = split_blocks(response.text)
+            if len(blocks) != len(batch):
+                raise NoidError(
+                    f"NOID answered {len(blocks)} blocks for {len(batch)} commands"
+                )
+            outputs.extend(blocks)
+        return outputs
+
+    def mint(self, count: int) -> List[str]:
+        """Mint count new ARKs."""
+        sizes = [self.max_commands] * (count // self.max_commands)
+        if count % self.max_commands:
+            sizes.append(count % self.max_commands)
+        arkids = []
+        for block in self.run(f"mint {size}" for size in sizes):
+            if is_error(block):
+                raise NoidError(f"Mint failed: {block}")
+            arkids += [match[0] for match in re.finditer(ARK_REGEX, block)]
+        if len(arkids) != count:
+            raise NoidError(f"Asked NOID for {count} ARKs and got {len(arkids)}")
+        return arkids
+
+    def fetch(
+        self, arkids: Iterable[str]
+    ) -> Tuple[Dict[str, Dict[str, str]], Dict[str, str]]:
+        """
+        The bound elements of each ARK, without the id line, and the error
+        NOID reported for each ARK it could not fetch: (records, errors).
+        """
+        arkids = list(arkids)
+        records, errors = {}, {}
+        for arkid, block in zip(arkids, self.run(f"fetch {arkid}" for arkid in arkids)):
+            if is_error(block):
+                errors[arkid] = block.strip()
+                continue
+            elements = parse_elements(block)
+            elements.pop("id", None)
+            elements.pop("note", None)
+            records[arkid] = elements
+        return records, errors
+
+    def bind(
+        self, bindings: Mapping[str, Mapping[str, str]], how: str = "set"
+    ) -> Dict[str, Optional[str]]:
+        """
+        Bind the given elements of each ARK. Returns, per ARK, None when every
+        element was bound or the first error NOID reported.
+        """
+        targets, commands = [], []
+        for arkid, elements in bindings.items():
+            for element, value in elements.items():
+                targets.append(arkid)
+                commands.append(bind_command(how, arkid, element, value))
+        results = {arkid: None for arkid in bindings}
+        for arkid, block in zip(targets, self.run(commands)):
+            if is_error(block) and results[arkid] is None:
+                results[arkid] = block.strip()
+        return results
@@ -0,0 +1,129 @@
+"""
+Staged pipeline runner.
+
+Runs each job through a sequence of stages, every stage with its own pool of
+worker threads, so a slow stage for one job overlaps with other stages of the
+jobs around it: batchingest.py zips and copies one dataset to the file
+server while the next is being bound in NOID and the one after that is
+prepared with arcpy. A job that raises in a stage leaves the pipeline there.
+
+A stage with no workers runs on the thread that called run(), one job at a
+time, while the worker stages carry on with the jobs it has finished. arcpy
+is not documented as safe off the main thread, so batchingest.py prepares
+datasets this way.
+
+The on_failure and on_success callbacks are called on the thread that called
+run(), one at a time, so they can write logs and clean up without locking.
+"""
+
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+
+class Stage(NamedTuple):
+    name: str
+    # Called with the job; raises to fail it.
+    run: Callable[[Any], Any]
+    # 0 runs the stage on the thread that called Pipeline.run().
+    workers: int = 1
+
+
+class PipelineResult(NamedTuple):
+    job: Any
+    # The stage the job failed in, or None if it went through every stage.
+    failed_stage: Optional[str] = None
+    error: Optional[BaseException] = None
+
+
+class Pipeline:
+    def __init__(
+        self,
+        stages: List[Stage],
+        on_failure: Optional[Callable[[Any, Stage, BaseException], None]] = None,
+        on_success: Optional[Callable[[Any], None]] = None,
+    ):
+        self.stages = stages
+        self.on_failure = on_failure
+        self.on_success = on_success
+
+    def run(self, jobs: Iterable[Any]) -> List[PipelineResult]:
+        """Run every job through the stages; results are in the order of jobs."""
+        jobs = list(jobs)
+        results: List[Optional[PipelineResult]] = [None] * len(jobs)
+        executors = [
+            (
+                ThreadPoolExecutor(
+                    max_workers=stage.workers, thread_name_prefix=stage.name
+                )
+                if stage.workers
+                else None
+            )
+            for stage in self.stages
+        ]
+        pending: Dict[Future, Tuple[int, int]] = {}
+        # Jobs waiting for a stage that runs on this thread, in order.
+        waiting: Deque[Tuple[int, int]] = deque()
+
+        def submit(position: int, stage_index: int) -> None:
+            executor = executors[stage_index]
+            if executor is None:
+                waiting.append((position, stage_index))
+                return
+            future = executor.submit(self.stages[stage_index].run, jobs[position])
+            pending[future] = (position, stage_index)
+
+        def finish(
+            position: int, stage_index: int, error: Optional[BaseException]
+        ) -> None:
+            job, stage = jobs[position], self.stages[stage_index]
+            if error is not None:
+                results[position] = PipelineResult(job, stage.name, error)
+                if self.on_failure:
+                    self.on_failure(job, stage, error)
+            elif stage_index + 1 < len(self.stages):
+                submit(position, stage_index + 1)
+            else:
+                results[position] = PipelineResult(job)
+                if self.on_success:
+                    self.on_success(job)
+
+        try:
+            # The first stage's queue keeps the jobs in order; later stages
+            # take them as they come out of the one before.
+            for position in range(len(jobs)):
+                submit(position, 0)
+            while pending or waiting:
+                # Pass on what the workers finished before running the next
+                # job here, so they are not left idle while it runs.
+                done, _ = wait(
+                    pending,
+                    timeout=0 if waiting else None,
+                    return_when=FIRST_COMPLETED,
+                )
+                for future in done:
+                    position, stage_index = pending.pop(future)
+                    finish(position, stage_index, future.exception())
+                if waiting:
+                    position, stage_index = waiting.popleft()
+                    try:
+                        self.stages[stage_index].run(jobs[position])
+                    except Exception as error:
+                        finish(position, stage_index, error)
+                    else:
+                        finish(position, stage_index, None)
+        finally:
+            for executor in executors:
+                if executor is not None:
+                    executor.shutdown(wait=True, cancel_futures=True)
+        return results
@@ -0,0 +1,74 @@
+"""
+Dataset directory scanner.
+
+Classifies a dataset directory for Dataset.fetch_dataset_from_directory() in
+one os.scandir() traversal, without arcpy. A file geodatabase is counted as
+one dataset and never entered, so the thousands of internal files of a large
+geodatabase are not listed; the path of the first dataset of each type is
+kept, so the caller does not glob the directory again to find it.
+"""
+
+import os
+from enum import IntEnum
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional
+
+
+class DatasetType(IntEnum):
+    ERROR = 0
+    SHAPEFILE = 1
+    FILE_GEODATABASE = 2
+    ARCGRID = 3
+    TIFF = 4
+    MULTIPLE = 5
+
+
+SUFFIXES = {
+    ".shp": DatasetType.SHAPEFILE,
+    ".gdb": DatasetType.FILE_GEODATABASE,
+    ".adf": DatasetType.ARCGRID,
+    ".tif": DatasetType.TIFF,
+}
+
+
+class ScanResult(NamedTuple):
+    datatype: DatasetType
+    # The dataset to open: the .shp, .gdb or .tif, or an ArcGRID's .adf.
+    path: Optional[Path]
+    counts: Dict[DatasetType, int]
+
+
+def classify(counts: Dict[DatasetType, int]) -> DatasetType:
+    """The dataset type for the numbers of .shp, .gdb, .adf and .tif found."""
+    found = {datatype: count for datatype, count in counts.items() if count}
+    if not found:
+        return DatasetType.ERROR
+    if len(found) == 1:
+        ((datatype, count),) = found.items()
+        # An ArcGRID raster is a directory of several .adf files.
+        if count == 1 or datatype == DatasetType.ARCGRID:
+            return datatype
+    return DatasetType.MULTIPLE
+
+
+def scan_dataset(rootdir: Path) -> ScanResult:
+    counts = {datatype: 0 for datatype in SUFFIXES.values()}
+    first: Dict[DatasetType, Path] = {}
+    stack = [os.fspath(rootdir)]
+    while stack:
+        with os.scandir(stack.pop()) as scanner:
+            entries = sorted(scanner, key=lambda entry: entry.name)
+        subdirectories = []
+        for entry in entries:
+            datatype = SUFFIXES.get(os.path.splitext(entry.name)[1].lower())
+            if datatype is not None:
+                counts[datatype] += 1
+                first.setdefault(datatype, Path(entry.path))
+            if datatype != DatasetType.FILE_GEODATABASE and entry.is_dir(
+                follow_symlinks=False
+            ):
+                subdirectories.append(entry.path)
+        # Reversed so the stack visits subdirectories in name order.
+        stack.extend(reversed(subdirectories))
+    datatype = classify(counts)
+    return ScanResult(datatype, first.get(datatype), counts)
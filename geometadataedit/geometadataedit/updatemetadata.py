@@ -5,7 +5,6 @@ Tools for updating AGSL metadata for GeoDiscovery
 import arcpy
 import requests
 import re
-import zipfile
 import os
 
 import xml.etree.ElementTree as ET
@@ -17,6 +16,14 @@ from enum import Enum
 
 from dotenv import load_dotenv
 
+from geometadataedit.http_client import HttpClient, settings_from_env
+from geometadataedit.noid import NoidBatchClient, bind_command
+from arkpool import ArkPool
+from zippackage import ZipPackager, manifest_path
+from scan import DatasetType, scan_dataset
+import metadataxml
+from metadataxml import SEARCH_STRING_DICT, MetadataEditSession
+
 load_dotenv()
 
 # .env settings
@@ -26,22 +33,27 @@ REDIRECT_URL = os.getenv("REDIRECT_URL")
 NOID_URL = os.getenv("NOID_URL")
 FILE_SERVER_PATH = os.getenv("FILE_SERVER_PATH")
 
-ARK_REGEX = r"(\d{5})\/(\w{11})"
+# NOID requests share kept-alive connections; tune with the HTTP_* settings.
+HTTP = HttpClient.from_config(settings_from_env())
+# Minting is not idempotent: a retried mint whose first response was lost
+# burns an ARK, so mint requests are never retried.
+MINT_HTTP = HttpClient.from_config({**settings_from_env(), "retries": 0})
+
+# Pre-minted ARKs for batch ingest; leave ARK_POOL_PATH unset to mint one
+# ARK per dataset as before.
+ARK_POOL_PATH = os.getenv("ARK_POOL_PATH")
+ARK_POOL = None
+if ARK_POOL_PATH:
+    ARK_POOL = ArkPool(
+        NoidBatchClient(NOID_URL, MINT_HTTP),
+        ARK_POOL_PATH,
+        refill_size=int(os.getenv("ARK_POOL_REFILL", 100)),
+    )
+
+# Deliverable zips: deflate level for files that are not already compressed.
+PACKAGER = ZipPackager(level=int(os.getenv("ZIP_DEFLATE_LEVEL", 3)))
 
-SEARCH_STRING_DICT = {
-    "altTitle": ".//idCitation/resAltTitle",
-    "rights": ".//othConsts",
-    "identCode": ".//citId/identCode",
-    "citationIdentifier": ".dataIdInfo/idCitation",
-    "metadataFileID": ".//mdFileID",
-    "datasetURI": ".//dataSetURI",
-    "contact": ".//rpCntInfo/cntHours/../..",  # code smell. This is only finding contacts that have hours listed.
-    "contactDisplayName": "./displayName",
-    "contactHours": ".//cntHours",
-    "timeRangeBegin": ".//tmBegin",
-    "timeRangeEnd": ".//tmEnd",
-    "timeInstantExtent": ".//tmPosition",
-}
+ARK_REGEX = r"(\d{5})\/(\w{11})"
 
 
 class Dataset:
@@ -62,90 +74,19 @@ class Dataset:
         self.metadata: AGSLMetadata = AGSLMetadata(self.get_dataset_metadata())
 
     def fetch_dataset_from_directory(self) -> tuple[Path, int]:
-        def test_dataset_type(rootdir) -> int:
-            """Test Dataset Type
-            - Returns an integer for type:
-                - 0: Error
-                - 1: Shapefile
-                - 2: FileGeodatabase
-                - 3: ArcGRID Raster
-                - 4: TIFF
-                - 5: Other/Mutliple
-            """
-            rootdir = Path(rootdir)
-
-            gdb_count = 0
-            shp_count = 0
-            raster_count = 0
-            tiff_count = 0
-
-            for path in Path(rootdir).rglob("*"):
-                if path.suffix.lower() == ".gdb":
-                    gdb_count += 1
-                elif path.suffix.lower() == ".shp":
-                    shp_count += 1
-                elif path.suffix.lower() == ".adf":
-                    raster_count += 1
-                elif path.suffix.lower() == ".tif":
-                    tiff_count += 1
-                else:
-                    continue
-
-            print(f"Shapefile count: {shp_count}")
-            print(f"GDB count: {gdb_count}")
-            print(f"Raster count: {raster_count}")
-            print(f"TIFF count: {tiff_count}")
-
-            if (
-                gdb_count == 0
-                and shp_count == 0
-                and raster_count == 0
-                and tiff_count == 0
-            ):
-                return 0
-            elif (
-                gdb_count == 0
-                and shp_count == 1
-                and raster_count == 0
-                and tiff_count == 0
-            ):
-                return 1
-            elif (
-                gdb_count == 1
-                and shp_count == 0
-                and raster_count == 0
-                and tiff_count == 0
-            ):
-                return 2
-            elif (
-                gdb_count == 0
-                and shp_count == 0
-                and raster_count >= 1
-                and tiff_count == 0
-            ):
-                # Note that there might be more than one .adf file!
-                return 3
-            elif (
-                gdb_count == 0
-                and shp_count == 0
-                and raster_count == 0
-                and tiff_count == 1
-            ):
-                return 4
-            elif (gdb_count + shp_count + raster_count + tiff_count) > 1:
-                return 5
-            else:
-                return 0
-
-        dataset_type = test_dataset_type(self.path)
+        # One os.scandir() pass that does not enter .gdb directories; see scan.py.
+        scan = scan_dataset(self.path)
+        print(f"Shapefile count: {scan.counts[DatasetType.SHAPEFILE]}")
+        print(f"GDB count: {scan.counts[DatasetType.FILE_GEODATABASE]}")
+        print(f"Raster count: {scan.counts[DatasetType.ARCGRID]}")
+        print(f"TIFF count: {scan.counts[DatasetType.TIFF]}")
+        dataset_type = int(scan.datatype)
 
         if dataset_type != 0:  # 0 would mean there is an error
             if dataset_type == 1:  # Shapefile
-                dataset = next(self.path.rglob("*.shp"))
+                dataset = scan.path
             elif dataset_type == 2:  # FileGeodatabase
-                geodatabase = next(
-                    self.path.rglob("*.gdb")
-                )  # Path Representation of the geodatabase
+                geodatabase = scan.path  # Path Representation of the geodatabase
                 arcpy.env.workspace = str(
                     geodatabase
                 )  # This can't be a Path, it has to be a path as string.
@@ -230,23 +171,23 @@ class Dataset:
         self.fileserver_dir = fileserver_dir
         zipPath = fileserver_dir / f"{self.metadata.altTitle}.zip"
         self.fileserver_zip = zipPath
-        with zipfile.ZipFile(zipPath, mode="w") as archive:
-            for member in self.path.rglob("*"):
-                try:
-                    archive.write(member, member.relative_to(self.path))
-                except Exception as error:
-                    print(
-                        f"Warning: There was a problem adding {member.name} to the new zipfile"
-                    )
-                    print(error)
-                    print()
-                    continue
-        archive.close()
-
-        newzipfile = zipfile.ZipFile(zipPath)
+        self.fileserver_manifest = manifest_path(zipPath)
+
+        def skip_member(member, error):
+            print(
+                f"Warning: There was a problem adding {member.name} to the new zipfile"
+            )
+            print(error)
+            print()
+
+        # Streams straight to the file server; the manifest next to the zip
+        # holds the checksums zippackage.verify_package() checks against.
+        package = PACKAGER.package(self.path, zipPath, on_error=skip_member)
+
         print(f"\nContents of deliverable zipfile `{str(zipPath)}`")
-        newzipfile.printdir()
-        newzipfile.close()
+        for entry in package.entries:
+            print(f"{entry.name:<60} {entry.method:>8} {entry.size:>14}")
+        print(f"{package.size} bytes in {package.seconds:.2f}s")
 
         if zipPath.exists() == False:
             raise Exception("Unable to create the zip file.")
@@ -289,30 +230,41 @@ class AGSLMetadata:
     def __init__(self, dataset_metadata_tuple):
         self.xml_text: str = dataset_metadata_tuple[0]
         self.md_object: md.Metadata = dataset_metadata_tuple[1]
-        self.rootElement: ET.Element = dataset_metadata_tuple[2]
+        # Every edit goes to this one parsed tree; save() writes it back.
+        self.session = MetadataEditSession(dataset_metadata_tuple[2])
+        self.rootElement: ET.Element = self.session.root
         self.altTitle: str = self.get_alt_title()
         self.rights: str = self.rights_test()
         self.identifier: Identifier = Identifier()
+        self.cache_md_object_fields()
+
+    def cache_md_object_fields(self):
+        # bind() runs on the batch ingest's NOID threads, which must not touch
+        # the arcpy metadata object.
+        self.credits: str = self.md_object.credits
+        self.title: str = self.md_object.title
 
     def save(self):
-        self.md_object.xml = ET.tostring(self.rootElement)
+        # Edits only change the session, so this writes to the dataset once,
+        # before the metadata is exported, instead of after every edit.
+        if not self.session.dirty:
+            return
+        self.md_object.xml = self.session.tostring()
         self.md_object.save()
+        self.session.flushed()
         self.xml_text = self.md_object.xml
-        self.rootElement: ET.Element = ET.fromstring(self.xml_text)
         self.altTitle: str = self.get_alt_title()
+        self.cache_md_object_fields()
 
     def get_alt_title(self) -> str:
-        rootElement = self.rootElement
-        altTitle_Element = rootElement.find(SEARCH_STRING_DICT["altTitle"])
+        altTitle_Element = self.session.find("altTitle")
         if not altTitle_Element is None:
             return altTitle_Element.text
         else:
             raise Exception("Failed to get alt title element text.")
 
     def rights_test(self) -> str:
-        rights_list = self.rootElement.findall(
-            SEARCH_STRING_DICT["rights"]
-        )  # Returns a list
+        rights_list = self.session.findall("rights")  # Returns a list
         if len(rights_list) == 0:
             return "public"
         if "restricted" in rights_list[0].text.lower():
@@ -322,11 +274,9 @@ class AGSLMetadata:
 
     def get_existing_identifier_or_mint(self):  # Returns self.identifier
 
-        rootElement = self.rootElement
-
         def check_bind(check_id):
             print(NOID_URL)
-            get_request = requests.get(NOID_URL + f"+get+{check_id}")
+            get_request = HTTP.get(NOID_URL + f"+get+{check_id}")
 
             if get_request.status_code != 200:
                 raise Exception("No response from the Noid admin.")
@@ -340,17 +290,15 @@ class AGSLMetadata:
                 return True
 
         def new_identifier():  # Returns a new Identifier object that has been minted
+            if ARK_POOL is not None:
+                return Identifier.from_pool(ARK_POOL)
             new_identifier = Identifier()
             new_identifier.mint()  # This returns a response code, but we don't need it here.
             return new_identifier
 
-        if (
-            len(rootElement.findall(SEARCH_STRING_DICT["metadataFileID"])) > 0
-        ):  # There is a MDFILEID
+        if len(self.session.findall("metadataFileID")) > 0:  # There is a MDFILEID
             regex = re.compile(ARK_REGEX)
-            regex_result = regex.search(
-                rootElement.find(SEARCH_STRING_DICT["metadataFileID"]).text
-            )
+            regex_result = regex.search(self.session.text("metadataFileID"))
 
             if not regex_result is None:  # The regex DID find an arkid
                 existing_identifier = Identifier()
@@ -385,88 +333,25 @@ class AGSLMetadata:
         ark_URI: str = REDIRECT_URL + "/ark:/" + self.identifier.arkid
         download_URI: str = f"{FILE_SERVER_URL}{self.rights}/{self.identifier.assignedName}/{self.altTitle}.zip"
 
-        def check_if_existing_identifier(root, find_string) -> bool:
-            if len(root.findall(find_string)) > 0:
-                return True
-            else:
-                return False
-
-        if check_if_existing_identifier(
-            self.rootElement, SEARCH_STRING_DICT["identCode"]
-        ):
-            identCode_Element = self.rootElement.find(SEARCH_STRING_DICT["identCode"])
-        else:
-            dataset_idCitation_Element = self.rootElement.find(
-                SEARCH_STRING_DICT["citationIdentifier"]
-            )
-            citId_Element = ET.SubElement(dataset_idCitation_Element, "citId", xmls="")
-            identCode_Element = ET.SubElement(citId_Element, "identCode")
-
-        identCode_Element.text = ark_URI
-
-        # Write the Metadata File ID Code:
-        if check_if_existing_identifier(
-            self.rootElement, SEARCH_STRING_DICT["metadataFileID"]
-        ):
-            dataset_mdFileID_Element = self.rootElement.find(
-                SEARCH_STRING_DICT["metadataFileID"]
-            )
-        else:
-            dataset_mdFileID_Element = ET.SubElement(self.rootElement, "mdFileID")
-
-        dataset_mdFileID_Element.text = f"ark:/{self.identifier.arkid}"
-
-        # Write the Dataset URI:
-        if check_if_existing_identifier(
-            self.rootElement, SEARCH_STRING_DICT["datasetURI"]
-        ):
-            dataset_dataSetURI_Element = self.rootElement.find(
-                SEARCH_STRING_DICT["datasetURI"]
-            )
-        else:
-            dataset_dataSetURI_Element = ET.SubElement(self.rootElement, "dataSetURI")
-
-        dataset_dataSetURI_Element.text = download_URI
-
-        self.save()
+        # The edits stay in the session until save().
+        metadataxml.write_identifiers(
+            self.session, ark_URI, f"ark:/{self.identifier.arkid}", download_URI
+        )
 
         return
 
     def update_agsl_hours(self) -> None:
-        # Find all the AGSL contacts
-        contact_list = self.rootElement.findall(
-            ".//rpCntInfo/cntHours/../.."
-        )  # Returns a list
-
-        if len(contact_list) < 1:
-            print("No contacts found!")
-            return rootElement
-        else:
-            print(f"{len(contact_list)} contacts found.")
-
-        for contact in contact_list:
-            org = contact.find("./displayName")
-
-            if not org is None:
-                org_text = org.text
-            else:
-                print("no org text!")
-                return
-
-            if "American Geographical" in org_text:
-                hours_Element = contact.find(".//cntHours")
-                hours_Element.text = "Monday – Friday: 9:00am – 4:30pm"
-                print(
-                    f"Updated {contact.tag}/rpCntInfo/cntHours.text to {hours_Element.text}"
-                )
-
-        self.save()
+        # Find all the AGSL contacts and set their hours in the session.
+        metadataxml.update_agsl_hours(self.session)
 
         return
 
     def dual_metadata_export(
         self, md_outputdir=None, md_filename=None
     ) -> tuple[Path, Path]:
+        # Write the session's edits to the dataset before exporting them.
+        self.save()
+
         dataset_path = Path(self.md_object.uri)
 
         if md_outputdir is None:
@@ -513,9 +398,9 @@ class AGSLMetadata:
         binder = NOID_URL + "-"
 
         def create_bind_params(metadata) -> dict:
-            root_Element = ET.fromstring(metadata.xml_text)
+            session = metadata.session
 
-            download_URI = root_Element.find(SEARCH_STRING_DICT["datasetURI"]).text
+            download_URI = session.text("datasetURI")
 
             metadata_URL = (
                 f"{FILE_SERVER_URL}metadata/{self.identifier.assignedName}_ISO.xml"
@@ -523,18 +408,20 @@ class AGSLMetadata:
 
             application_URL = f"{APPLICATION_URL}catalog/ark:-{self.identifier.arkid.replace('/','-')}"
 
-            try:
-                tmBegin = root_Element.find(".//tmBegin").text
-                tmEnd = root_Element.find(".//tmEnd").text
+            if session.find("timeRangeBegin") is not None and (
+                session.find("timeRangeEnd") is not None
+            ):
+                tmBegin = session.text("timeRangeBegin")
+                tmEnd = session.text("timeRangeEnd")
                 date_when = f"{tmBegin}/{tmEnd}"
-            except:
-                date_when = root_Element.find(".//tmPosition").text
+            else:
+                date_when = session.text("timeInstantExtent")
 
             time_now = datetime.now().replace(microsecond=0).isoformat()
 
             parameter_dictionary = {
-                "who": f"{metadata.md_object.credits}",
-                "what": f"{metadata.md_object.title}",
+                "who": f"{metadata.credits}",
+                "what": f"{metadata.title}",
                 "when": f"{date_when}",
                 "where": f"{application_URL}",
                 "meta-who": "University of Wisconsin-Milwaukee Libraries",
@@ -546,16 +433,14 @@ class AGSLMetadata:
             return parameter_dictionary
 
         def construct_bind_request(arkid, bind_params) -> str:
-            param_string = ""
-            if purge == False:
-                for key, value in bind_params.items():
-                    param_string = (
-                        param_string + f'bind set {arkid} {key} "{value}"' + "\n"
-                    )
-            else:
+            how = "set"
+            if purge:
                 print("### PURGE PURGE PURGE ###")
-                for key, value in bind_params.items():
-                    param_string = param_string + f"bind purge {arkid} {key}" + "\n"
+                how = "purge"
+            param_string = "".join(
+                bind_command(how, arkid, key, value) + "\n"
+                for key, value in bind_params.items()
+            )
 
             print(param_string)
             return param_string
@@ -566,7 +451,7 @@ class AGSLMetadata:
         )
 
         try:
-            r = requests.post(binder, data=bind_params_commands)
+            r = HTTP.post(binder, data=bind_params_commands)
         except:
             print(
                 "There was a connection error! Check the URL you used to bind the id!"
@@ -584,13 +469,14 @@ class Identifier:
     arkid: str
     nameAuthorityNumber: str
     assignedName: str
+    pool: ArkPool = None
 
     def mint(self) -> requests.models.Response:
 
         minter = NOID_URL + "mint+1"
 
         try:
-            mint_request = requests.get(minter)
+            mint_request = MINT_HTTP.get(minter)
         except Exception as ex:
             print(ex)
             return
@@ -612,6 +498,40 @@ class Identifier:
                 print(f"mint request status code = {mint_request.status_code}")
                 return mint_request
 
+    @classmethod
+    def from_arkid(cls, arkid: str) -> "Identifier":
+        identifier = cls()
+        identifier.arkid = arkid
+        identifier.nameAuthorityNumber, identifier.assignedName = arkid.split("/")
+        return identifier
+
+    @classmethod
+    def mint_many(cls, count: int) -> list["Identifier"]:
+        """Mint count identifiers in batched POSTs instead of one GET each."""
+        return [
+            cls.from_arkid(arkid)
+            for arkid in NoidBatchClient(NOID_URL, MINT_HTTP).mint(count)
+        ]
+
+    @classmethod
+    def from_pool(cls, pool: ArkPool) -> "Identifier":
+        """Lease a pre-minted ARK; release() or consume() it when done."""
+        identifier = cls.from_arkid(pool.take())
+        identifier.pool = pool
+        return identifier
+
+    def release(self) -> None:
+        # Only after its bindings were purged: the ARK goes back to the pool.
+        if self.pool is not None:
+            self.pool.release(self.arkid)
+            self.pool = None
+
+    def consume(self) -> None:
+        # The dataset was ingested under this ARK.
+        if self.pool is not None:
+            self.pool.consume(self.arkid)
+            self.pool = None
+
 
 def main() -> None:
     """Main function."""
@@ -644,13 +564,13 @@ def main() -> None:
     # Test creating and writing the identifiers:
     dataset_metadata.write_identifiers(existing_identifier)
     print(
-        f"The Metadata File ID is: {ET.fromstring(dataset_metadata.xml_text).find(SEARCH_STRING_DICT['metadataFileID']).text}"
+        f"The Metadata File ID is: {dataset_metadata.session.text('metadataFileID')}"
     )
     print(
-        f"The Citation ID is: {ET.fromstring(dataset_metadata.xml_text).find(SEARCH_STRING_DICT['identCode']).text}"
+        f"The Citation ID is: {dataset_metadata.session.text('identCode')}"
     )
     print(
-        f"The Dataset URI is: {ET.fromstring(dataset_metadata.xml_text).find(SEARCH_STRING_DICT['datasetURI']).text}\n"
+        f"The Dataset URI is: {dataset_metadata.session.text('datasetURI')}\n"
     )
 
     # Test updating agsl hours:
@@ -0,0 +1,103 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+# Modules shared with arkchecker and opendataharvest import as geometadataedit.*
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from geometadataedit.ark_index import ArkIndex
+
+FIXTURES = Path(__file__).resolve().parents[2] / "uwm_fixture" / "Aardvark"
+
+
+class ArkIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.metadata = Path(self.tmpdir.name) / "metadata"
+        shutil.copytree(FIXTURES, self.metadata)
+        self.index = ArkIndex(Path(self.tmpdir.name) / "index.sqlite3")
+        self.addCleanup(self.index.close)
+
+    def test_lookup_after_update(self):
+        stats = self.index.update(self.metadata)
+
+        self.assertEqual((stats.scanned, stats.updated, stats.arks), (5, 5, 5))
+        entry = self.index.lookup("77981/gmgs0c4sj3x")
+        self.assertEqual(entry.file.name, "gmgs0c4sj3x_BL_Aardvark.json")
+        self.assertIsNone(entry.where)
+        self.assertNotIn("77981/gmgs0xxxxxx", self.index)
+        self.assertEqual(len(self.index.entries(self.metadata)), 5)
+
+    def test_rebuilds_only_reread_changed_files(self):
+        self.index.update(self.metadata)
+        self.index.set_wheres({"77981/gmgs0c4sj3x": "https://example.com/old"})
+        changed = self.metadata / "gmgs0c4sj3x_BL_Aardvark.json"
+        record = json.loads(changed.read_text(encoding="utf-8"))
+        record["dct_identifier_sm"] = ["ark:/77981/gmgs0newark"]
+        changed.write_text(json.dumps(record), encoding="utf-8")
+        os.utime(changed, ns=(0, 0))
+        (self.metadata / "gmgs0c4sj4g_BL_Aardvark.json").unlink()
+
+        stats = self.index.update(self.metadata)
+
+        self.assertEqual((stats.updated, stats.removed), (1, 1))
+        self.assertIsNone(self.index.lookup("77981/gmgs0c4sj3x"))
+        self.assertIsNone(self.index.lookup("77981/gmgs0c4sj4g"))
+        self.assertEqual(self.index.lookup("77981/gmgs0newark").file, changed)
+        self.assertEqual(len(self.index), 4)
+        # The NOID binding outlives the file entry.
+        record["dct_identifier_sm"] = ["ark:/77981/gmgs0c4sj3x"]
+        changed.write_text(json.dumps(record), encoding="utf-8")
+        self.index.update(self.metadata)
+        self.assertEqual(
+            self.index.lookup("77981/gmgs0c4sj3x").where, "https://example.com/old"
+        )
+
+    def test_arks_named_in_two_files(self):
+        self.index.update(self.metadata)
+        self.index.set_wheres({"77981/gmgs0c4sj3x": "https://example.com/old"})
+        original = self.metadata / "gmgs0c4sj3x_BL_Aardvark.json"
+        copy = self.metadata / "copy" / original.name
+        copy.parent.mkdir()
+        shutil.copy(original, copy)
+        self.index.update(self.metadata)
+        self.assertEqual(len(self.index.entries(self.metadata)), 6)
+        self.assertEqual(len(self.index), 5)
+
+        original.unlink()
+        self.index.update(self.metadata)
+        entry = self.index.lookup("77981/gmgs0c4sj3x")
+        self.assertEqual(entry.file, copy)
+        self.assertEqual(entry.where, "https://example.com/old")
+
+        copy.unlink()
+        self.index.update(self.metadata)
+        self.assertIsNone(self.index.lookup("77981/gmgs0c4sj3x"))
+
+    def test_single_row_indexes_are_rebuilt(self):
+        self.index.update(self.metadata)
+        self.index.set_wheres({"77981/gmgs0c4sj3x": "https://example.com/old"})
+        connection = self.index.connection
+        with connection:
+            connection.execute("DROP TABLE arks")
+            connection.execute(
+                "CREATE TABLE arks (ark TEXT PRIMARY KEY, file TEXT NOT NULL "
+                "REFERENCES files (path) ON DELETE CASCADE, id TEXT)"
+            )
+        self.index.close()
+
+        self.index = ArkIndex(self.index.path)
+        self.addCleanup(self.index.close)
+        self.assertEqual(self.index.update(self.metadata).updated, 5)
+        self.assertEqual(
+            self.index.lookup("77981/gmgs0c4sj3x").where, "https://example.com/old"
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
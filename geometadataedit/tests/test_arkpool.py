@@ -0,0 +1,126 @@
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+GEOMETADATAEDIT_ROOT = Path(__file__).resolve().parents[1] / "geometadataedit"
+sys.path.insert(0, str(GEOMETADATAEDIT_ROOT))
+# Modules shared with arkchecker and opendataharvest import as geometadataedit.*
+sys.path.insert(0, str(GEOMETADATAEDIT_ROOT.parent))
+# The NOID stand-in lives with arkchecker.
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "arkchecker"))
+
+from arkpool import ArkPool
+from geometadataedit.http_client import HttpClient
+from geometadataedit.noid import NoidBatchClient
+from noid_stub import NoidStub
+
+
+def exited_owner():
+    """A lease owner on this host whose process has exited."""
+    process = subprocess.Popen([sys.executable, "-c", ""])
+    process.wait()
+    return f"{socket.gethostname()}:{process.pid}:crashed"
+
+
+class ArkPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.http = HttpClient(retries=0, backoff_factor=0)
+        self.addCleanup(self.http.close)
+        self.stub = NoidStub()
+        self.stub.__enter__()
+        self.addCleanup(self.stub.__exit__, None, None, None)
+        self.path = Path(self.tmpdir.name) / "pool.sqlite3"
+        self.pool = self.open_pool()
+
+    def open_pool(self, owner=None):
+        pool = ArkPool(NoidBatchClient(self.stub.url, self.http), self.path, 5, owner)
+        self.addCleanup(pool.close)
+        return pool
+
+    def test_take_mints_in_batches(self):
+        arkids = [self.pool.take() for _ in range(7)]
+
+        self.assertEqual(len(set(arkids)), 7)
+        self.assertEqual(arkids[0], "77981/test0000001")
+        # Two mint batches of five, one request each.
+        self.assertEqual(self.stub.requests, ["-", "-"])
+        self.assertEqual(self.pool.free(), 3)
+        self.assertEqual(self.pool.leased(), arkids)
+
+    def test_ensure_mints_ahead(self):
+        self.assertEqual(self.pool.ensure(12), 12)
+        self.assertEqual(self.pool.ensure(10), 0)
+        self.pool.take()
+        self.assertEqual(len(self.stub.requests), 1)
+        # The queue outlives the process.
+        self.assertEqual(self.open_pool().free(), 11)
+
+    def test_released_arks_are_handed_out_again(self):
+        with self.assertRaises(RuntimeError):
+            with self.pool.lease() as arkid:
+                raise RuntimeError("ingest failed")
+        self.assertFalse(self.pool.leased())
+        self.assertEqual(self.pool.take(), arkid)
+
+        with self.pool.lease() as used:
+            pass
+        self.assertNotEqual(used, arkid)
+        self.assertFalse(self.pool.release(used))
+        self.assertNotIn(used, self.pool.leased())
+        self.assertEqual(self.pool.free(), 3)
+
+    def test_reclaim_keeps_bound_arks_out_of_the_pool(self):
+        crashed = self.open_pool(exited_owner())
+        bound, unbound = crashed.take(), crashed.take()
+        self.stub.bind(bound, where="https://example.com")
+
+        released, consumed = self.pool.reclaim()
+
+        self.assertEqual((released, consumed), ([unbound], [bound]))
+        self.assertFalse(self.pool.leased())
+        self.assertEqual(self.pool.take(), unbound)
+
+    def test_reclaim_leaves_running_owners_leases(self):
+        # Another ingest sharing the pool file, still running.
+        running = self.open_pool()
+        mine, theirs = self.pool.take(), running.take()
+        remote = self.open_pool("ingest02:4242:nightly")
+        elsewhere = remote.take()
+        crashed = self.open_pool(exited_owner())
+        orphan = crashed.take()
+
+        self.assertEqual(self.pool.reclaim(), ([orphan], []))
+        self.assertEqual(self.pool.leased(), [mine, theirs, elsewhere])
+
+        # A crash on another host is settled by naming its owner.
+        self.assertEqual(self.pool.reclaim([remote.owner]), ([elsewhere], []))
+        self.assertEqual(self.pool.leased(), [mine, theirs])
+        self.assertEqual(set(self.pool.owners()), {self.pool.owner, running.owner})
+
+    def test_pool_files_without_owners(self):
+        path = Path(self.tmpdir.name) / "old.sqlite3"
+        with sqlite3.connect(path) as connection:
+            connection.executescript(
+                "CREATE TABLE arks (position INTEGER PRIMARY KEY, "
+                "ark TEXT NOT NULL UNIQUE, minted TEXT NOT NULL, leased TEXT);"
+                "INSERT INTO arks VALUES (1, '77981/old0000001', 'x', 'y');"
+            )
+        connection.close()
+
+        pool = ArkPool(NoidBatchClient(self.stub.url, self.http), path, 5)
+        self.addCleanup(pool.close)
+
+        self.assertEqual(pool.owners(), {None: ["77981/old0000001"]})
+        self.assertEqual(pool.reclaim(), (["77981/old0000001"], []))
+        self.assertEqual(pool.take(), "77981/old0000001")
+        self.assertEqual(pool.owners(), {pool.owner: ["77981/old0000001"]})
+
+
+if __name__ == "__main__":
+    unittest.main()
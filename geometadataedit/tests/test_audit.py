@@ -0,0 +1,121 @@
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+GEOMETADATAEDIT_ROOT = Path(__file__).resolve().parents[1] / "geometadataedit"
+sys.path.insert(0, str(GEOMETADATAEDIT_ROOT))
+# Modules shared with arkchecker and opendataharvest import as geometadataedit.*
+sys.path.insert(0, str(GEOMETADATAEDIT_ROOT.parent))
+
+import audit
+from geometadataedit.ark_index import ArkEntry
+from geometadataedit.noid import expected_where
+from zippackage import ZipPackager
+
+
+class AuditTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.root = Path(self.tmpdir.name) / "web"
+        for name in ("gmgs0aaaaaa", "gmgs0bbbbbb", "gmgs0cccccc", "gmgs0meta00"):
+            self.add_metadata(name)
+        for name in ("gmgs0aaaaaa", "gmgs0bbbbbb", "gmgs0public"):
+            (self.root / "public" / name).mkdir(parents=True)
+        for name in ("gmgs0cccccc", "gmgs0bbbbbb"):
+            (self.root / "restricted-uw-system" / name).mkdir(parents=True)
+        (self.root / "public" / "notes.txt").write_text("stray")
+
+    def add_metadata(self, name):
+        path = self.root / "metadata" / f"{name}_ISO.xml"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("<metadata/>")
+
+    def kinds(self, findings):
+        return sorted((finding.kind, finding.name) for finding in findings)
+
+    def test_orphans_from_set_differences(self):
+        (self.root / "metadata" / "Thumbs.db").write_bytes(b"")
+        listing = audit.list_file_server(self.root)
+
+        self.assertEqual(len(listing.metadata), 4)
+        self.assertEqual(
+            self.kinds(audit.audit_listing(self.root, listing)),
+            [
+                ("data-without-metadata", "gmgs0public"),
+                ("metadata-without-data", "gmgs0meta00"),
+                ("not-a-directory", "notes.txt"),
+                ("public-and-restricted", "gmgs0bbbbbb"),
+                ("unexpected-metadata-entry", "Thumbs.db"),
+            ],
+        )
+
+    def test_verify_zips(self):
+        source = Path(self.tmpdir.name) / "dataset"
+        source.mkdir()
+        (source / "roads.shp").write_bytes(b"shape record " * 1000)
+        good = self.root / "public" / "gmgs0aaaaaa" / "Roads.zip"
+        bad = self.root / "restricted-uw-system" / "gmgs0cccccc" / "Lakes.zip"
+        for zip_path in (good, bad):
+            ZipPackager().package(source, zip_path)
+        data = bytearray(bad.read_bytes())
+        data[60] ^= 0xFF
+        bad.write_bytes(data)
+        (self.root / "public" / "gmgs0public" / "Old.zip").write_bytes(b"")
+        listing = audit.list_file_server(self.root)
+
+        findings = audit.verify_zips(self.root, listing, deep=True, workers=2)
+
+        self.assertEqual(
+            sorted({(finding.kind, finding.name) for finding in findings}),
+            [
+                ("missing-zip", "gmgs0bbbbbb"),
+                ("no-manifest", "gmgs0public"),
+                ("zip-mismatch", "gmgs0cccccc"),
+            ],
+        )
+
+    def test_cross_check_index(self):
+        listing = audit.list_file_server(self.root)
+        record = Path("gmgs0aaaaaa.json")
+        entries = [
+            ArkEntry("77981/gmgs0aaaaaa", record, "gmgs0aaaaaa"),
+            ArkEntry(
+                "77981/gmgs0bbbbbb",
+                record,
+                "gmgs0bbbbbb",
+                expected_where("77981/gmgs0bbbbbb"),
+            ),
+            ArkEntry(
+                "77981/gmgs0cccccc", record, "gmgs0cccccc", "https://example.com/"
+            ),
+            ArkEntry("77981/gmgs0gone00", record, "gmgs0gone00"),
+        ]
+
+        self.assertEqual(
+            self.kinds(audit.cross_check_index(entries, listing)),
+            [
+                ("data-without-record", "gmgs0public"),
+                ("indexed-without-data", "gmgs0gone00"),
+                ("noid-where-mismatch", "gmgs0cccccc"),
+            ],
+        )
+
+    def test_main_writes_report(self):
+        report = Path(self.tmpdir.name) / "audit.json"
+
+        self.assertEqual(audit.main([str(self.root), "--report", str(report)]), 1)
+
+        rows = json.loads(report.read_text())
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(set(rows[0]), set(audit.REPORT_FIELDS))
+
+        csv_report = Path(self.tmpdir.name) / "audit.csv"
+        audit.main([str(self.root), "--report", str(csv_report)])
+        self.assertEqual(len(csv_report.read_text().splitlines()), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
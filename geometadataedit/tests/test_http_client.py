@@ -0,0 +1,86 @@
+import sys
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Modules shared with arkchecker and opendataharvest import as geometadataedit.*
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from geometadataedit.http_client import HttpClient
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    failures_left = 0
+    connections = set()
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        FlakyHandler.connections.add(self.client_address)
+        if FlakyHandler.failures_left > 0:
+            FlakyHandler.failures_left -= 1
+            status, body = 503, b"busy"
+        else:
+            status, body = 200, b'{"ok": true}'
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class HttpClientTest(unittest.TestCase):
+    def setUp(self):
+        FlakyHandler.failures_left = 0
+        FlakyHandler.connections = set()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FlakyHandler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_sessions_are_pooled_per_host(self):
+        client = HttpClient()
+        self.assertIs(
+            client.session_for(f"{self.url}/a"), client.session_for(f"{self.url}/b")
+        )
+        self.assertIsNot(
+            client.session_for("https://example.com/a"),
+            client.session_for(f"{self.url}/a"),
+        )
+
+    def test_keep_alive_connection_is_reused(self):
+        client = HttpClient()
+        for _ in range(5):
+            self.assertEqual(client.get(f"{self.url}/data.json").status_code, 200)
+
+        self.assertEqual(len(FlakyHandler.connections), 1)
+        self.assertEqual(client.metrics()[self.url]["requests"], 5)
+        self.assertEqual(client.metrics()[self.url]["bytes"], 5 * 12)
+
+    def test_server_errors_are_retried_with_backoff_policy(self):
+        FlakyHandler.failures_left = 2
+        client = HttpClient(retries=3, backoff_factor=0)
+
+        response = client.get(f"{self.url}/data.json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(FlakyHandler.failures_left, 0)
+
+    def test_exhausted_retries_return_the_last_response(self):
+        FlakyHandler.failures_left = 5
+        client = HttpClient(retries=1, backoff_factor=0)
+
+        response = client.get(f"{self.url}/data.json")
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(client.metrics()[self.url]["errors"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import sys
+import unittest
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+GEOMETADATAEDIT_ROOT = Path(__file__).resolve().parents[1] / "geometadataedit"
+sys.path.insert(0, str(GEOMETADATAEDIT_ROOT))
+
+from metadataxml import AGSL_HOURS
+from metadataxml import MetadataEditSession
+from metadataxml import update_agsl_hours
+from metadataxml import write_identifiers
+
+METADATA = """<metadata>
+  <dataIdInfo>
+    <idCitation>
+      <resTitle>Roads</resTitle>
+      <resAltTitle>MilwaukeeCounty_Roads_2018</resAltTitle>
+    </idCitation>
+    <idPoC>
+      <displayName>American Geographical Society Library</displayName>
+      <rpCntInfo><cntHours>Monday - Friday 8-5</cntHours></rpCntInfo>
+    </idPoC>
+    <idPoC>
+      <displayName>Milwaukee County</displayName>
+      <rpCntInfo><cntHours>By appointment</cntHours></rpCntInfo>
+    </idPoC>
+    <dataExt><tempEle><TempExtent><exTemp><TM_Period>
+      <tmBegin>2018-01-01T00:00:00</tmBegin><tmEnd>2018-12-31T00:00:00</tmEnd>
+    </TM_Period></exTemp></TempExtent></tempEle></dataExt>
+  </dataIdInfo>
+</metadata>"""
+
+ARK_URI = "https://digilib.uwm.edu/ark:/77981/gmgs0c4sj3x"
+DOWNLOAD_URI = "https://geodata.uwm.edu/public/gmgs0c4sj3x/Roads.zip"
+
+
+class MetadataEditSessionTest(unittest.TestCase):
+    def setUp(self):
+        self.session = MetadataEditSession(METADATA)
+
+    def test_edits_are_batched_on_one_tree(self):
+        self.assertEqual(self.session.text("altTitle"), "MilwaukeeCounty_Roads_2018")
+        self.assertIsNone(self.session.find("identCode"))
+        self.assertFalse(self.session.dirty)
+
+        write_identifiers(self.session, ARK_URI, "ark:/77981/gmgs0c4sj3x", DOWNLOAD_URI)
+        self.assertEqual(update_agsl_hours(self.session), 1)
+
+        self.assertTrue(self.session.dirty)
+        root = ET.fromstring(self.session.tostring())
+        self.assertEqual(
+            root.find("./dataIdInfo/idCitation/citId/identCode").text, ARK_URI
+        )
+        self.assertEqual(root.find("./mdFileID").text, "ark:/77981/gmgs0c4sj3x")
+        self.assertEqual(root.find("./dataSetURI").text, DOWNLOAD_URI)
+        hours = [element.text for element in root.iter("cntHours")]
+        self.assertEqual(hours, [AGSL_HOURS, "By appointment"])
+        self.assertEqual(self.session.text("timeRangeEnd"), "2018-12-31T00:00:00")
+
+    def test_lookups_are_cached_until_the_structure_changes(self):
+        contacts = self.session.findall("contact")
+        self.assertIs(self.session.findall("contact"), contacts)
+        self.assertEqual(len(contacts), 2)
+
+        write_identifiers(self.session, ARK_URI, "ark:/77981/gmgs0c4sj3x", DOWNLOAD_URI)
+
+        self.assertIsNot(self.session.findall("contact"), contacts)
+        self.assertEqual(self.session.text("metadataFileID"), "ark:/77981/gmgs0c4sj3x")
+
+    def test_rewriting_the_same_values_leaves_the_session_clean(self):
+        write_identifiers(self.session, ARK_URI, "ark:/77981/gmgs0c4sj3x", DOWNLOAD_URI)
+        update_agsl_hours(self.session)
+        session = MetadataEditSession(self.session.tostring())
+
+        write_identifiers(session, ARK_URI, "ark:/77981/gmgs0c4sj3x", DOWNLOAD_URI)
+        update_agsl_hours(session)
+
+        self.assertFalse(session.dirty)
+        self.assertEqual(len(session.root.findall(".//identCode")), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,176 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+GEOMETADATAEDIT_ROOT = Path(__file__).resolve().parents[1] / "geometadataedit"
+sys.path.insert(0, str(GEOMETADATAEDIT_ROOT))
+
+import movedatasets
+from movedatasets import MoveError
+from movedatasets import MoveJournal
+from movedatasets import Relocator
+from movedatasets import partial_path
+from movedatasets import read_manifest
+
+
+class RelocatorTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.base = Path(self.tmpdir.name)
+        self.source_dir = self.base / "processing"
+        self.destination_dir = self.base / "failed_metadata_processing"
+        self.files = {
+            "roads.shp": b"shape record " * 1000,
+            "roads.dbf": b"attribute row " * 1000,
+            "roads.gdb/a00000001.gdbtable": b"table",
+        }
+        self.sources = []
+        for name in ("Roads_1990", "Roads_2000", "Roads_2010"):
+            for relative, data in self.files.items():
+                path = self.source_dir / name / relative
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_bytes(data)
+            self.sources.append(self.source_dir / name)
+        self.manifest = self.base / "redo.csv"
+        self.manifest.write_text("".join(f"{source}\n" for source in self.sources))
+        self.journal = MoveJournal(self.base / "redo.journal.sqlite3")
+        self.addCleanup(self.journal.close)
+
+    def relocate(self, workers=2):
+        relocator = Relocator(self.journal, workers)
+        pairs = read_manifest(self.manifest, self.destination_dir)
+        return relocator.run(relocator.plan(pairs))
+
+    def assertMoved(self, name):
+        self.assertFalse((self.source_dir / name).exists())
+        for relative, data in self.files.items():
+            self.assertEqual(
+                (self.destination_dir / name / relative).read_bytes(), data
+            )
+
+    def test_manifest_destinations(self):
+        other = self.base / "elsewhere" / "Roads"
+        self.manifest.write_text(f"{self.sources[0]}\n{self.sources[1]},{other}\n\n")
+
+        self.assertEqual(
+            read_manifest(self.manifest, self.destination_dir),
+            [
+                (self.sources[0], self.destination_dir / "Roads_1990"),
+                (self.sources[1], other),
+            ],
+        )
+        with self.assertRaises(MoveError):
+            read_manifest(self.manifest)
+
+    def test_same_device_moves_are_renames(self):
+        relocator = Relocator(self.journal)
+        moves = relocator.plan(read_manifest(self.manifest, self.destination_dir))
+        self.assertEqual({move.method for move in moves}, {"rename"})
+
+        with mock.patch.object(movedatasets, "copy_tree") as copy_tree:
+            results = relocator.run(moves)
+
+        copy_tree.assert_not_called()
+        self.assertEqual({result.state for result in results}, {"done"})
+        for source in self.sources:
+            self.assertMoved(source.name)
+
+    def test_cross_device_copies_are_verified(self):
+        with mock.patch.object(movedatasets, "same_device", return_value=False):
+            results = self.relocate()
+
+        self.assertEqual([result.move.method for result in results], ["copy"] * 3)
+        self.assertEqual({result.state for result in results}, {"done"})
+        for source in self.sources:
+            self.assertMoved(source.name)
+            self.assertFalse(partial_path(self.destination_dir / source.name).exists())
+        self.assertEqual(self.journal.counts(), {"done": 3})
+
+    def test_failed_verification_keeps_the_source(self):
+        def corrupt(directory, hashes):
+            return ["roads.shp: sha256 differs from the source"]
+
+        with mock.patch.object(movedatasets, "same_device", return_value=False):
+            with mock.patch.object(movedatasets, "verify_tree", corrupt):
+                results = self.relocate()
+
+        self.assertEqual({result.state for result in results}, {"failed"})
+        self.assertIn("sha256 differs", results[0].error)
+        for source in self.sources:
+            self.assertTrue(source.exists())
+            self.assertFalse((self.destination_dir / source.name).exists())
+
+    def test_resume_after_interruption(self):
+        copy_file = movedatasets.copy_file
+
+        def interrupted(source, destination):
+            if "Roads_2000" in str(source) and source.name == "roads.dbf":
+                raise OSError("The specified network name is no longer available")
+            return copy_file(source, destination)
+
+        with mock.patch.object(movedatasets, "same_device", return_value=False):
+            with mock.patch.object(movedatasets, "copy_file", interrupted):
+                first = self.relocate()
+            self.assertEqual(
+                [result.state for result in first], ["done", "failed", "done"]
+            )
+            self.assertTrue(partial_path(self.destination_dir / "Roads_2000").exists())
+
+            # A copy verified before the run stopped is only finished.
+            third = self.sources[2]
+            (self.destination_dir / third.name).rename(
+                partial_path(self.destination_dir / third.name)
+            )
+            self.journal.record(
+                movedatasets.Move(third, self.destination_dir / third.name, "copy"),
+                movedatasets.VERIFIED,
+            )
+            with mock.patch.object(
+                movedatasets, "copy_tree", wraps=movedatasets.copy_tree
+            ) as copy_tree:
+                second = self.relocate()
+
+        self.assertEqual({result.state for result in second}, {"done"})
+        copied = [call.args[0].name for call in copy_tree.call_args_list]
+        self.assertEqual(copied, ["Roads_2000"])
+        for source in self.sources:
+            self.assertMoved(source.name)
+            self.assertFalse(partial_path(self.destination_dir / source.name).exists())
+
+    def test_missing_verified_copy_is_copied_again(self):
+        # Verified, but the .partial copy was removed before it was renamed.
+        source = self.sources[0]
+        destination = self.destination_dir / source.name
+        self.journal.record(
+            movedatasets.Move(source, destination, "copy"), movedatasets.VERIFIED
+        )
+
+        with mock.patch.object(movedatasets, "same_device", return_value=False):
+            with mock.patch.object(
+                movedatasets, "copy_tree", wraps=movedatasets.copy_tree
+            ) as copy_tree:
+                results = self.relocate()
+
+        self.assertEqual({result.state for result in results}, {"done"})
+        copied = [call.args[0].name for call in copy_tree.call_args_list]
+        self.assertEqual(sorted(copied), [source.name for source in self.sources])
+        for source in self.sources:
+            self.assertMoved(source.name)
+        self.assertEqual(self.journal.counts(), {"done": 3})
+
+    def test_plan_rejects_existing_destinations(self):
+        (self.destination_dir / "Roads_1990").mkdir(parents=True)
+
+        with self.assertRaises(MoveError) as raised:
+            Relocator(self.journal).plan(
+                read_manifest(self.manifest, self.destination_dir)
+            )
+        self.assertIn("already exists", str(raised.exception))
+        self.assertTrue(self.sources[0].exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import sys
+import unittest
+from pathlib import Path
+
+GEOMETADATAEDIT_ROOT = Path(__file__).resolve().parents[1] / "geometadataedit"
+sys.path.insert(0, str(GEOMETADATAEDIT_ROOT))
+# Modules shared with arkchecker and opendataharvest import as geometadataedit.*
+sys.path.insert(0, str(GEOMETADATAEDIT_ROOT.parent))
+# The NOID stand-in lives with arkchecker.
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "arkchecker"))
+
+from geometadataedit.http_client import HttpClient
+from geometadataedit.noid import NoidBatchClient
+from geometadataedit.noid import NoidError
+from geometadataedit.noid import bind_command
+from noid_stub import NoidStub
+
+
+class NoidBatchClientTest(unittest.TestCase):
+    def setUp(self):
+        self.http = HttpClient(retries=0, backoff_factor=0)
+        self.addCleanup(self.http.close)
+        self.stub = NoidStub()
+        self.stub.__enter__()
+        self.addCleanup(self.stub.__exit__, None, None, None)
+        # NOID_URL in .env carries the trailing "?".
+        self.client = NoidBatchClient(self.stub.url + "?", self.http, max_commands=4)
+
+    def test_mint_is_split_into_batches(self):
+        arkids = self.client.mint(10)
+
+        self.assertEqual(len(set(arkids)), 10)
+        self.assertEqual(arkids[0], "77981/test0000001")
+        self.assertEqual(self.client.requests, 1)
+        self.assertEqual(self.stub.requests, ["-"])
+
+    def test_fetch_and_bind_many_arks(self):
+        arkids = [f"77981/test{n:07d}" for n in range(1, 10)]
+        self.stub.bind(arkids[0], where="https://example.com/old", who="UWM")
+
+        results = self.client.bind({arkid: {"where": f"w {arkid}"} for arkid in arkids})
+
+        self.assertEqual(results, dict.fromkeys(arkids))
+        # Nine bind commands at four per POST.
+        self.assertEqual(self.client.requests, 3)
+        records, errors = self.client.fetch(arkids)
+        self.assertEqual(errors, {})
+        self.assertEqual(records[arkids[0]], {"where": f"w {arkids[0]}", "who": "UWM"})
+        self.assertEqual(records[arkids[8]]["where"], f"w {arkids[8]}")
+        self.assertEqual(self.client.requests, 6)
+
+    def test_batches_respect_the_byte_limit(self):
+        client = NoidBatchClient(self.stub.url, self.http, max_bytes=64)
+        commands = [f"fetch 77981/test{n:07d}" for n in range(10)]
+
+        batches = list(client.batches(commands))
+
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 2, 2, 2])
+        self.assertEqual(len(client.run(commands)), 10)
+
+    def test_errors_are_reported_per_ark(self):
+        results = self.client.bind({"77981/test0000001": {"where": "x"}}, how="add")
+
+        self.assertTrue(results["77981/test0000001"].startswith("error"))
+        self.assertEqual(
+            bind_command("purge", "77981/test0000001", "where"),
+            "bind purge 77981/test0000001 where",
+        )
+
+    def test_fetch_errors_are_reported_per_ark(self):
+        arkids = [f"77981/test{n:07d}" for n in range(1, 6)]
+        self.stub.broken.add(arkids[2])
+
+        records, errors = self.client.fetch(arkids)
+
+        self.assertEqual(list(errors), [arkids[2]])
+        self.assertTrue(errors[arkids[2]].startswith("error"))
+        self.assertEqual(sorted(records), sorted(set(arkids) - {arkids[2]}))
+
+    def test_failed_batches_raise(self):
+        self.stub.fail_next(503)
+        with self.assertRaises(NoidError):
+            self.client.fetch(["77981/test0000001"])
+        with self.assertRaises(NoidError):
+            self.client.run(["fetch 77981/test0000001", ""])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import sys
+import threading
+import time
+import unittest
+from pathlib import Path
+
+GEOMETADATAEDIT_ROOT = Path(__file__).resolve().parents[1] / "geometadataedit"
+sys.path.insert(0, str(GEOMETADATAEDIT_ROOT))
+
+from pipeline import Pipeline
+from pipeline import Stage
+
+
+class PipelineTest(unittest.TestCase):
+    def setUp(self):
+        self.lock = threading.Lock()
+        self.active = {"prepare": 0, "bind": 0, "ingest": 0}
+        self.overlap = set()
+        self.log = []
+        self.threads = {"prepare": set(), "bind": set(), "ingest": set()}
+
+    def stage(self, name, delay=0.02, fail=()):
+        def run(job):
+            with self.lock:
+                self.active[name] += 1
+                self.threads[name].add(threading.current_thread())
+                busy = {stage for stage, count in self.active.items() if count}
+                if len(busy) > 1:
+                    self.overlap.add(frozenset(busy))
+            try:
+                time.sleep(delay)
+                if job in fail:
+                    raise RuntimeError(f"{name} failed for {job}")
+                self.log.append((name, job))
+            finally:
+                with self.lock:
+                    self.active[name] -= 1
+
+        return run
+
+    def test_stages_overlap_and_results_keep_job_order(self):
+        pipeline = Pipeline(
+            [
+                Stage("prepare", self.stage("prepare"), 0),
+                Stage("bind", self.stage("bind"), 2),
+                Stage("ingest", self.stage("ingest", 0.05), 2),
+            ]
+        )
+
+        start = time.perf_counter()
+        results = pipeline.run(range(6))
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual([result.job for result in results], list(range(6)))
+        self.assertTrue(all(result.failed_stage is None for result in results))
+        self.assertIn(frozenset({"prepare", "bind"}), self.overlap)
+        self.assertTrue(any("ingest" in busy for busy in self.overlap))
+        # Stages without workers run on the calling thread, the others off it.
+        self.assertEqual(self.threads["prepare"], {threading.current_thread()})
+        self.assertNotIn(threading.current_thread(), self.threads["ingest"])
+        # Serially this would take 6 * 0.09s.
+        self.assertLess(elapsed, 6 * 0.09)
+        # Jobs go through the stages in order.
+        for job in range(6):
+            stages = [name for name, logged in self.log if logged == job]
+            self.assertEqual(stages, ["prepare", "bind", "ingest"])
+
+    def test_failures_stop_the_job_and_call_back_on_the_caller_thread(self):
+        failures, successes = [], []
+        caller = threading.current_thread()
+
+        def on_failure(job, stage, error):
+            self.assertIs(threading.current_thread(), caller)
+            failures.append((job, stage.name, str(error)))
+
+        pipeline = Pipeline(
+            [
+                Stage("prepare", self.stage("prepare", 0, fail={1}), 0),
+                Stage("bind", self.stage("bind", 0, fail={2}), 3),
+            ],
+            on_failure=on_failure,
+            on_success=successes.append,
+        )
+
+        results = pipeline.run(range(4))
+
+        self.assertEqual(
+            sorted(failures),
+            [(1, "prepare", "prepare failed for 1"), (2, "bind", "bind failed for 2")],
+        )
+        self.assertEqual(sorted(successes), [0, 3])
+        self.assertEqual(results[1].failed_stage, "prepare")
+        self.assertIsInstance(results[2].error, RuntimeError)
+        self.assertNotIn(("bind", 1), self.log)
+
+
+if __name__ == "__main__":
+    unittest.main()
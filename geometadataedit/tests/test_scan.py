@@ -0,0 +1,75 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+GEOMETADATAEDIT_ROOT = Path(__file__).resolve().parents[1] / "geometadataedit"
+sys.path.insert(0, str(GEOMETADATAEDIT_ROOT))
+
+from scan import DatasetType
+from scan import scan_dataset
+
+
+class ScanDatasetTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.root = Path(self.tmpdir.name)
+
+    def make(self, *names):
+        for name in names:
+            path = self.root / name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            if name.endswith("/"):
+                path.mkdir(exist_ok=True)
+            else:
+                path.write_bytes(b"")
+
+    def test_shapefile(self):
+        self.make("Roads/Roads.shp", "Roads/Roads.dbf", "Roads/Roads.shx")
+
+        scan = scan_dataset(self.root)
+
+        self.assertEqual(scan.datatype, DatasetType.SHAPEFILE)
+        self.assertEqual(scan.path, self.root / "Roads" / "Roads.shp")
+
+    def test_geodatabase_is_not_entered(self):
+        self.make(
+            "Parcels.gdb/a00000001.gdbtable",
+            "Parcels.gdb/a00000004.TIF",
+            "Parcels.gdb/nested/b.shp",
+            "Parcels_ISO.xml",
+        )
+
+        scan = scan_dataset(self.root)
+
+        self.assertEqual(scan.datatype, DatasetType.FILE_GEODATABASE)
+        self.assertEqual(scan.path, self.root / "Parcels.gdb")
+        self.assertEqual(scan.counts[DatasetType.TIFF], 0)
+        self.assertEqual(scan.counts[DatasetType.SHAPEFILE], 0)
+
+    def test_rasters(self):
+        self.make("elev/hdr.adf", "elev/w001001.adf", "elev/sta.adf", "info/")
+        self.assertEqual(scan_dataset(self.root).datatype, DatasetType.ARCGRID)
+        self.assertEqual(scan_dataset(self.root).path, self.root / "elev" / "hdr.adf")
+
+        self.make("ortho/Ortho.TIF")
+        scan = scan_dataset(self.root / "ortho")
+        self.assertEqual(
+            (scan.datatype, scan.path.name), (DatasetType.TIFF, "Ortho.TIF")
+        )
+
+    def test_empty_and_mixed_directories(self):
+        self.assertEqual(scan_dataset(self.root).datatype, DatasetType.ERROR)
+        self.assertIsNone(scan_dataset(self.root).path)
+
+        self.make("a.shp", "b/b.shp")
+        self.assertEqual(scan_dataset(self.root).datatype, DatasetType.MULTIPLE)
+        self.make("c.gdb/")
+        scan = scan_dataset(self.root)
+        self.assertEqual(scan.datatype, DatasetType.MULTIPLE)
+        self.assertEqual(scan.datatype, 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
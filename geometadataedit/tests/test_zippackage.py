@@ -0,0 +1,134 @@
+import json
+import os
+import struct
+import sys
+import tempfile
+import unittest
+import zipfile
+from pathlib import Path
+from unittest import mock
+
+GEOMETADATAEDIT_ROOT = Path(__file__).resolve().parents[1] / "geometadataedit"
+sys.path.insert(0, str(GEOMETADATAEDIT_ROOT))
+
+import zippackage
+from zippackage import ZipPackager
+from zippackage import manifest_path
+from zippackage import verify_package
+
+
+class ZipPackagerTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.source = Path(self.tmpdir.name) / "dataset"
+        self.output = Path(self.tmpdir.name) / "public" / "gmgs0c4sj3x"
+        self.output.mkdir(parents=True)
+        self.files = {
+            "roads.shp": b"shape record " * 5000,
+            "roads.dbf": b"attribute row " * 5000,
+            "roads.prj": b'GEOGCS["GCS_WGS_1984"]',
+            "raster/ortho.tif": os.urandom(300_000),
+            "Roads_ISO.xml": "<metadata>Milwaukee é</metadata>".encode(),
+            "empty.txt": b"",
+        }
+        for name, data in self.files.items():
+            path = self.source / name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(data)
+        (self.source / "empty").mkdir()
+        self.directories = ["empty/", "raster/"]
+        self.zip_path = self.output / "Roads.zip"
+
+    def assertZipMatchesSource(self):
+        with zipfile.ZipFile(self.zip_path) as archive:
+            self.assertIsNone(archive.testzip())
+            self.assertEqual(
+                sorted(archive.namelist()), sorted([*self.files, *self.directories])
+            )
+            for name, data in self.files.items():
+                self.assertEqual(archive.read(name), data)
+            return {info.filename: info for info in archive.infolist()}
+
+    def test_compression_is_chosen_per_file_type(self):
+        package = ZipPackager().package(self.source, self.zip_path)
+
+        infos = self.assertZipMatchesSource()
+        self.assertEqual(infos["raster/ortho.tif"].compress_type, zipfile.ZIP_STORED)
+        self.assertEqual(infos["roads.shp"].compress_type, zipfile.ZIP_DEFLATED)
+        self.assertLess(infos["roads.dbf"].compress_size, 5000)
+        self.assertTrue(infos["empty/"].is_dir())
+        self.assertEqual(package.size, self.zip_path.stat().st_size)
+        self.assertFalse(self.zip_path.with_name("Roads.zip.part").exists())
+        self.assertEqual(
+            sorted(p.name for p in self.output.iterdir()),
+            ["Roads.manifest.json", "Roads.zip"],
+        )
+
+    def test_manifest_verification(self):
+        package = ZipPackager(levels={".shp": 9}).package(self.source, self.zip_path)
+        manifest = json.loads(manifest_path(self.zip_path).read_text())
+        members = {member["name"]: member for member in manifest["members"]}
+        self.assertEqual(members["raster/ortho.tif"]["method"], "deflated")
+        self.assertEqual(manifest["sha256"], package.sha256)
+        self.assertEqual(verify_package(self.zip_path, deep=True), [])
+
+        # Same size, different bytes: only the deep check sees it.
+        data = bytearray(self.zip_path.read_bytes())
+        # Inside the compressed data of the first member.
+        data[60] ^= 0xFF
+        self.zip_path.write_bytes(bytes(data))
+        self.assertEqual(verify_package(self.zip_path), [])
+        self.assertEqual(len(verify_package(self.zip_path, deep=True)), 1)
+        self.zip_path.write_bytes(bytes(data[:-10]))
+        self.assertTrue(verify_package(self.zip_path))
+
+    def test_stored_members_have_sizes_in_the_local_header(self):
+        ZipPackager().package(self.source, self.zip_path)
+
+        infos = self.assertZipMatchesSource()
+        data = self.zip_path.read_bytes()
+        for name in ("raster/ortho.tif", "empty/"):
+            info = infos[name]
+            self.assertEqual(info.compress_type, zipfile.ZIP_STORED)
+            # No data descriptor: streaming readers need the sizes up front.
+            self.assertFalse(info.flag_bits & 0x08)
+            flags, crc, compressed_size, size = struct.unpack_from(
+                "<6xH6xIII", data, info.header_offset
+            )
+            self.assertFalse(flags & 0x08)
+            self.assertEqual(
+                (crc, compressed_size, size), (info.CRC, info.file_size, info.file_size)
+            )
+
+    def test_zip64_records(self):
+        with mock.patch.object(zippackage, "ZIP64_LIMIT", 1000):
+            ZipPackager().package(self.source, self.zip_path)
+
+        infos = self.assertZipMatchesSource()
+        self.assertEqual(infos["raster/ortho.tif"].file_size, 300_000)
+        self.assertEqual(verify_package(self.zip_path), [])
+
+    def test_unreadable_files_are_skipped_or_raise(self):
+        skipped = []
+        real_open = open
+
+        def failing_open(path, *args, **kwargs):
+            if Path(path).name == "roads.prj":
+                raise PermissionError("locked")
+            return real_open(path, *args, **kwargs)
+
+        with mock.patch("builtins.open", failing_open):
+            ZipPackager().package(
+                self.source, self.zip_path, lambda path, error: skipped.append(path)
+            )
+            self.assertEqual([path.name for path in skipped], ["roads.prj"])
+            self.zip_path.unlink()
+            with self.assertRaises(PermissionError):
+                ZipPackager().package(self.source, self.zip_path)
+        # The failed run leaves no partial zip behind.
+        self.assertEqual(os.listdir(self.output), ["Roads.manifest.json"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,271 @@
+"""
+CKAN_Harvester.py
+Dependencies: requests, yaml, and dateutil are not part of the standard library.
+Description: Harvest datasets from the CKAN portals listed under CKAN_Sites in
+config.yaml. Each portal's package_search is paged with rows/start, package
+details are fetched concurrently with package_show over the pooled session that
+http_config.py keeps for the portal (bounded by CKAN_CONCURRENCY), and every package is reshaped into the DCAT
+dataset layout so that records are built, validated and written by the same
+Aardvark pipeline as DCAT_Harvester.py.
+Only the package names listed under a site's Datasets key are harvested when
+that key is present; otherwise every package matching SearchQuery is used.
+A configured dataset's title, themes (dcat_theme_sm) and spatial override the
+package's own.
+"""
+
+import asyncio
+import logging
+import re
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import requests
+from geometadataedit.http_client import HttpClient
+
+from DCAT_Harvester import (
+    AardvarkDataProcessor,
+    CONFIG,
+    DEDUP_POLICY,
+    OGM_PATH,
+    Site,
+    clear_output_directory,
+    config,
+    get_uuid_list,
+    write_site_records,
+)
+from dedup import DeduplicationIndex
+from http_config import shared_client
+
+CKAN_CATALOG = config.get(CONFIG.get("CKAN_CATALOG", "CKAN_Sites"), {})
+CKAN_ROWS = CONFIG.get("CKAN_ROWS", 100)
+CKAN_CONCURRENCY = CONFIG.get("CKAN_CONCURRENCY", 8)
+CKAN_TIMEOUT = CONFIG.get("CKAN_TIMEOUT", 10)
+# Kept apart from DCAT_Harvester.py's OUTPUTDIR, which that harvest clears.
+ckan_outputdir_config = Path(CONFIG.get("CKAN_OUTPUTDIR", "opendataharvest-ckan"))
+CKAN_OUTPUTDIR = (
+    ckan_outputdir_config
+    if ckan_outputdir_config.is_absolute()
+    else OGM_PATH / ckan_outputdir_config
+)
+# CKAN package ids are dashed UUIDs.
+PACKAGE_ID_PATTERN = re.compile(r"id=([0-9a-fA-F-]+)")
+
+
+class CKANError(Exception):
+    pass
+
+
+class CKANClient:
+    """Minimal CKAN Action API client sharing one pooled session."""
+
+    def __init__(
+        self,
+        base_url: str,
+        rows: int = CKAN_ROWS,
+        concurrency: int = CKAN_CONCURRENCY,
+        timeout: float = CKAN_TIMEOUT,
+        http: Optional[HttpClient] = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.api_url = f"{self.base_url}/api/3/action/"
+        self.rows = rows
+        self.concurrency = concurrency
+        self.timeout = timeout
+        # Every package_show for this portal reuses the same pooled session.
+        self.session = (http or shared_client()).session_for(self.base_url)
+
+    def action(self, name: str, **params) -> Dict:
+        """Call an Action API endpoint and return its result."""
+        params = {key: value for key, value in params.items() if value is not None}
+        try:
+            response = self.session.get(
+                self.api_url + name, params=params, timeout=self.timeout
+            )
+            if response.status_code >= 500:
+                response.raise_for_status()
+        except requests.RequestException as e:
+            raise CKANError(f"{name} on {self.base_url} failed: {e}") from e
+
+        # CKAN reports client errors (404, 409, ...) as JSON with success false.
+        try:
+            payload = response.json()
+        except ValueError as e:
+            raise CKANError(
+                f"{name} on {self.base_url} returned {response.status_code} without JSON"
+            ) from e
+        if not payload.get("success"):
+            raise CKANError(
+                f"{name} on {self.base_url} was not successful: {payload.get('error')}"
+            )
+        return payload["result"]
+
+    def iter_package_names(self, fq: Optional[str] = None) -> Iterator[str]:
+        """Page through package_search and yield every matching package name."""
+        start = 0
+        while True:
+            result = self.action(
+                "package_search", fq=fq, rows=self.rows, start=start, fl="name"
+            )
+            packages = result.get("results", [])
+            for package in packages:
+                yield package["name"]
+            start += len(packages)
+            if not packages or start >= result.get("count", 0):
+                break
+
+    async def fetch_packages(self, names: Iterable[str]) -> List[Dict]:
+        """Fetch package_show for each name, at most `concurrency` at a time."""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fetch(name):
+            async with semaphore:
+                try:
+                    return await asyncio.to_thread(self.action, "package_show", id=name)
+                except CKANError as e:
+                    logging.warning(str(e))
+                    return None
+
+        packages = await asyncio.gather(*(fetch(name) for name in names))
+        return [package for package in packages if package]
+
+
+def spatial_from_config(bbox: List[float]) -> str:
+    """Convert a configured [west, east, north, south] list to a DCAT string."""
+    west, east, north, south = (float(value) for value in bbox)
+    return f"{west},{south},{east},{north}"
+
+
+def spatial_from_default(website: Site) -> Optional[str]:
+    defaultBbox = AardvarkDataProcessor.default_bbox(website)
+    if defaultBbox["envelope"] is None:
+        return None
+    return spatial_from_config(
+        [
+            defaultBbox["west"],
+            defaultBbox["east"],
+            defaultBbox["north"],
+            defaultBbox["south"],
+        ]
+    )
+
+
+def package_to_dataset(
+    package: Dict, client: CKANClient, overrides: Optional[Dict] = None
+) -> Dict:
+    """Reshape a CKAN package into the DCAT dataset keys Aardvark expects."""
+    overrides = overrides or {}
+    organization = package.get("organization") or {}
+
+    distributions = []
+    for resource in package.get("resources", []):
+        resource_format = (resource.get("format") or "").strip()
+        if not resource.get("url"):
+            continue
+        distributions.append(
+            {
+                "title": (
+                    "Shapefile"
+                    if resource_format.upper() in ("SHP", "SHAPEFILE")
+                    else resource.get("name")
+                ),
+                "format": resource_format.upper() if resource_format else None,
+                "accessURL": resource["url"],
+            }
+        )
+
+    dataset = {
+        "identifier": f"{client.api_url}package_show?id={package['id']}",
+        "title": overrides.get("title") or package.get("title"),
+        "description": package.get("notes") or "",
+        "keyword": [tag["name"] for tag in package.get("tags", []) if tag.get("name")],
+        "issued": package.get("metadata_created", ""),
+        "modified": package.get("metadata_modified", ""),
+        "landingPage": f"{client.base_url}/dataset/{package['name']}",
+        "distribution": distributions,
+    }
+    if organization.get("title"):
+        dataset["publisher"] = {"name": organization["title"]}
+    if package.get("license_title"):
+        dataset["license"] = package["license_title"]
+    if overrides.get("spatial"):
+        dataset["spatial"] = spatial_from_config(overrides["spatial"])
+    if overrides.get("themes"):
+        dataset["themes"] = list(overrides["themes"])
+    return dataset
+
+
+def extract_package_id(identifier: str) -> Tuple[str, None]:
+    """The package UUID without dashes; CKAN datasets have no sublayers."""
+    match = PACKAGE_ID_PATTERN.search(identifier)
+    package_id = match.group(1).replace("-", "") if match else ""
+    if not package_id:
+        return AardvarkDataProcessor.extract_id_sublayer(identifier)
+    return package_id, None
+
+
+def harvest_ckan_site(details: Dict, client: Optional[CKANClient] = None) -> Site:
+    """Fetch a CKAN portal and return a Site whose datasets are DCAT-shaped."""
+    client = client or CKANClient(details["SiteURL"])
+    configured = details.get("Datasets") or {}
+
+    names = list(client.iter_package_names(details.get("SearchQuery")))
+    if configured:
+        missing = sorted(set(configured) - set(names))
+        for name in missing:
+            logging.warning(
+                f"Configured dataset {name} was not found on {client.base_url}"
+            )
+        names = [name for name in names if name in configured]
+
+    packages = asyncio.run(client.fetch_packages(names))
+
+    website = Site(
+        details["SiteName"],
+        details,
+        {"dataset": []},
+        get_uuid_list(details, "SkipList"),
+        get_uuid_list(details, "AppList"),
+        get_uuid_list(details, "MapList"),
+    )
+    website.id_extractor = extract_package_id
+    default_spatial = spatial_from_default(website)
+
+    for package in packages:
+        dataset = package_to_dataset(
+            package, client, configured.get(package["name"]) or {}
+        )
+        if "spatial" not in dataset and default_spatial:
+            dataset["spatial"] = default_spatial
+        website.site_json["dataset"].append(dataset)
+
+    logging.info(
+        f"Fetched {len(packages)} of {len(names)} packages from {client.base_url}"
+    )
+    return website
+
+
+def main():
+    CKAN_OUTPUTDIR.mkdir(parents=True, exist_ok=True)
+    clear_output_directory(CKAN_OUTPUTDIR)
+    dedup = DeduplicationIndex(DEDUP_POLICY) if DEDUP_POLICY else None
+    for site, details in CKAN_CATALOG.items():
+        try:
+            website = harvest_ckan_site(details)
+        except CKANError as e:
+            logging.warning(f"Skipping CKAN site {site}: {e}")
+            continue
+        written = write_site_records(website, CKAN_OUTPUTDIR, dedup)
+        logging.info(f"{website.site_name}: wrote {written} records")
+
+    if dedup:
+        logging.info(dedup.summary())
+    shared_client().log_metrics()
+
+
+if __name__ == "__main__":
+    try:
+        main()
+        logging.info("CKAN harvest finished")
+    except Exception as e:
+        logging.error(str(e))
+        logging.warning("CKAN harvest finished with errors")
@@ -3,7 +3,7 @@ DCAT_Harvester.py
 Author: Stephen Appel
 Created: May 14, 2024
 Version: 0.1
-Dependencies: requests, yaml, and dateutil are not part of the standard library.
+Dependencies: requests, yaml, dateutil, and numpy are not part of the standard library.
 Credit: UW-Madison - State Cartographer's Office for some code. Some code refactored and edited by CoPilot.
 Description: This script is used to harvest open data from data portals who
 expose a DCAT JSON. It reads configuration options from a YAML file, including
@@ -21,6 +21,7 @@ Care is taken to use functionality from the Python standard library.
 AI was utilized in authoring this script.
 """
 
+import argparse
 import csv
 import json
 import logging
@@ -28,13 +29,12 @@ import os
 import re
 import shutil
 import sys
-import time
 import uuid
 import html
 from datetime import datetime, timezone
 from pathlib import Path
 from urllib.parse import quote
-from typing import List
+from typing import List, Optional
 
 import requests
 import yaml
@@ -42,6 +42,16 @@ from dateutil import parser
 import jsonschema
 from jsonschema import validate
 
+from bbox import process_spatial, validate_bboxes
+from dedup import DeduplicationIndex
+from envelope import envelope_bounds
+from http_cache import ResponseCache
+from http_config import shared_client
+from jsonio import dumps, load, loads
+from profiling import HarvestProfiler
+from schema_validator import CompiledValidator
+from spatial_index import PlaceIndex
+
 CONFIG_DIR = Path(__file__).resolve().parent
 config_file = CONFIG_DIR / "config.yaml"
 
@@ -78,6 +88,13 @@ try:
     CATALOG = config.get(CATALOG_KEY, None)
     MAXRETRY = CONFIG.get("MAXRETRY", 5)
     SLEEPTIME = CONFIG.get("SLEEPTIME", 1)
+    PROFILEDIR = Path(CONFIG.get("PROFILEDIR", "log"))
+    if not PROFILEDIR.is_absolute():
+        PROFILEDIR = (CONFIG_DIR / PROFILEDIR).resolve()
+    PROFILETOP = CONFIG.get("PROFILETOP", 20)
+    DEDUP_POLICY = CONFIG.get("DEDUP_POLICY")
+    SPATIAL_BOUNDARIES = CONFIG.get("SPATIAL_BOUNDARIES") or []
+    SPATIAL_MAX_PLACES = CONFIG.get("SPATIAL_MAX_PLACES", 3)
 
     # Default Values
     default_config = config.get("DEFAULT", {})
@@ -110,6 +127,21 @@ logging.basicConfig(
 dt = datetime.now().strftime(r"%Y-%m-%d %H:%M:%S")
 logging.info(f"DCAT harvest started at {dt}")
 
+# Pooled per-host sessions shared by every portal and schema request.
+HTTP = shared_client()
+
+# Optional on-disk cache for catalogs and the schema (http_cache, --cache/--offline).
+CACHE = ResponseCache.from_config(config.get("http_cache") or {}, CONFIG_DIR)
+
+# Named places from default_bbox.csv and SPATIAL_BOUNDARIES, built once per run.
+PLACES = PlaceIndex.from_config(DEFAULTBBOX, SPATIAL_BOUNDARIES, CONFIG_DIR)
+
+# The Aardvark schema, fetched and compiled on first use.
+SCHEMA_VALIDATOR: Optional[CompiledValidator] = None
+
+# Profiling is opt-in (--profile); until enabled every hook is a no-op.
+PROFILER = HarvestProfiler(top_n=PROFILETOP)
+
 
 def contains_unresolved_template(value) -> bool:
     """Return whether a string contains an unresolved ArcGIS template value."""
@@ -154,6 +186,12 @@ class Site:
         The set of UUIDs to skip.
     site_applist : set
         The set of UUIDs for applications.
+    bbox_results : dict
+        Envelope and error message per spatial string, set by check_site_spatial.
+    place_results : dict
+        Places intersecting each accepted spatial string, set by check_site_spatial.
+    id_extractor : callable
+        Returns (id, sublayer) for a dataset identifier.
 
     Methods
     -------
@@ -194,6 +232,9 @@ class Site:
         self.site_skiplist = set(site_skiplist)
         self.site_applist = set(site_applist)
         self.site_maplist = set(site_maplist)
+        self.bbox_results = {}
+        self.place_results = {}
+        self.id_extractor = AardvarkDataProcessor.extract_id_sublayer
 
     def __getitem__(self, key):
         """
@@ -224,31 +265,39 @@ class Site:
         setattr(self, key, value)
 
 
+def enable_cache(offline: bool = False) -> None:
+    """Turn on the response cache for this run, optionally without network."""
+    global CACHE
+    CACHE = ResponseCache.from_config(
+        config.get("http_cache") or {}, CONFIG_DIR, enabled=True, offline=offline
+    )
+
+
+def http_get(url: str, timeout: float):
+    """GET url through the response cache when it is enabled."""
+    if CACHE is not None:
+        return CACHE.get(HTTP, url, timeout=timeout)
+    return HTTP.get(url, timeout=timeout)
+
+
 def get_site_data(site: str, details: dict) -> dict:
-    """Fetch the site data with retries."""
-    for i in range(MAXRETRY):
-        try:
-            response = requests.get(details["SiteURL"], timeout=3)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.MissingSchema:
-            logging.info(f"Trying SiteURL for {site} as a local filepath.")
-            response_file = json.load(open(Path(details["SiteURL"]), "r"))
-            return response_file
-        except json.JSONDecodeError:
-            logging.warning(f"The content from {site} is not a valid JSON document.")
-            return None
-        except (requests.HTTPError, requests.exceptions.Timeout) as e:
-            logging.debug(
-                f"Received bad response from {site}. Retrying after {SLEEPTIME} seconds."
-            )
-            time.sleep(SLEEPTIME)
-            if i == (MAXRETRY - 1):
-                logging.warning(
-                    f"Failed to connect to {site} after {MAXRETRY + 1} attempts."
-                )
-                logging.warning(str(e))
-                return None
+    """Fetch the site data; retries and backoff are handled by the HTTP client."""
+    try:
+        response = http_get(details["SiteURL"], timeout=3)
+        response.raise_for_status()
+        return loads(response.content)
+    except requests.exceptions.MissingSchema:
+        logging.info(f"Trying SiteURL for {site} as a local filepath.")
+        return load(Path(details["SiteURL"]))
+    except json.JSONDecodeError:
+        logging.warning(f"The content from {site} is not a valid JSON document.")
+        return None
+    except requests.RequestException as e:
+        logging.warning(
+            f"Failed to connect to {site} after {HTTP.retries + 1} attempts."
+        )
+        logging.warning(str(e))
+        return None
 
 
 def get_uuid_list(details: dict, key: str) -> List[str]:
@@ -311,6 +360,8 @@ class AardvarkDataProcessor:
         spatial = dataset_dict.get("spatial", None)
         distribution = dataset_dict.get("distribution", None)
         landingPage = dataset_dict.get("landingPage", "")
+        # OGM themes set in config.yaml (CKAN datasets); DCAT themes are not OGM's.
+        themes = dataset_dict.get("themes", [])
 
         return {
             "title": title,
@@ -324,6 +375,7 @@ class AardvarkDataProcessor:
             "distribution": distribution,
             "publisher": publisher,
             "landingPage": landingPage,
+            "themes": themes,
         }
 
     @staticmethod
@@ -383,63 +435,8 @@ class AardvarkDataProcessor:
 
     @staticmethod
     def process_dcat_spatial(spatial_string, defaultBbox):
-        def is_in_range(value, range_min, range_max):
-            return range_min <= value <= range_max
-
-        # Extract coordinates
-        pattern = r"(-?\d+\.\d+)"
-        matches = re.findall(pattern, spatial_string)
-
-        if len(matches) != 4:
-            raise ValueError(f"Non-conforming spatial bounding box:\n{spatial_string}")
-
-        # Convert to floats and validate coordinates
-        coordinates = [float(coord) for coord in matches]
-        longitudes = coordinates[::2]
-        latitudes = coordinates[1::2]
-
-        if not all(is_in_range(lon, -180, 180) for lon in longitudes):
-            raise ValueError(
-                f"Longitude coordinates must be between -180 and 180:\n{spatial_string}"
-            )
-
-        if not all(is_in_range(lat, -90, 90) for lat in latitudes):
-            raise ValueError(
-                f"Latitude coordinates must be between -90 and 90:\n{spatial_string}"
-            )
-
-        # Ensure North is greater than South and East is greater than West
-        coordinates[1], coordinates[3] = sorted(latitudes, reverse=True)
-        coordinates[0], coordinates[2] = sorted(longitudes)
-
-        # Ensure West and East OR North and South are not the same:
-        if (coordinates[1] == coordinates[3]) or (coordinates[0] == coordinates[2]):
-            raise ValueError(
-                f"The bounding box has matching NS or EW coordinates:\n{spatial_string}"
-            )
-
-        # Check whether it is within the site's default bbox plus a 1 degree
-        # buffer when a usable default bbox is configured.
-        has_default_bbox = all(
-            defaultBbox.get(key) is not None
-            for key in ("west", "east", "north", "south")
-        )
-        if has_default_bbox and any(
-            [
-                coordinates[0] < defaultBbox["west"] - 1.0,
-                coordinates[2] > defaultBbox["east"] + 1.0,
-                coordinates[1] > defaultBbox["north"] + 1.0,
-                coordinates[3] < defaultBbox["south"] - 1.0,
-            ]
-        ):
-            raise ValueError(
-                f"Bounding box falls outside of default bounding box:\n{spatial_string}"
-            )
-
-        # Convert to ENVELOPE format
-        envelope = f"ENVELOPE({coordinates[0]},{coordinates[2]},{coordinates[1]},{coordinates[3]})"
-
-        return envelope
+        # Single-record form of the batch checks in bbox.py.
+        return process_spatial(spatial_string, defaultBbox)
 
     @staticmethod
     def getURL(distribution):
@@ -532,15 +529,26 @@ class AardvarkDataProcessor:
     @staticmethod
     def load_schema():
         try:
-            response = requests.get(SCHEMA, timeout=10)
-            schema = json.loads(response.text)
+            response = http_get(SCHEMA, timeout=10)
+            schema = loads(response.content)
             return schema
-        except requests.exceptions.ReadTimeout as e:
+        except requests.exceptions.RequestException as e:
             logging.error("Failed to fetch schema from GitHub!")
             sys.exit()
 
+    @staticmethod
+    def schema_validator() -> CompiledValidator:
+        """Fetch and compile the schema once per run."""
+        global SCHEMA_VALIDATOR
+        if SCHEMA_VALIDATOR is None:
+            SCHEMA_VALIDATOR = CompiledValidator(AardvarkDataProcessor.load_schema())
+        return SCHEMA_VALIDATOR
+
     @staticmethod
     def validate_json(json_data, schema):
+        if isinstance(schema, CompiledValidator):
+            error = schema.best_error(json_data)
+            return error is None, error
         try:
             validate(instance=json_data, schema=schema)
         except jsonschema.exceptions.ValidationError as err:
@@ -557,6 +565,39 @@ class Aardvark:
     A class to represent a single dataset as an OGM Aardvark record
     """
 
+    # Aardvark fields in output order; to_dict() emits the non-empty ones.
+    FIELDS = (
+        "id",
+        "dct_title_s",
+        "dct_creator_sm",
+        "dct_publisher_sm",
+        "dct_identifier_sm",
+        "dct_rights_sm",
+        "pcdm_memberOf_sm",
+        "gbl_resourceClass_sm",
+        "dct_accessRights_s",
+        "gbl_mdModified_dt",
+        "gbl_mdVersion_s",
+        "dct_language_sm",
+        "schema_provider_s",
+        "gbl_suppressed_b",
+        "gbl_displayNote_sm",
+        "dct_spatial_sm",
+        "dct_description_sm",
+        "dct_issued_s",
+        "dcat_keyword_sm",
+        "dcat_theme_sm",
+        "dct_references_s",
+        "dct_format_s",
+        "gbl_resourceType_sm",
+        "locn_geometry",
+        "dct_temporal_sm",
+        "gbl_indexYear_im",
+        "dct_relation_sm",
+    )
+    # Slots keep a record to a fixed-size object without a per-instance dict.
+    __slots__ = FIELDS + ("dcat_bbox", "uuid", "sublayer")
+
     def __init__(self, dataset_dict, website):
         process_id_result = self._process_id(dataset_dict, website)
         if process_id_result is False:
@@ -577,12 +618,11 @@ class Aardvark:
         self.gbl_displayNote_sm = [DISPLAYNOTE] if DISPLAYNOTE else []
 
     def _process_id(self, dataset_dict, website):
-        uuid, sublayer = AardvarkDataProcessor.extract_id_sublayer(
-            dataset_dict["identifier"]
-        )
+        uuid, sublayer = website.id_extractor(dataset_dict["identifier"])
         record_uuid = f"{uuid}{sublayer if sublayer else ''}"
         self.id = f"{website.site_name}-{record_uuid}"
         self.uuid = uuid
+        self.sublayer = sublayer
 
         if not self.id:
             logging.warning("ID is required.")
@@ -605,7 +645,7 @@ class Aardvark:
         return True
 
     def _process_extracted_dataset_dict(self, dataset_dict, website):
-        self.dct_spatial_sm = website.site_details["Spatial"]
+        self.dct_spatial_sm = website.site_details.get("Spatial", [])
 
         prefix = website.site_details["CreatedBy"]
         title = prefix + " - " + dataset_dict["title"]
@@ -643,6 +683,7 @@ class Aardvark:
 
         # dcat_keyword_sm (string multiple!)
         self.dcat_keyword_sm = dataset_dict["keyword"]
+        self.dcat_theme_sm = dataset_dict["themes"]
 
         self._process_distributions(dataset_dict)
 
@@ -688,10 +729,27 @@ class Aardvark:
         defaultBbox = AardvarkDataProcessor.default_bbox(website)
 
         try:
-            processed_spatial = AardvarkDataProcessor.process_dcat_spatial(
-                dataset_dict["spatial"], defaultBbox
-            )
+            checked = website.bbox_results.get(dataset_dict["spatial"])
+            if checked is None:
+                processed_spatial = AardvarkDataProcessor.process_dcat_spatial(
+                    dataset_dict["spatial"], defaultBbox
+                )
+            else:
+                processed_spatial, error = checked
+                if error:
+                    raise ValueError(error)
+            bounds = envelope_bounds(processed_spatial)
+            places = website.place_results.get(dataset_dict["spatial"])
+            if places is None:
+                places = PLACES.intersecting(bounds)
+            if defaultBbox["envelope"] is not None and not places:
+                raise ValueError(
+                    f"Bounding box does not intersect any known place:\n{dataset_dict['spatial']}"
+                )
             self.locn_geometry = self.dcat_bbox = processed_spatial
+            self.dct_spatial_sm = PLACES.spatial_terms(
+                bounds, self.dct_spatial_sm, SPATIAL_MAX_PLACES, places=places
+            )
         except ValueError as e:
             logging.warning(
                 f"There was a problem interpreting the bbox information for: {self.id}\n"
@@ -763,40 +821,12 @@ class Aardvark:
         """
         Serialize the object to a dictionary, excluding None or empty values.
         """
-        # List all the attributes that you want to include in the JSON output.
-        attributes = [
-            "id",
-            "dct_title_s",
-            "dct_creator_sm",
-            "dct_publisher_sm",
-            "dct_identifier_sm",
-            "dct_rights_sm",
-            "pcdm_memberOf_sm",
-            "gbl_resourceClass_sm",
-            "dct_accessRights_s",
-            "gbl_mdModified_dt",
-            "gbl_mdVersion_s",
-            "dct_language_sm",
-            "schema_provider_s",
-            "gbl_suppressed_b",
-            "gbl_displayNote_sm",
-            "dct_spatial_sm",
-            "dct_description_sm",
-            "dct_issued_s",
-            "dcat_keyword_sm",
-            "dct_references_s",
-            "dct_format_s",
-            "gbl_resourceType_sm",
-            "locn_geometry",
-            "dct_temporal_sm",
-            "gbl_indexYear_im",
-        ]
-        # Build the dictionary with attribute names and their values if they are not None or empty.
-        return {
-            attr: getattr(self, attr)
-            for attr in attributes
-            if hasattr(self, attr) and getattr(self, attr)
-        }
+        record = {}
+        for field in self.FIELDS:
+            value = getattr(self, field, None)
+            if value:
+                record[field] = value
+        return record
 
     def __str__(self):
         # Use the to_dict method to get the dictionary representation of the object.
@@ -806,30 +836,124 @@ class Aardvark:
 
     def toJSON(self):
         aardvark_dict = self.to_dict()  # Use the new to_dict method
-        json_dump = json.dumps(aardvark_dict)
-        schema = AardvarkDataProcessor.load_schema()
-        is_valid, error = AardvarkDataProcessor.validate_json(aardvark_dict, schema)
+        validator = AardvarkDataProcessor.schema_validator()
+        is_valid, error = AardvarkDataProcessor.validate_json(aardvark_dict, validator)
         if is_valid:
-            return json_dump
+            return dumps(aardvark_dict)
         else:
             logging.warning(f"Failed JSON Validation:\n{error}")
-            logging.debug(str(json_dump))
+            logging.debug(dumps(aardvark_dict))
             return None
 
     def is_valid(self):
-        json_dump = self.toJSON()  # Call toJSON as a method
-        if json_dump is None:
-            return False, "JSON serialization failed."
-
-        json_object = json.loads(
-            json_dump
-        )  # Parse the JSON string back into a dictionary
-        schema = AardvarkDataProcessor.load_schema()
-        is_valid, error = AardvarkDataProcessor.validate_json(json_object, schema)
-        if is_valid:
-            return True, None
-        else:
-            return False, error
+        # Validate the dictionary itself rather than a JSON round trip of it.
+        validator = AardvarkDataProcessor.schema_validator()
+        return AardvarkDataProcessor.validate_json(self.to_dict(), validator)
+
+
+def enable_profiling(top_n: int = PROFILETOP) -> HarvestProfiler:
+    """Instrument the record construction steps and start collecting timings."""
+    PROFILER.top_n = top_n
+    PROFILER.instrument(
+        Aardvark,
+        [
+            "_process_id",
+            "_initialize_default_field_values",
+            "_process_extracted_dataset_dict",
+            "_process_spatial",
+            "_process_distributions",
+            "_process_temporal_coverage",
+            "to_dict",
+            "toJSON",
+        ],
+    )
+    PROFILER.instrument(
+        AardvarkDataProcessor,
+        [
+            "extract_data",
+            "extract_id_sublayer",
+            "default_bbox",
+            "process_dcat_spatial",
+            "process_distribution",
+            "process_dataset_class_type_and_format",
+            "issue_date_parser",
+            "load_schema",
+            "schema_validator",
+            "validate_json",
+        ],
+    )
+    PROFILER.enable()
+    return PROFILER
+
+
+def check_site_spatial(website: Site) -> dict:
+    """
+    Validate every spatial string of a site's catalog in one batch, and look
+    up the places intersecting the accepted envelopes in one pass.
+    """
+    spatial_strings = list(
+        {
+            dataset.get("spatial")
+            for dataset in website.site_json.get("dataset", [])
+            if isinstance(dataset.get("spatial"), str)
+        }
+    )
+    batch = validate_bboxes(
+        spatial_strings, AardvarkDataProcessor.default_bbox(website)
+    )
+    website.bbox_results = {
+        spatial_string: (batch.envelope(row), batch.message(row))
+        for row, spatial_string in enumerate(spatial_strings)
+    }
+    accepted = [
+        spatial_string
+        for spatial_string, (envelope, _error) in website.bbox_results.items()
+        if envelope
+    ]
+    website.place_results = dict(
+        zip(
+            accepted,
+            PLACES.query_many(
+                envelope_bounds(website.bbox_results[spatial_string][0])
+                for spatial_string in accepted
+            ),
+        )
+    )
+    logging.info(
+        f"{website.site_name}: {int((batch.errors != 0).sum())} of "
+        f"{len(spatial_strings)} distinct bounding boxes rejected"
+    )
+    return website.bbox_results
+
+
+def write_site_records(
+    website: Site, output_dir: Path, dedup: Optional[DeduplicationIndex] = None
+) -> int:
+    """
+    Crosswalk every dataset of a site and write one Aardvark JSON file each.
+    Records are dropped as soon as they are written, so memory stays flat
+    however large the catalog is; returns the number of files written.
+    """
+    written = 0
+    check_site_spatial(website)
+    for dataset in website.site_json["dataset"]:
+        record_label = f"{website.site_name}: {dataset.get('identifier')}"
+        try:
+            with PROFILER.record(record_label):
+                new_aardvark_object = Aardvark(dataset, website)
+                kept_id = dedup.match(new_aardvark_object) if dedup else None
+                if kept_id and not dedup.apply(
+                    new_aardvark_object, kept_id, output_dir
+                ):
+                    continue
+                newfile = f"{new_aardvark_object.id}.json"
+                newfilePath = output_dir / newfile
+                with open(newfilePath, "w", encoding="utf-8") as f:
+                    f.write(new_aardvark_object.toJSON())
+                written += 1
+        except InitializationError as e:
+            logging.debug(str(e))
+    return written
 
 
 # Main Function
@@ -848,21 +972,48 @@ def main():
     clear_output_directory(OUTPUTDIR)
     ensure_collection_record(OUTPUTDIR)
 
+    dedup = DeduplicationIndex(DEDUP_POLICY) if DEDUP_POLICY else None
     for website in list_of_sites:
-        new_aardvark_objects = []
-        for dataset in website.site_json["dataset"]:
-            try:
-                new_aardvark_object = Aardvark(dataset, website)
-                new_aardvark_objects.append(new_aardvark_object)
-                newfile = f"{new_aardvark_object.id}.json"
-                newfilePath = OUTPUTDIR / newfile
-                with open(newfilePath, "w", encoding="utf-8") as f:
-                    f.write(new_aardvark_object.toJSON())
-            except InitializationError as e:
-                logging.debug(str(e))
+        written = write_site_records(website, OUTPUTDIR, dedup)
+        logging.info(f"{website.site_name}: wrote {written} records")
+
+    if dedup:
+        logging.info(dedup.summary())
+    HTTP.log_metrics()
 
 
 if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        description="Harvest DCAT catalogs into OGM Aardvark JSON."
+    )
+    arg_parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Time each record construction step and write a profile to PROFILEDIR",
+    )
+    arg_parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=PROFILETOP,
+        help="Number of slowest records to include in the profile summary",
+    )
+    arg_parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Cache catalogs and the schema under http_cache.path between runs",
+    )
+    arg_parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Replay catalogs and the schema from the cache without network access",
+    )
+    args = arg_parser.parse_args()
+
+    if args.cache or args.offline:
+        enable_cache(offline=args.offline)
+    if args.profile:
+        enable_profiling(args.profile_top)
+
     dt = datetime.now().strftime(r"%Y-%m-%d %H:%M:%S")
     try:
         main()
@@ -870,3 +1021,9 @@ if __name__ == "__main__":
     except Exception as e:
         logging.error(str(e))
         logging.warning(f"DCAT harvest finished with errors at {dt}")
+    finally:
+        if PROFILER.enabled:
+            PROFILER.disable()
+            stamp = datetime.now().strftime(r"%Y%m%d-%H%M%S")
+            for path in PROFILER.write_report(PROFILEDIR, f"dcat-profile-{stamp}"):
+                print(f"Profile written to {path}")
@@ -0,0 +1,126 @@
+"""
+bbox.py
+Dependencies: numpy is not part of the standard library.
+Description: Batch parsing and validation of DCAT spatial strings. Every
+"spatial" value of a site's catalog is parsed once into an (N, 4) array and
+the range, ordering, degeneracy and default-bbox checks run as array
+operations over all rows. Longitudes are oriented by envelope.py, so a box
+that crosses the 180° meridian keeps west > east instead of being swapped
+into a box spanning the rest of the globe. Each row gets an error code (OK
+when valid) and valid rows an ENVELOPE(W,E,N,S) string. process_spatial()
+validates a single string with the same rules and raises ValueError with the
+messages the harvester has always logged.
+"""
+
+import re
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+import numpy as np
+
+from envelope import orient_longitudes
+
+OK = 0
+NON_CONFORMING = 1
+LONGITUDE_RANGE = 2
+LATITUDE_RANGE = 3
+DEGENERATE = 4
+OUTSIDE_DEFAULT = 5
+
+ERROR_MESSAGES = {
+    NON_CONFORMING: "Non-conforming spatial bounding box",
+    LONGITUDE_RANGE: "Longitude coordinates must be between -180 and 180",
+    LATITUDE_RANGE: "Latitude coordinates must be between -90 and 90",
+    DEGENERATE: "The bounding box has matching NS or EW coordinates",
+    OUTSIDE_DEFAULT: "Bounding box falls outside of default bounding box",
+}
+
+COORDINATE_PATTERN = re.compile(r"(-?\d+\.\d+)")
+
+# Degrees of slack around the site's default bbox.
+DEFAULT_BUFFER = 1.0
+
+
+class BboxBatch(NamedTuple):
+    spatial_strings: List[Optional[str]]
+    # Rows are (west, south, east, north), west > east across the dateline;
+    # NaN where the string did not parse.
+    bounds: np.ndarray
+    errors: np.ndarray
+
+    def envelope(self, row: int) -> Optional[str]:
+        if self.errors[row] != OK:
+            return None
+        west, south, east, north = self.bounds[row].tolist()
+        return f"ENVELOPE({west},{east},{north},{south})"
+
+    def envelopes(self) -> List[Optional[str]]:
+        return [self.envelope(row) for row in range(len(self.errors))]
+
+    def message(self, row: int) -> Optional[str]:
+        code = int(self.errors[row])
+        if code == OK:
+            return None
+        return f"{ERROR_MESSAGES[code]}:\n{self.spatial_strings[row]}"
+
+
+def parse_bboxes(spatial_strings: Iterable[Optional[str]]) -> np.ndarray:
+    """Parse x1, y1, x2, y2 from each string; rows without exactly four are NaN."""
+    rows = []
+    for spatial_string in spatial_strings:
+        matches = (
+            COORDINATE_PATTERN.findall(spatial_string)
+            if isinstance(spatial_string, str)
+            else []
+        )
+        rows.append(
+            [float(match) for match in matches] if len(matches) == 4 else [np.nan] * 4
+        )
+    return np.array(rows, dtype=np.float64).reshape(len(rows), 4)
+
+
+def validate_bboxes(
+    spatial_strings: Iterable[Optional[str]], default_bbox: Optional[Dict] = None
+) -> BboxBatch:
+    """Parse and check a whole catalog's spatial strings at once."""
+    spatial_strings = list(spatial_strings)
+    raw = parse_bboxes(spatial_strings)
+    longitudes = raw[:, [0, 2]]
+    latitudes = raw[:, [1, 3]]
+
+    west, east = orient_longitudes(raw[:, 0], raw[:, 2])
+    south, north = latitudes.min(axis=1), latitudes.max(axis=1)
+    bounds = np.column_stack((west, south, east, north))
+
+    conditions = [
+        np.isnan(raw).any(axis=1),
+        ((longitudes < -180) | (longitudes > 180)).any(axis=1),
+        ((latitudes < -90) | (latitudes > 90)).any(axis=1),
+        (north == south) | (west == east),
+    ]
+    codes = [NON_CONFORMING, LONGITUDE_RANGE, LATITUDE_RANGE, DEGENERATE]
+
+    if default_bbox and all(
+        default_bbox.get(key) is not None for key in ("west", "east", "north", "south")
+    ):
+        # A dateline-crossing box never fits inside a site's default bbox.
+        conditions.append(
+            (west > east)
+            | (west < default_bbox["west"] - DEFAULT_BUFFER)
+            | (east > default_bbox["east"] + DEFAULT_BUFFER)
+            | (north > default_bbox["north"] + DEFAULT_BUFFER)
+            | (south < default_bbox["south"] - DEFAULT_BUFFER)
+        )
+        codes.append(OUTSIDE_DEFAULT)
+
+    # np.select takes the first matching condition, so earlier checks win.
+    errors = np.select(conditions, codes, default=OK).astype(np.int8)
+    return BboxBatch(spatial_strings, bounds, errors)
+
+
+def process_spatial(spatial_string: str, default_bbox: Optional[Dict] = None) -> str:
+    """Validate one spatial string and return its envelope, or raise ValueError."""
+    batch = validate_bboxes([spatial_string], default_bbox)
+    message = batch.message(0)
+    if message is not None:
+        raise ValueError(message)
+    return batch.envelope(0)
@@ -0,0 +1,101 @@
+"""
+benchmark_records.py
+Dependencies: the DCAT_Harvester.py dependencies.
+Description: Measures the memory held by harvested Aardvark records and how
+fast they serialize. Datasets from a DCAT catalog are crosswalked repeatedly
+until --records objects exist; tracemalloc reports the bytes retained per
+10,000 records, then to_dict() and json.dumps() are timed over all of them.
+Run it before and after changes to the record model, e.g.
+
+    python benchmark_records.py --catalog ../uwm_fixture/MCLIO_dcat.json
+"""
+
+import argparse
+import gc
+import json
+import logging
+import time
+import tracemalloc
+from pathlib import Path
+
+from DCAT_Harvester import Aardvark, InitializationError, Site, check_site_spatial
+
+CONFIG_DIR = Path(__file__).resolve().parent
+DEFAULT_CATALOG = CONFIG_DIR.parent / "uwm_fixture" / "MCLIO_dcat.json"
+
+
+def build_records(website: Site, count: int) -> list:
+    datasets = website.site_json["dataset"]
+    records = []
+    while len(records) < count:
+        built = len(records)
+        for dataset in datasets[: count - len(records)]:
+            try:
+                records.append(Aardvark(dataset, website))
+            except InitializationError:
+                continue
+        # Another pass over the same datasets would not build any either.
+        if len(records) == built:
+            raise ValueError(f"No buildable records in {website.site_name}'s catalog")
+    return records
+
+
+def per_record_us(function, records, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for record in records:
+            function(record)
+        best = min(best, time.perf_counter() - start)
+    return best / len(records) * 1e6
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(
+        description="Benchmark memory and serialization of Aardvark records."
+    )
+    arg_parser.add_argument("--catalog", type=Path, default=DEFAULT_CATALOG)
+    arg_parser.add_argument("--records", type=int, default=10000)
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    args = arg_parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    with open(args.catalog, encoding="utf-8") as catalog:
+        site_json = json.load(catalog)
+    website = Site(
+        "Benchmark",
+        {
+            "CreatedBy": "Benchmark",
+            "Spatial": ["Wisconsin", "United States"],
+            "DefaultBbox": "Wisconsin",
+        },
+        site_json,
+        [],
+        [],
+        [],
+    )
+    check_site_spatial(website)
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    records = build_records(website, args.records)
+    build_time = time.perf_counter() - start
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    to_dict_us = per_record_us(Aardvark.to_dict, records, args.repeat)
+    dumps_us = per_record_us(
+        lambda record: json.dumps(record.to_dict()), records, args.repeat
+    )
+    print(f"records:              {len(records)} from {args.catalog.name}")
+    print(f"build:                {build_time / len(records) * 1e6:.1f} us/record")
+    print(f"retained memory:      {retained / len(records) * 1e4 / 2**20:.2f} MiB/10k")
+    print(f"to_dict:              {to_dict_us:.2f} us/record")
+    print(f"to_dict + json.dumps: {dumps_us:.2f} us/record")
+
+
+if __name__ == "__main__":
+    main()
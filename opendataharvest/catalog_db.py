@@ -0,0 +1,431 @@
+"""
+catalog_db.py
+Dependencies: the envelope.py dependencies; sqlite3 and its JSON1 and R*Tree
+extensions ship with Python.
+Description: A local SQLite catalog of every OGM record, so questions such as
+"which records have provider X" or "which ids lack a bbox" are answered by an
+indexed query instead of an rglob() and json.load() of the whole tree. Each
+record is stored as JSON (queryable with json_extract()) next to indexed id,
+provider, resource class and metadata version columns, and its bounding box is
+kept in an R*Tree, split in two when it crosses the 180° meridian. update()
+only re-reads files whose mtime or size changed since the last run and drops
+records of files that were deleted.
+
+Usage: python catalog_db.py [--db PATH] update [ROOT ...]
+       python catalog_db.py [--db PATH] query [--provider P] [--missing-bbox] ...
+       python catalog_db.py [--db PATH] sql "SELECT ..."
+"""
+
+import argparse
+import logging
+import os
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Union
+
+import yaml
+
+from envelope import Bounds, parse_envelope, split_bounds
+from jsonio import dumps, load, loads
+from normalize import iter_json_files
+
+CONFIG_DIR = Path(__file__).resolve().parent
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS records (
+    rowid INTEGER PRIMARY KEY,
+    file TEXT NOT NULL REFERENCES files (path) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    id TEXT,
+    provider TEXT,
+    md_version TEXT,
+    bbox TEXT,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS records_file ON records (file);
+CREATE INDEX IF NOT EXISTS records_id ON records (id);
+CREATE INDEX IF NOT EXISTS records_provider ON records (provider);
+CREATE INDEX IF NOT EXISTS records_md_version ON records (md_version);
+CREATE INDEX IF NOT EXISTS records_missing_bbox ON records (id) WHERE bbox IS NULL;
+CREATE TABLE IF NOT EXISTS resource_classes (
+    record INTEGER NOT NULL REFERENCES records (rowid) ON DELETE CASCADE,
+    resource_class TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS resource_classes_class
+    ON resource_classes (resource_class, record);
+CREATE INDEX IF NOT EXISTS resource_classes_record ON resource_classes (record);
+-- One row per envelope part; id is record rowid * 2 + part.
+CREATE VIRTUAL TABLE IF NOT EXISTS bboxes USING rtree (
+    id, west, east, south, north
+);
+CREATE TRIGGER IF NOT EXISTS records_drop_bbox AFTER DELETE ON records BEGIN
+    DELETE FROM bboxes WHERE id IN (old.rowid * 2, old.rowid * 2 + 1);
+END;
+"""
+
+# Aardvark fields first, then their GeoBlacklight 1.0 equivalents.
+PROVIDER_FIELDS = ("schema_provider_s", "dct_provenance_s")
+ID_FIELDS = ("id", "layer_slug_s")
+VERSION_FIELDS = ("gbl_mdVersion_s", "geoblacklight_version")
+BBOX_FIELDS = ("dcat_bbox", "locn_geometry", "solr_geom")
+
+# Inserts are sent to SQLite in batches of this many records.
+BATCH_SIZE = 500
+
+
+class UpdateStats(NamedTuple):
+    scanned: int
+    updated: int
+    removed: int
+    records: int
+    seconds: float
+
+
+def first_value(record: Dict, fields: Sequence[str]) -> Optional[str]:
+    for field in fields:
+        value = record.get(field)
+        if value:
+            return value if isinstance(value, str) else str(value)
+    return None
+
+
+def record_bbox(record: Dict) -> Optional[str]:
+    """The record's envelope as ENVELOPE(W,E,N,S), or None if it has no valid one."""
+    for field in BBOX_FIELDS:
+        try:
+            return str(parse_envelope(record.get(field)))
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def resource_classes(record: Dict) -> List[str]:
+    classes = record.get("gbl_resourceClass_sm") or []
+    if isinstance(classes, str):
+        classes = [classes]
+    return [value for value in classes if isinstance(value, str)]
+
+
+class CatalogDB:
+    def __init__(self, path: Union[str, Path] = ":memory:"):
+        self.path = path
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(str(path))
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.executescript(SCHEMA)
+
+    @classmethod
+    def from_config(cls, settings: Dict, base_dir: Path) -> "CatalogDB":
+        """Open the database named by the catalog_db config section."""
+        path = Path(settings.get("path", "tmp/catalog.sqlite3"))
+        if not path.is_absolute():
+            path = (base_dir / path).resolve()
+        return cls(path)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self) -> "CatalogDB":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    # Ingest
+
+    def update(self, rootdir: Path) -> UpdateStats:
+        """
+        Bring the catalog up to date with rootdir: files whose mtime or size
+        changed are re-read and files that no longer exist are dropped.
+        """
+        start = time.perf_counter()
+        rootdir = Path(rootdir).resolve()
+        prefix = str(rootdir) + os.sep
+        known = {
+            row["path"]: (row["mtime_ns"], row["size"])
+            for row in self.connection.execute(
+                "SELECT path, mtime_ns, size FROM files "
+                "WHERE substr(path, 1, ?) = ?",
+                (len(prefix), prefix),
+            )
+        }
+        scanned = updated = records = 0
+        pending = []
+        with self.connection:
+            for path in iter_json_files(rootdir):
+                scanned += 1
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                key = str(path)
+                signature = (stat.st_mtime_ns, stat.st_size)
+                if known.pop(key, None) == signature:
+                    continue
+                updated += 1
+                records += self._replace_file(key, signature, pending)
+                if len(pending) >= BATCH_SIZE:
+                    self._insert(pending)
+            self._insert(pending)
+            self.connection.executemany(
+                "DELETE FROM files WHERE path = ?", [(path,) for path in known]
+            )
+        stats = UpdateStats(
+            scanned, updated, len(known), records, time.perf_counter() - start
+        )
+        logging.info(
+            f"Catalog update of {rootdir}: scanned {stats.scanned} files, "
+            f"re-read {stats.updated}, removed {stats.removed} "
+            f"in {stats.seconds:.2f}s"
+        )
+        return stats
+
+    def _replace_file(self, path: str, signature, pending: List) -> int:
+        try:
+            data = load(path)
+            error = None
+        except (OSError, ValueError) as e:
+            logging.warning(f"Catalog skipped unreadable file {path}: {e}")
+            data, error = [], str(e)
+        # Deleting the old row cascades to its records and their boxes.
+        self.connection.execute("DELETE FROM files WHERE path = ?", (path,))
+        self.connection.execute(
+            "INSERT INTO files (path, mtime_ns, size, error) VALUES (?, ?, ?, ?)",
+            (path, *signature, error),
+        )
+        count = 0
+        for position, record in enumerate(data if isinstance(data, list) else [data]):
+            if isinstance(record, dict):
+                pending.append((path, position, record))
+                count += 1
+        return count
+
+    def _insert(self, pending: List) -> None:
+        if not pending:
+            return
+        rows, classes, boxes = [], [], []
+        (next_rowid,) = self.connection.execute(
+            "SELECT coalesce(max(rowid), 0) + 1 FROM records"
+        ).fetchone()
+        for rowid, (path, position, record) in enumerate(pending, next_rowid):
+            bbox = record_bbox(record)
+            rows.append(
+                (
+                    rowid,
+                    path,
+                    position,
+                    first_value(record, ID_FIELDS),
+                    first_value(record, PROVIDER_FIELDS),
+                    first_value(record, VERSION_FIELDS),
+                    bbox,
+                    dumps(record),
+                )
+            )
+            classes.extend((rowid, value) for value in resource_classes(record))
+            if bbox is not None:
+                for part, (west, south, east, north) in enumerate(
+                    parse_envelope(bbox).parts()
+                ):
+                    boxes.append((rowid * 2 + part, west, east, south, north))
+        self.connection.executemany(
+            "INSERT INTO records VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+        )
+        self.connection.executemany(
+            "INSERT INTO resource_classes VALUES (?, ?)", classes
+        )
+        self.connection.executemany("INSERT INTO bboxes VALUES (?, ?, ?, ?, ?)", boxes)
+        pending.clear()
+
+    # Queries
+
+    def _where(
+        self,
+        id: Optional[str] = None,
+        provider: Optional[str] = None,
+        resource_class: Optional[str] = None,
+        md_version: Optional[str] = None,
+        missing_bbox: bool = False,
+        bbox: Optional[Union[str, Bounds]] = None,
+        where: Optional[str] = None,
+        params: Sequence = (),
+    ):
+        clauses, values = [], []
+        for column, value in (
+            ("id", id),
+            ("provider", provider),
+            ("md_version", md_version),
+        ):
+            if value is not None:
+                clauses.append(f"records.{column} = ?")
+                values.append(value)
+        if resource_class is not None:
+            clauses.append(
+                "records.rowid IN (SELECT record FROM resource_classes "
+                "WHERE resource_class = ?)"
+            )
+            values.append(resource_class)
+        if missing_bbox:
+            clauses.append("records.bbox IS NULL")
+        if bbox is not None:
+            bounds = parse_envelope(bbox).bounds if isinstance(bbox, str) else bbox
+            parts = []
+            for west, south, east, north in split_bounds(tuple(bounds)):
+                parts.append("(west <= ? AND east >= ? AND south <= ? AND north >= ?)")
+                values.extend((east, west, north, south))
+            clauses.append(
+                "records.rowid IN (SELECT id / 2 FROM bboxes WHERE "
+                + " OR ".join(parts)
+                + ")"
+            )
+        if where:
+            clauses.append(f"({where})")
+            values.extend(params)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), values
+
+    def select(self, columns: str, **filters) -> Iterator[sqlite3.Row]:
+        """
+        Rows of the records table matching the filters: id, provider,
+        resource_class, md_version, missing_bbox, bbox (an ENVELOPE string or
+        (west, south, east, north) bounds) and a raw SQL where clause, e.g.
+        "json_extract(record, '$.dct_accessRights_s') = ?" with params.
+        """
+        clause, values = self._where(**filters)
+        return self.connection.execute(
+            f"SELECT {columns} FROM records{clause} ORDER BY records.rowid", values
+        )
+
+    def records(self, **filters) -> Iterator[Dict]:
+        for row in self.select("record", **filters):
+            yield loads(row["record"])
+
+    def ids(self, **filters) -> List[str]:
+        return [row["id"] for row in self.select("id", **filters)]
+
+    def files(self, **filters) -> List[Path]:
+        """Files holding matching records, in place of iter_json_files()."""
+        paths = dict.fromkeys(row["file"] for row in self.select("file", **filters))
+        return [Path(path) for path in paths]
+
+    def count(self, **filters) -> int:
+        clause, values = self._where(**filters)
+        (count,) = self.connection.execute(
+            f"SELECT count(*) FROM records{clause}", values
+        ).fetchone()
+        return count
+
+    def unreadable(self) -> Dict[str, str]:
+        return dict(
+            self.connection.execute(
+                "SELECT path, error FROM files WHERE error IS NOT NULL ORDER BY path"
+            ).fetchall()
+        )
+
+    def sql(self, statement: str, params: Sequence = ()) -> List[sqlite3.Row]:
+        return self.connection.execute(statement, params).fetchall()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    with open(CONFIG_DIR / "config.yaml", "r", encoding="utf-8") as file:
+        config = yaml.safe_load(file)
+    default_root = (
+        CONFIG_DIR / os.getenv("OGM_PATH", config["paths"]["ogm_path"])
+    ).resolve()
+
+    arg_parser = argparse.ArgumentParser(
+        description="Build and query a SQLite catalog of OGM records."
+    )
+    arg_parser.add_argument(
+        "--db", type=Path, help="Database file (default: catalog_db.path)"
+    )
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+
+    update_parser = commands.add_parser("update", help="Ingest new and changed files")
+    update_parser.add_argument(
+        "roots",
+        type=Path,
+        nargs="*",
+        default=[default_root],
+        help="Repository directories (default: paths.ogm_path)",
+    )
+
+    query_parser = commands.add_parser("query", help="List matching records")
+    query_parser.add_argument("--id")
+    query_parser.add_argument("--provider")
+    query_parser.add_argument("--resource-class")
+    query_parser.add_argument("--md-version")
+    query_parser.add_argument("--missing-bbox", action="store_true")
+    query_parser.add_argument("--bbox", help="ENVELOPE(W,E,N,S) to intersect")
+    query_parser.add_argument("--where", help="Extra SQL condition on records")
+    query_parser.add_argument(
+        "--format", choices=("ids", "files", "json", "count"), default="ids"
+    )
+    query_parser.add_argument(
+        "--refresh",
+        type=Path,
+        action="append",
+        default=[],
+        metavar="ROOT",
+        help="Update the catalog from ROOT before querying",
+    )
+
+    sql_parser = commands.add_parser("sql", help="Run a SQL statement")
+    sql_parser.add_argument("statement")
+    args = arg_parser.parse_args(argv)
+
+    if args.db:
+        db = CatalogDB(args.db)
+    else:
+        db = CatalogDB.from_config(config.get("catalog_db") or {}, CONFIG_DIR)
+    with db:
+        if args.command == "update":
+            for root in args.roots:
+                stats = db.update(root)
+                print(
+                    f"{root}: scanned {stats.scanned} files, re-read {stats.updated}, "
+                    f"removed {stats.removed}, {stats.records} records "
+                    f"in {stats.seconds:.2f}s"
+                )
+        elif args.command == "query":
+            for root in args.refresh:
+                db.update(root)
+            filters = dict(
+                id=args.id,
+                provider=args.provider,
+                resource_class=args.resource_class,
+                md_version=args.md_version,
+                missing_bbox=args.missing_bbox,
+                bbox=args.bbox,
+                where=args.where,
+            )
+            if args.format == "count":
+                print(db.count(**filters))
+            elif args.format == "files":
+                for path in db.files(**filters):
+                    print(path)
+            elif args.format == "json":
+                for record in db.records(**filters):
+                    print(dumps(record))
+            else:
+                for record_id in db.ids(**filters):
+                    print(record_id)
+        else:
+            for row in db.sql(args.statement):
+                print("\t".join("" if value is None else str(value) for value in row))
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
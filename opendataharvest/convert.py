@@ -4,12 +4,15 @@ import os
 import logging
 from datetime import datetime, timezone
 from pathlib import Path
-import tempfile
 from typing import Dict, List, Optional, Tuple
 import argparse
 import yaml
 from classify import ResourceClassifier
+from envelope import normalize_envelope
+from git_changes import mark_processed, pending_changes
+from jsonio import load, write_json_atomically
 from normalize import MetadataNormalizer
+from schema_validator import CompiledValidator, load_schema
 
 CONFIG_DIR = Path(__file__).resolve().parent
 
@@ -34,33 +37,6 @@ class LoggerConfig:
         )
 
 
-def write_json_atomically(path: Path, data: Dict) -> None:
-    """Write JSON without leaving empty or truncated destination files."""
-    path.parent.mkdir(parents=True, exist_ok=True)
-
-    with tempfile.NamedTemporaryFile(
-        "w",
-        encoding="utf8",
-        dir=path.parent,
-        delete=False,
-    ) as tmp_file:
-        tmp_path = Path(tmp_file.name)
-        json.dump(data, tmp_file, indent=2)
-        tmp_file.write("\n")
-        tmp_file.flush()
-        os.fsync(tmp_file.fileno())
-
-    try:
-        with open(tmp_path, encoding="utf8") as check_file:
-            json.load(check_file)
-        if tmp_path.stat().st_size == 0:
-            raise ValueError(f"Refusing to replace {path} with an empty JSON file.")
-        os.replace(tmp_path, path)
-    except Exception:
-        tmp_path.unlink(missing_ok=True)
-        raise
-
-
 class SchemaUpdater:
     CROSSWALK_PATH = (CONFIG_DIR / config["paths"]["crosswalk"]).resolve()
 
@@ -70,6 +46,7 @@ class SchemaUpdater:
         resource_class_default: str = None,
         resource_type_default: str = None,
         place_default: Optional[str] = None,
+        validator: Optional[CompiledValidator] = None,
     ):
         self.RESOURCE_CLASS_DEFAULT = resource_class_default
         self.RESOURCE_TYPE_DEFAULT = resource_type_default
@@ -80,6 +57,7 @@ class SchemaUpdater:
             logging.critical(f"Failed to load crosswalk: {e}")
             self.crosswalk = {}
         self.overwrite_values = overwrite_values if overwrite_values else {}
+        self.validator = validator
 
     @staticmethod
     def load_crosswalk(crosswalk_path: Path) -> Dict[str, str]:
@@ -97,12 +75,38 @@ class SchemaUpdater:
             logging.critical(f"Error loading crosswalk: {e}")
         return crosswalk
 
-    def update_all_schemas(self, dir_old_schema: Path, dir_new_schema: Path) -> None:
-        """Update schemas for all JSON files in the directory."""
+    def update_all_schemas(
+        self, dir_old_schema: Path, dir_new_schema: Path, incremental: bool = False
+    ) -> None:
+        """
+        Update schemas for all JSON files in the directory, or with
+        incremental only for those changed in its git checkout since the last
+        incremental run. The run is only recorded if every file converted, so
+        the next incremental run retries any that failed.
+        """
         dir_new_schema.mkdir(parents=True, exist_ok=True)
-        for file in self.list_all_json_files(dir_old_schema):
+        changes = pending_changes(dir_old_schema, "convert") if incremental else None
+        if changes is None or changes.full_scan:
+            files = self.list_all_json_files(dir_old_schema)
+        else:
+            logging.info(
+                f"Converting {len(changes.paths)} files changed since {changes.base[:12]}"
+            )
+            files = changes.paths
+        failed = 0
+        for file in files:
             logging.info(f"Processing {file} ...")
-            self.update_schema(file, dir_new_schema)
+            if not self.update_schema(file, dir_new_schema):
+                failed += 1
+        if changes is None:
+            return
+        if failed:
+            logging.warning(
+                f"{failed} files failed to convert; leaving {changes.ref} at "
+                f"{changes.base or 'unset'} so they are retried."
+            )
+        else:
+            mark_processed(changes)
 
     @staticmethod
     def list_all_json_files(rootdir: Path):
@@ -111,14 +115,13 @@ class SchemaUpdater:
             if path.name != "layers.json":
                 yield path
 
-    def update_schema(self, filepath: Path, dir_new_schema: Path) -> None:
-        """Update the schema of a single JSON file."""
+    def update_schema(self, filepath: Path, dir_new_schema: Path) -> bool:
+        """Update the schema of a single JSON file; False if it failed."""
         try:
-            with open(filepath, encoding="utf8") as fr:
-                data = json.load(fr)
+            data = load(filepath)
 
             if not isinstance(data, dict):
-                return
+                return True
 
             for old_schema, new_schema in self.crosswalk.items():
                 if old_schema in data:
@@ -138,10 +141,12 @@ class SchemaUpdater:
                 data[key] = value
 
             # Run normalization and cleanup after conversion.
+            self.normalize_geometry(data)
             data = self.string2array(data)
             self.check_required(data)
             self.apply_normalizations(data)
             self.remove_deprecated(data)
+            self.check_schema(data)
 
             new_filepath = dir_new_schema / (
                 filepath.name
@@ -149,12 +154,14 @@ class SchemaUpdater:
                 else f"{data['id']}.json"
             )
             write_json_atomically(new_filepath, data)
+            return True
         except FileNotFoundError:
             logging.error(f"File not found: {filepath}")
         except json.JSONDecodeError:
             logging.error(f"Error decoding JSON in file: {filepath}")
         except Exception as e:
             logging.error(f"Failed to update schema for {filepath.name}: {e}")
+        return False
 
     def check_required(self, data_dict: Dict) -> None:
         """Check for required fields and handle missing ones."""
@@ -207,9 +214,32 @@ class SchemaUpdater:
             data_dict["gbl_resourceType_sm"],
         ) = self.determine_resource_class_and_type(data_dict)
 
+    def normalize_geometry(self, data_dict: Dict) -> None:
+        """Validate ENVELOPE fields, keeping dateline-crossing boxes intact."""
+        for field in ("locn_geometry", "dcat_bbox"):
+            value = data_dict.get(field)
+            if not isinstance(value, str) or not value.lstrip().startswith("ENVELOPE"):
+                continue
+            try:
+                data_dict[field] = normalize_envelope(value)
+            except ValueError as e:
+                logging.warning(f"Record {data_dict.get('id')}: invalid {field}: {e}")
+
     def apply_normalizations(self, data_dict: Dict) -> None:
         MetadataNormalizer.normalize_document(data_dict)
 
+    def check_schema(self, data_dict: Dict) -> None:
+        """Log converted records that do not validate against the schema."""
+        if self.validator is None:
+            return
+        error = self.validator.best_error(data_dict)
+        if error is not None:
+            path = "/".join(str(part) for part in error.absolute_path) or "<root>"
+            logging.warning(
+                f"Record {data_dict.get('id')} fails schema validation at {path}: "
+                f"{error.message}"
+            )
+
     def remove_deprecated(self, data_dict: Dict) -> None:
         """Remove deprecated fields from the data dictionary."""
         deprecated_fields = config["deprecated_fields"]["remove_deprecated"]
@@ -250,6 +280,10 @@ if __name__ == "__main__":
     parser.add_argument("--resource_type_default", type=str, help="Set default value for resource type")
     parser.add_argument("--place_default", type=str, help="Set default value for place")
 
+    # Optional validation of the converted records
+    parser.add_argument("--schema", type=str, help="Log converted records that fail this schema (path or URL, e.g. CONFIG.SCHEMA)")
+    parser.add_argument("--incremental", action="store_true", help="Only convert files changed in the git checkout since the last incremental run")
+
     args = parser.parse_args()
 
     LoggerConfig.configure_logging()
@@ -259,7 +293,7 @@ if __name__ == "__main__":
     overwrite_values = {
         k: v
         for k, v in vars(args).items()
-        if v is not None and k not in ["dir_old_schema", "dir_new_schema", "resource_class_default", "place_default"]
+        if v is not None and k not in ["dir_old_schema", "dir_new_schema", "resource_class_default", "place_default", "schema", "incremental"]
     }
 
     logging.debug(f"Initializing SchemaUpdater with PLACE_DEFAULT: {args.place_default}")
@@ -269,6 +303,7 @@ if __name__ == "__main__":
         args.resource_class_default,
         args.resource_type_default,
         args.place_default,
+        CompiledValidator(load_schema(args.schema)) if args.schema else None,
     )
-    schema_updater.update_all_schemas(args.dir_old_schema, args.dir_new_schema)
+    schema_updater.update_all_schemas(args.dir_old_schema, args.dir_new_schema, args.incremental)
     logging.info(f"Conversion complete for {args.dir_old_schema}")
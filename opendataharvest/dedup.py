@@ -0,0 +1,159 @@
+"""
+dedup.py
+Dependencies: numpy (through envelope.py) is not part of the standard library.
+Description: Cross-portal duplicate detection for the DCAT and CKAN harvests.
+The same ArcGIS item is often published by several county and state portals,
+and each copy would otherwise become its own {site_name}-{uuid} record.
+DeduplicationIndex maps every record's keys (item uuid plus sublayer, and the
+normalized landing page and distribution URLs from dct_references_s) to the id
+of the first record that claimed them, so each lookup is a dict hit.
+Duplicates are then handled by the configured DEDUP_POLICY:
+    keep_first     write only the first record
+    merge_spatial  write only the first record, widening its dct_spatial_sm
+                   and envelope to cover the duplicate
+    relation       write both and link them through dct_relation_sm
+"""
+
+import json
+import logging
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from envelope import ENVELOPE_PATTERN, parse_envelope, union_envelopes
+from jsonio import dumps, load, loads
+
+POLICIES = ("keep_first", "merge_spatial", "relation")
+
+
+def normalize_url(url: str) -> Optional[str]:
+    """Reduce a URL to a comparable key (case, default ports, slashes, query order)."""
+    if not url or not isinstance(url, str):
+        return None
+    parts = urlsplit(url.strip())
+    if not parts.netloc:
+        return None
+    host = parts.hostname or ""
+    if host.startswith("www."):
+        host = host[4:]
+    port = parts.port
+    if port and (parts.scheme, port) not in (("http", 80), ("https", 443)):
+        host = f"{host}:{port}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    # http and https copies of the same page are the same resource.
+    return urlunsplit(("", host, parts.path.rstrip("/"), query, ""))[2:]
+
+
+def record_keys(record) -> List[str]:
+    """Return the dedup keys of an Aardvark record."""
+    keys = []
+    uuid = getattr(record, "uuid", None)
+    # extract_id_sublayer() falls back to a random uuid.UUID when an identifier
+    # has no id=, which can never match another record.
+    if isinstance(uuid, str) and uuid:
+        keys.append(f"item:{uuid.lower()}/{getattr(record, 'sublayer', None) or ''}")
+
+    references = getattr(record, "dct_references_s", None)
+    if references:
+        for value in loads(references).values():
+            for url in value if isinstance(value, list) else [value]:
+                normalized = normalize_url(url)
+                if normalized:
+                    keys.append(f"url:{normalized}")
+    return keys
+
+
+def merge_envelopes(first: str, second: str) -> str:
+    """Return the smallest ENVELOPE(W,E,N,S) covering both, across the dateline too."""
+    try:
+        union = union_envelopes(parse_envelope(first), parse_envelope(second))
+    except ValueError:
+        return first or second
+    # Keep the original number tokens so unchanged edges are not reformatted.
+    tokens = {}
+    for value in (second, first):
+        for token in ENVELOPE_PATTERN.fullmatch(value).groups():
+            tokens[float(token)] = token.strip()
+    return f"ENVELOPE({','.join(tokens.get(edge, str(edge)) for edge in union)})"
+
+
+class DeduplicationIndex:
+    def __init__(self, policy: str = "keep_first"):
+        if policy not in POLICIES:
+            raise ValueError(
+                f"Unknown dedup policy {policy!r}; expected one of {', '.join(POLICIES)}"
+            )
+        self.policy = policy
+        self._keys: Dict[str, str] = {}
+        self.duplicates: Dict[str, List[str]] = defaultdict(list)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def match(self, record) -> Optional[str]:
+        """
+        Register record and return the id of the record it duplicates, or None.
+        Keys seen for the first time are claimed for the original record so
+        that later copies match on any of them.
+        """
+        keys = record_keys(record)
+        kept_id = next(
+            (self._keys[key] for key in keys if key in self._keys), record.id
+        )
+        for key in keys:
+            self._keys.setdefault(key, kept_id)
+        if kept_id == record.id:
+            return None
+        self.duplicates[kept_id].append(record.id)
+        return kept_id
+
+    def apply(self, record, kept_id: str, output_dir: Path) -> bool:
+        """
+        Apply the policy to a duplicate, updating the kept record's file where
+        needed. Returns True when the duplicate should still be written.
+        """
+        if self.policy == "keep_first":
+            logging.info(f"Skipping {record.id}: duplicate of {kept_id}")
+            return False
+
+        kept_path = output_dir / f"{kept_id}.json"
+        try:
+            kept = load(kept_path)
+        except (FileNotFoundError, json.JSONDecodeError) as e:
+            logging.warning(
+                f"Unable to update {kept_path} for duplicate {record.id}: {e}"
+            )
+            return self.policy == "relation"
+
+        if self.policy == "merge_spatial":
+            places = kept.get("dct_spatial_sm", [])
+            for place in getattr(record, "dct_spatial_sm", None) or []:
+                if place not in places:
+                    places.append(place)
+            if places:
+                kept["dct_spatial_sm"] = places
+            envelope = merge_envelopes(
+                kept.get("locn_geometry"), getattr(record, "locn_geometry", None)
+            )
+            if envelope:
+                kept["locn_geometry"] = envelope
+            logging.info(f"Merged spatial coverage of {record.id} into {kept_id}")
+            write_record = False
+        else:
+            relations = kept.setdefault("dct_relation_sm", [])
+            if record.id not in relations:
+                relations.append(record.id)
+            record.dct_relation_sm = [kept_id]
+            write_record = True
+
+        with open(kept_path, "w", encoding="utf-8") as f:
+            f.write(dumps(kept))
+        return write_record
+
+    def summary(self) -> str:
+        duplicate_count = sum(len(ids) for ids in self.duplicates.values())
+        return (
+            f"Dedup ({self.policy}): {duplicate_count} duplicates of "
+            f"{len(self.duplicates)} records"
+        )
@@ -0,0 +1,149 @@
+"""
+envelope.py
+Dependencies: numpy is not part of the standard library.
+Description: ENVELOPE(W,E,N,S) handling shared by the DCAT harvester,
+convert.py and the agsl_maps DMS converter. A box whose west edge is greater
+than its east edge crosses the 180° meridian, which is how Solr and
+GeoBlacklight represent it, so west and east are never swapped when the order
+is explicit (Aardvark envelopes, MARC 034 $d/$e). DCAT "x1,y1,x2,y2" strings
+are often published with the longitudes reversed; orient_longitudes() treats a
+reversed pair as a dateline crossing only when the swapped reading would be
+wider than 180°, and runs over whole arrays of boxes at once.
+"""
+
+import re
+from typing import List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+Bounds = Tuple[float, float, float, float]
+
+ENVELOPE_PATTERN = re.compile(
+    r"\s*ENVELOPE\(\s*([^,\s]+)\s*,\s*([^,\s]+)\s*,\s*([^,\s]+)\s*,\s*([^)\s]+)\s*\)\s*"
+)
+
+
+class Envelope(NamedTuple):
+    west: float
+    east: float
+    north: float
+    south: float
+
+    @property
+    def crosses_antimeridian(self) -> bool:
+        return self.west > self.east
+
+    @property
+    def width(self) -> float:
+        if self.crosses_antimeridian:
+            return 360.0 - self.west + self.east
+        return self.east - self.west
+
+    @property
+    def bounds(self) -> Bounds:
+        """(west, south, east, north), with west > east across the dateline."""
+        return (self.west, self.south, self.east, self.north)
+
+    def parts(self) -> List[Bounds]:
+        """Split a dateline-crossing box into its eastern and western halves."""
+        return split_bounds(self.bounds)
+
+    def __str__(self) -> str:
+        return format_envelope(self.west, self.east, self.north, self.south)
+
+
+def split_bounds(bounds: Bounds) -> List[Bounds]:
+    west, south, east, north = bounds
+    if west > east:
+        return [(west, south, 180.0, north), (-180.0, south, east, north)]
+    return [bounds]
+
+
+def check_ranges(west, east, north, south) -> None:
+    if not all(-180 <= value <= 180 for value in (west, east)):
+        raise ValueError(
+            f"Longitude coordinates must be between -180 and 180: {west}, {east}"
+        )
+    if not all(-90 <= value <= 90 for value in (north, south)):
+        raise ValueError(
+            f"Latitude coordinates must be between -90 and 90: {north}, {south}"
+        )
+
+
+def format_envelope(west, east, north, south) -> str:
+    """Format an envelope, putting north above south but keeping west/east."""
+    west, east, north, south = (float(value) for value in (west, east, north, south))
+    check_ranges(west, east, north, south)
+    north, south = max(north, south), min(north, south)
+    return f"ENVELOPE({west},{east},{north},{south})"
+
+
+def parse_envelope(value: str) -> Envelope:
+    """Parse ENVELOPE(W,E,N,S); raises ValueError for malformed boxes."""
+    match = ENVELOPE_PATTERN.fullmatch(value or "")
+    if not match:
+        raise ValueError(f"Not an ENVELOPE(W,E,N,S) string: {value!r}")
+    try:
+        west, east, north, south = (float(token) for token in match.groups())
+    except ValueError:
+        raise ValueError(f"Non-numeric ENVELOPE coordinates: {value!r}") from None
+    check_ranges(west, east, north, south)
+    return Envelope(west, east, max(north, south), min(north, south))
+
+
+def union_envelopes(first: Envelope, second: Envelope) -> Envelope:
+    """
+    The narrowest envelope covering both. The longitudes are arcs on a circle,
+    so the union may cross the dateline even when neither input does.
+    """
+
+    def eastward_union(a: Envelope, b: Envelope) -> Tuple[float, float]:
+        # Width and east edge of the union starting at a's west edge.
+        reach = (b.west - a.west) % 360.0 + b.width
+        return (a.width, a.east) if a.width >= reach else (reach, b.east)
+
+    width, east, west = min(
+        eastward_union(first, second) + (first.west,),
+        eastward_union(second, first) + (second.west,),
+    )
+    if width >= 360.0:
+        west, east = -180.0, 180.0
+    return Envelope(
+        west, east, max(first.north, second.north), min(first.south, second.south)
+    )
+
+
+def envelope_bounds(value: Optional[str]) -> Optional[Bounds]:
+    """(west, south, east, north) of an envelope string, or None if invalid."""
+    try:
+        return parse_envelope(value).bounds
+    except ValueError:
+        return None
+
+
+def normalize_envelope(value: str) -> str:
+    """
+    Validate an ENVELOPE string and return it, rewritten only when north and
+    south are reversed. Dateline-crossing boxes keep west > east and points
+    (matching edges) are allowed, as in GeoBlacklight.
+    """
+    parse_envelope(value)
+    west, east, north, south = (
+        token.strip() for token in ENVELOPE_PATTERN.fullmatch(value).groups()
+    )
+    if float(north) >= float(south):
+        return value.strip()
+    separator = ", " if ", " in value else ","
+    return f"ENVELOPE({separator.join((west, east, south, north))})"
+
+
+def orient_longitudes(x1: np.ndarray, x2: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return (west, east) for arrays of unordered longitude pairs. A reversed
+    pair is swapped unless the swapped box would span more than 180°, in which
+    case it is read as crossing the dateline and west > east is kept.
+    """
+    crosses = (x1 > x2) & (x1 - x2 > 180)
+    west = np.where(crosses, x1, np.minimum(x1, x2))
+    east = np.where(crosses, x2, np.maximum(x1, x2))
+    return west, east
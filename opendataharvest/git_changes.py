@@ -0,0 +1,161 @@
+"""
+git_changes.py
+Dependencies: the git command line client.
+Description: Finds the JSON files that changed in an OGM checkout since a
+task (normalize, convert) last processed it, so a run after `git pull` only
+touches the files the pull brought in. The last processed commit is kept in
+the repository itself as refs/opendataharvest/<task> (followed by the
+directory's path when it is below the top of the checkout) and advanced with
+`git update-ref <ref> <new> <old>`, which is atomic and refuses the update if
+another run moved the ref in the meantime. A directory that is not in a git
+checkout, a task that has never run there, or a diff git cannot produce
+falls back to scanning every file.
+"""
+
+import logging
+import subprocess
+from pathlib import Path
+from typing import List, NamedTuple, Optional
+from urllib.parse import quote
+
+REF_PREFIX = "refs/opendataharvest/"
+
+
+class GitError(Exception):
+    pass
+
+
+class ChangeSet(NamedTuple):
+    root: Path
+    repo: Path
+    ref: str
+    base: Optional[str]
+    head: str
+    # None when every file under root has to be processed.
+    paths: Optional[List[Path]]
+
+    @property
+    def full_scan(self) -> bool:
+        return self.paths is None
+
+
+def git(repo: Path, *args: str) -> str:
+    try:
+        result = subprocess.run(
+            ["git", "-C", str(repo), *args],
+            check=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+    except (OSError, subprocess.CalledProcessError) as e:
+        stderr = getattr(e, "stderr", None) or str(e)
+        raise GitError(f"git {' '.join(args)} failed in {repo}: {stderr.strip()}")
+    return result.stdout
+
+
+def repo_root(path: Path) -> Optional[Path]:
+    """The top level of the git checkout containing path, or None."""
+    try:
+        return Path(git(path, "rev-parse", "--show-toplevel").strip()).resolve()
+    except GitError:
+        return None
+
+
+def task_ref(repo: Path, root: Path, task: str) -> str:
+    """The ref holding the last commit task processed under root."""
+    ref = f"{REF_PREFIX}{task}"
+    if root != repo:
+        ref += "/" + quote(root.relative_to(repo).as_posix(), safe="/")
+    return ref
+
+
+def stored_commit(repo: Path, ref: str) -> Optional[str]:
+    try:
+        output = git(repo, "rev-parse", "--verify", "--quiet", ref)
+    except GitError:
+        return None
+    return output.strip() or None
+
+
+def is_json_record_file(path: str) -> bool:
+    name = path.rsplit("/", 1)[-1]
+    return name.endswith(".json") and name != "layers.json"
+
+
+def changed_files(repo: Path, root: Path, base: str, head: str) -> List[Path]:
+    """JSON files under root added or modified between two commits."""
+    pathspec = root.relative_to(repo).as_posix()
+    output = git(
+        repo,
+        "diff",
+        "--name-only",
+        "-z",
+        "--diff-filter=d",
+        base,
+        head,
+        "--",
+        pathspec,
+    )
+    return [
+        repo / name
+        for name in output.split("\0")
+        if name and is_json_record_file(name) and (repo / name).is_file()
+    ]
+
+
+def pending_changes(root: Path, task: str) -> Optional[ChangeSet]:
+    """
+    What task has to process under root, or None if root is not in a git
+    checkout. Pass the result to mark_processed() once the run succeeds.
+    """
+    root = Path(root).resolve()
+    repo = repo_root(root)
+    if repo is None:
+        return None
+    try:
+        head = git(repo, "rev-parse", "--verify", "HEAD").strip()
+    except GitError:
+        logging.info(f"{repo} has no commits; scanning {root} in full")
+        return None
+    ref = task_ref(repo, root, task)
+    base = stored_commit(repo, ref)
+    if base is None:
+        logging.info(f"No {ref} in {repo}; scanning {root} in full")
+        return ChangeSet(root, repo, ref, None, head, None)
+    try:
+        paths = changed_files(repo, root, base, head)
+    except GitError as e:
+        logging.warning(f"{e}; scanning {root} in full")
+        paths = None
+    return ChangeSet(root, repo, ref, base, head, paths)
+
+
+def mark_processed(changes: ChangeSet) -> None:
+    """Atomically record changes.head as the last commit processed."""
+    # An empty old value makes update-ref require that the ref does not exist.
+    git(
+        changes.repo,
+        "update-ref",
+        "-m",
+        "opendataharvest",
+        changes.ref,
+        changes.head,
+        changes.base or "",
+    )
+    logging.info(f"{changes.repo}: {changes.ref} advanced to {changes.head}")
+
+
+def find_checkouts(rootdir: Path) -> List[Path]:
+    """
+    rootdir itself if it is in a git checkout, else its subdirectories. The
+    caller handles files directly under a rootdir that is not.
+    """
+    rootdir = Path(rootdir).resolve()
+    if repo_root(rootdir) is not None:
+        return [rootdir]
+    return sorted(
+        path
+        for path in rootdir.iterdir()
+        if path.is_dir() and not path.name.startswith(".")
+    )
@@ -0,0 +1,238 @@
+"""
+http_cache.py
+Dependencies: requests is not part of the standard library.
+Description: Optional on-disk cache for HTTP GET responses, used for portal
+catalogs (data.json) and the Aardvark schema while iterating on crosswalk
+logic. Response bodies are stored once under objects/ by SHA-256 digest, and
+index/ holds one small JSON entry per URL with the digest, ETag,
+Last-Modified and fetch time. Fresh entries (younger than the TTL) are served
+from disk; stale ones are revalidated with If-None-Match/If-Modified-Since so
+an unchanged portal costs a 304 instead of a full download. In offline mode
+only the cache is consulted, which replays a past harvest without network
+access. The least recently used entries are evicted once the stored bodies
+exceed max_bytes.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+
+
+class CacheMiss(requests.RequestException):
+    """Raised in offline mode when a URL has never been cached."""
+
+
+class CachedResponse:
+    """The parts of a requests.Response the harvest code relies on."""
+
+    def __init__(
+        self,
+        url: str,
+        status_code: int,
+        content: bytes,
+        headers: Optional[Dict] = None,
+        from_cache: bool = False,
+    ):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+        self.from_cache = from_cache
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise requests.HTTPError(
+                f"{self.status_code} Error for url: {self.url}", response=None
+            )
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        root: Path,
+        ttl: float = 3600,
+        max_bytes: int = 512 * 1024 * 1024,
+        offline: bool = False,
+    ):
+        self.root = Path(root)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.objects_dir = self.root / "objects"
+        self.index_dir = self.root / "index"
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+
+    @classmethod
+    def from_config(
+        cls, settings: Dict, base_dir: Path, enabled=None, offline=None
+    ) -> Optional["ResponseCache"]:
+        """Build a cache from the http_cache config section, or None if disabled."""
+        offline = settings.get("offline", False) if offline is None else offline
+        enabled = settings.get("enabled", False) if enabled is None else enabled
+        if not (enabled or offline):
+            return None
+        root = Path(settings.get("path", "tmp/http_cache"))
+        if not root.is_absolute():
+            root = (base_dir / root).resolve()
+        return cls(
+            root,
+            ttl=settings.get("ttl", 3600),
+            max_bytes=settings.get("max_megabytes", 512) * 1024 * 1024,
+            offline=offline,
+        )
+
+    @staticmethod
+    def _digest(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+    def _entry_path(self, url: str) -> Path:
+        return self.index_dir / f"{self._digest(url.encode('utf-8'))}.json"
+
+    def _object_path(self, digest: str) -> Path:
+        return self.objects_dir / digest[:2] / digest
+
+    @staticmethod
+    def _write_atomically(path: Path, data: bytes) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=path.parent, delete=False) as tmp_file:
+            tmp_file.write(data)
+        os.replace(tmp_file.name, path)
+
+    def _load_entry(self, url: str) -> Optional[Dict]:
+        try:
+            with open(self._entry_path(url), encoding="utf-8") as entry_file:
+                entry = json.load(entry_file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if not self._object_path(entry["digest"]).is_file():
+            return None
+        return entry
+
+    def _save_entry(self, entry: Dict) -> None:
+        self._write_atomically(
+            self._entry_path(entry["url"]), json.dumps(entry).encode("utf-8")
+        )
+
+    def _read_body(self, entry: Dict) -> bytes:
+        return self._object_path(entry["digest"]).read_bytes()
+
+    def _serve(self, entry: Dict) -> CachedResponse:
+        entry["used_at"] = time.time()
+        self._save_entry(entry)
+        return CachedResponse(
+            entry["url"],
+            200,
+            self._read_body(entry),
+            {"Content-Type": entry.get("content_type", "")},
+            from_cache=True,
+        )
+
+    def _store(self, url: str, response: requests.Response) -> Dict:
+        body = response.content
+        digest = self._digest(body)
+        object_path = self._object_path(digest)
+        if not object_path.is_file():
+            self._write_atomically(object_path, body)
+        now = time.time()
+        entry = {
+            "url": url,
+            "digest": digest,
+            "size": len(body),
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "content_type": response.headers.get("Content-Type", ""),
+            "fetched_at": now,
+            "used_at": now,
+        }
+        self._save_entry(entry)
+        self.evict()
+        return entry
+
+    def get(self, client, url: str, **kwargs) -> CachedResponse:
+        """GET url through client, serving and refreshing the on-disk copy."""
+        if urlsplit(url).scheme not in ("http", "https"):
+            # Local catalog paths are handled by the caller.
+            response = client.get(url, **kwargs)
+            return CachedResponse(url, response.status_code, response.content)
+
+        entry = self._load_entry(url)
+        if entry is not None and (
+            self.offline or time.time() - entry["fetched_at"] < self.ttl
+        ):
+            logging.debug(f"Serving {url} from the response cache.")
+            return self._serve(entry)
+        if self.offline:
+            raise CacheMiss(f"{url} is not in the response cache (offline mode).")
+
+        headers = dict(kwargs.pop("headers", None) or {})
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        try:
+            response = client.get(url, headers=headers, **kwargs)
+        except requests.RequestException as e:
+            if entry is None:
+                raise
+            logging.warning(f"Serving stale cached copy of {url}: {e}")
+            return self._serve(entry)
+
+        if response.status_code == 304 and entry is not None:
+            logging.debug(f"{url} was not modified; refreshing cache entry.")
+            entry["fetched_at"] = time.time()
+            return self._serve(entry)
+        if response.status_code != 200:
+            return CachedResponse(
+                url, response.status_code, response.content, response.headers
+            )
+
+        self._store(url, response)
+        return CachedResponse(
+            url, response.status_code, response.content, response.headers
+        )
+
+    def evict(self) -> int:
+        """Drop least recently used entries until bodies fit in max_bytes."""
+        entries = []
+        for entry_path in self.index_dir.glob("*.json"):
+            try:
+                with open(entry_path, encoding="utf-8") as entry_file:
+                    entries.append((entry_path, json.load(entry_file)))
+            except (OSError, json.JSONDecodeError):
+                entry_path.unlink(missing_ok=True)
+
+        sizes = {entry["digest"]: entry["size"] for _path, entry in entries}
+        total = sum(sizes.values())
+        removed = 0
+        entries.sort(key=lambda item: item[1].get("used_at", 0))
+        while entries and total > self.max_bytes:
+            entry_path, entry = entries.pop(0)
+            entry_path.unlink(missing_ok=True)
+            removed += 1
+            if all(other["digest"] != entry["digest"] for _path, other in entries):
+                self._object_path(entry["digest"]).unlink(missing_ok=True)
+                total -= sizes[entry["digest"]]
+
+        referenced = {entry["digest"] for _path, entry in entries}
+        for object_path in self.objects_dir.glob("*/*"):
+            if object_path.name not in referenced:
+                object_path.unlink(missing_ok=True)
+        return removed
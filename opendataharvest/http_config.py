@@ -0,0 +1,46 @@
+"""
+http_config.py
+Dependencies: yaml, and the geometadataedit package (pip install -e
+../geometadataedit) for geometadataedit.http_client.
+Description: Configures the shared HttpClient for the harvest tools. Pool
+sizes, the default timeout and the retry/backoff policy come from the `http`
+section of config.yaml (falling back to CONFIG.MAXRETRY and CONFIG.SLEEPTIME),
+and shared_client() returns one client per process so every harvester reuses
+the same kept-alive connections and collects per-host request metrics for
+logging at the end of a run.
+"""
+
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+import yaml
+from geometadataedit.http_client import HttpClient
+
+CONFIG_DIR = Path(__file__).resolve().parent
+
+
+def load_http_settings() -> Dict:
+    """Read the `http` section of config.yaml, defaulting from CONFIG."""
+    with open(CONFIG_DIR / "config.yaml", "r", encoding="utf-8") as file:
+        config = yaml.safe_load(file)
+    harvest_config = config.get("CONFIG") or {}
+    settings = {
+        "retries": harvest_config.get("MAXRETRY", 3),
+        "backoff_factor": harvest_config.get("SLEEPTIME", 1),
+    }
+    settings.update(config.get("http") or {})
+    return settings
+
+
+_shared_client: Optional[HttpClient] = None
+_shared_lock = threading.Lock()
+
+
+def shared_client() -> HttpClient:
+    """Return the process-wide client configured from config.yaml."""
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None:
+            _shared_client = HttpClient.from_config(load_http_settings())
+        return _shared_client
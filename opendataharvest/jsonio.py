@@ -0,0 +1,132 @@
+"""
+jsonio.py
+Dependencies: orjson is optional; without it the standard library json module
+is used for everything.
+Description: JSON reading and writing shared by the harvesters, normalize.py
+and convert.py. Pretty output is always byte-identical to
+json.dump(data, indent=2) followed by a newline, the format of the OGM
+repositories, whichever backend produced it: orjson output is re-escaped to
+ASCII, and documents holding values it formats differently (floats in
+exponent form, NaN, integers wider than 64 bits, non-string keys) fall back
+to the standard library. Compact output keeps the standard library's ", " and ": " separators,
+so harvested records are unchanged. write_json_atomically() replaces the two
+copies that lived in normalize.py and convert.py; it serializes in memory
+before touching the disk instead of parsing the written file back.
+"""
+
+import codecs
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Optional, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+
+def _escape_non_ascii(error: UnicodeEncodeError):
+    """Codec error handler writing \\uXXXX escapes the way json.dumps does."""
+    escapes = []
+    for char in error.object[error.start : error.end]:
+        code = ord(char)
+        if code >= 0x10000:
+            code -= 0x10000
+            escapes.append(f"\\u{0xD800 | (code >> 10):04x}")
+            code = 0xDC00 | (code & 0x3FF)
+        escapes.append(f"\\u{code:04x}")
+    return "".join(escapes), error.end
+
+
+codecs.register_error("jsonio.escape", _escape_non_ascii)
+
+
+def _same_as_json(value) -> bool:
+    """
+    Whether orjson formats every value like the standard library. Floats in
+    exponent form ("1e16" vs "1e+16", "0.00001" vs "1e-05"), NaN, infinity
+    and non-string keys differ; integers wider than 64 bits make orjson raise.
+    """
+    kind = type(value)
+    if kind is str or kind is bool or kind is int or value is None:
+        return True
+    if kind is dict:
+        for key, item in value.items():
+            if type(key) is not str or not _same_as_json(item):
+                return False
+        return True
+    if kind is list:
+        for item in value:
+            if not _same_as_json(item):
+                return False
+        return True
+    if kind is float:
+        return value == 0.0 or 1e-4 <= abs(value) < 1e16
+    return False
+
+
+def _orjson_pretty(data: Any) -> Optional[str]:
+    if not _same_as_json(data):
+        return None
+    try:
+        text = orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    except TypeError:  # orjson.JSONEncodeError
+        return None
+    if not text.isascii():
+        text = text.decode("utf-8").encode("ascii", "jsonio.escape")
+    return text.decode("ascii").replace("\x7f", "\\u007f")
+
+
+def dumps(data: Any, pretty: bool = False) -> str:
+    """Serialize like json.dumps(data), or json.dumps(data, indent=2) if pretty."""
+    if pretty:
+        text = _orjson_pretty(data) if orjson is not None else None
+        return text if text is not None else json.dumps(data, indent=2)
+    return json.dumps(data)
+
+
+def loads(text: Union[str, bytes]) -> Any:
+    if orjson is not None:
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            # NaN, huge integers and the like; the standard library also gives
+            # the usual error message for invalid documents.
+            pass
+    return json.loads(text)
+
+
+def load(path: Union[str, Path]) -> Any:
+    """Read and parse a JSON file."""
+    with open(path, "rb") as file:
+        return loads(file.read())
+
+
+def write_json_atomically(path: Path, data: Any) -> None:
+    """Write pretty JSON without truncating the destination on partial failures."""
+    path = Path(path)
+    content = (dumps(data, pretty=True) + "\n").encode("utf-8")
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    with tempfile.NamedTemporaryFile(dir=path.parent, delete=False) as tmp_file:
+        tmp_path = Path(tmp_file.name)
+        try:
+            tmp_file.write(content)
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+        except Exception:
+            tmp_file.close()
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+    try:
+        if tmp_path.stat().st_size != len(content):
+            raise ValueError(f"Refusing to replace {path} with a truncated JSON file.")
+        os.replace(tmp_path, path)
+    except Exception:
+        tmp_path.unlink(missing_ok=True)
+        raise
@@ -4,12 +4,13 @@ import logging
 import os
 from pathlib import Path
 import subprocess
-from typing import Dict, Iterable, Optional
-import tempfile
+from typing import Dict, Iterable, List, Optional, Tuple
 import unicodedata
 
 import yaml
 from classify import ResourceClassifier
+from git_changes import find_checkouts, mark_processed, pending_changes
+from jsonio import load, write_json_atomically
 
 CONFIG_DIR = Path(__file__).resolve().parent
 
@@ -324,59 +325,36 @@ class MetadataNormalizer:
         return changed
 
 
-def write_json_atomically(path: Path, data) -> None:
-    """Write JSON without truncating the destination on partial failures."""
-    path.parent.mkdir(parents=True, exist_ok=True)
-
-    with tempfile.NamedTemporaryFile(
-        "w",
-        encoding="utf8",
-        dir=path.parent,
-        delete=False,
-    ) as tmp_file:
-        tmp_path = Path(tmp_file.name)
-        json.dump(data, tmp_file, indent=2)
-        tmp_file.write("\n")
-        tmp_file.flush()
-        os.fsync(tmp_file.fileno())
-
-    try:
-        with open(tmp_path, encoding="utf8") as check_file:
-            json.load(check_file)
-        if tmp_path.stat().st_size == 0:
-            raise ValueError(f"Refusing to replace {path} with an empty JSON file.")
-        os.replace(tmp_path, path)
-    except Exception:
-        tmp_path.unlink(missing_ok=True)
-        raise
-
-
 def iter_json_files(rootdir: Path) -> Iterable[Path]:
     for path in rootdir.rglob("*.json"):
         if path.name != "layers.json":
             yield path
 
 
-def normalize_directory(rootdir: Path, schema_version: str = "Aardvark") -> int:
+def normalize_files(
+    paths: Iterable[Path], schema_version: str = "Aardvark"
+) -> Tuple[int, int, List[Path]]:
+    """
+    Normalize the given files in place; returns (scanned, updated, failed),
+    failed being the files that could not be read.
+    """
     updated = 0
     scanned = 0
+    failed = []
 
-    logging.info(
-        f"Starting normalization in {rootdir} for schema version {schema_version}."
-    )
-
-    for path in iter_json_files(rootdir):
+    for path in paths:
         scanned += 1
         if scanned % 1000 == 0:
             logging.info(f"Scanned {scanned} files; updated {updated} so far.")
         try:
-            with open(path, encoding="utf8") as file:
-                data = json.load(file)
+            data = load(path)
         except FileNotFoundError:
             logging.error(f"File not found: {path}")
+            failed.append(path)
             continue
         except json.JSONDecodeError:
             logging.error(f"Error decoding JSON in file: {path}")
+            failed.append(path)
             continue
 
         records = data if isinstance(data, list) else [data]
@@ -400,10 +378,63 @@ def normalize_directory(rootdir: Path, schema_version: str = "Aardvark") -> int:
             if updated <= 10 or updated % 100 == 0:
                 logging.info(f"Updated {path}")
 
+    return scanned, updated, failed
+
+
+def normalize_directory(
+    rootdir: Path, schema_version: str = "Aardvark", incremental: bool = False
+) -> int:
+    if incremental:
+        return normalize_changes(rootdir, schema_version)
+
+    logging.info(
+        f"Starting normalization in {rootdir} for schema version {schema_version}."
+    )
+    scanned, updated, _ = normalize_files(iter_json_files(rootdir), schema_version)
     logging.info(f"Finished scanning {scanned} files; updated {updated}.")
     return updated
 
 
+def normalize_changes(rootdir: Path, schema_version: str = "Aardvark") -> int:
+    """
+    Normalize only the files each git checkout under rootdir changed since
+    the last successful run, then record HEAD as processed. Checkouts that
+    were never processed, and directories outside git, are scanned in full.
+    A checkout with files that failed keeps its old commit, so the next run
+    retries them.
+    """
+    updated = 0
+    checkouts = find_checkouts(rootdir)
+    if checkouts != [Path(rootdir).resolve()]:
+        # Files directly under a rootdir outside git are not in any checkout.
+        top_level = [
+            path for path in Path(rootdir).glob("*.json") if path.name != "layers.json"
+        ]
+        updated += normalize_files(top_level, schema_version)[1]
+    for checkout in checkouts:
+        changes = pending_changes(checkout, "normalize")
+        if changes is None or changes.full_scan:
+            paths = iter_json_files(checkout)
+        else:
+            logging.info(
+                f"Normalizing {len(changes.paths)} files changed in {checkout} "
+                f"since {changes.base[:12]}."
+            )
+            paths = changes.paths
+        _, checkout_updated, failed = normalize_files(paths, schema_version)
+        updated += checkout_updated
+        if changes is None:
+            continue
+        if failed:
+            logging.warning(
+                f"{len(failed)} files failed in {checkout}; leaving {changes.ref} "
+                f"at {changes.base or 'unset'} so they are retried."
+            )
+        else:
+            mark_processed(changes)
+    return updated
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
         description="Normalize harvested Aardvark metadata in place."
@@ -421,6 +452,11 @@ if __name__ == "__main__":
         default=os.getenv("SCHEMA_VERSION", "Aardvark"),
         help="Only normalize records matching this schema version",
     )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only normalize files changed in each git checkout since the last run",
+    )
 
     logfile = config["logging"]["logfile"]
     if not os.path.isabs(logfile):
@@ -434,5 +470,5 @@ if __name__ == "__main__":
     )
 
     args = parser.parse_args()
-    updated = normalize_directory(args.rootdir, args.schema_version)
+    updated = normalize_directory(args.rootdir, args.schema_version, args.incremental)
     print(f"Normalized {updated} files.")
@@ -0,0 +1,348 @@
+"""
+parquet_export.py
+Dependencies: pyarrow is not part of the standard library (pandas as well for
+load_dataframe()).
+Description: Exports the Aardvark records of an OGM tree to Parquet for the
+pandas QA notebooks and classifier audits, which otherwise json.load()
+thousands of files on every run. Records are flattened to one row each with
+columns typed by their Solr suffix: multivalued _sm/_im/_drsim fields become
+list columns, _b booleans and _i integers keep their types, and everything
+else is a string (nested values as JSON). Each repository is written to its
+own hive partition, output/repo=<name>/part-0.parquet, and _manifest.json
+keeps a signature of each repository's file names, sizes and mtimes so
+unchanged repositories are not rewritten. load_corpus() reads the partitions
+back into one pyarrow Table, with columns missing from older partitions
+filled with nulls.
+
+Usage: python parquet_export.py [--output DIR] [ROOT] [--repo NAME ...]
+"""
+
+import argparse
+import hashlib
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional
+from urllib.parse import quote
+
+import yaml
+
+from jsonio import dumps, load, write_json_atomically
+from normalize import iter_json_files
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+CONFIG_DIR = Path(__file__).resolve().parent
+MANIFEST = "_manifest.json"
+
+# Solr dynamic field suffixes, longest first; anything else is a string.
+SUFFIX_KINDS = (
+    ("_drsim", "strings"),
+    ("_sm", "strings"),
+    ("_im", "integers"),
+    ("_b", "boolean"),
+    ("_i", "integer"),
+)
+# Added to every row: the record's file relative to its repository.
+FILE_COLUMN = "file"
+
+
+class ExportStats(NamedTuple):
+    written: List[str]
+    unchanged: List[str]
+    removed: List[str]
+    records: int
+    seconds: float
+
+
+def require_pyarrow() -> None:
+    if pa is None:
+        raise ImportError("Parquet export needs pyarrow: pip install pyarrow")
+
+
+def field_kind(field: str) -> str:
+    for suffix, kind in SUFFIX_KINDS:
+        if field.endswith(suffix):
+            return kind
+    return "string"
+
+
+def to_string(value) -> Optional[str]:
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (dict, list)):
+        return dumps(value)
+    return str(value)
+
+
+def to_integer(value) -> Optional[int]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            return None
+    return None
+
+
+def to_boolean(value) -> Optional[bool]:
+    # Aardvark allows "true"/"false" strings for its boolean fields.
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().lower() in ("true", "false"):
+        return value.strip().lower() == "true"
+    return None
+
+
+def flatten_value(kind: str, value):
+    """Coerce one field value to its column kind; unusable values become None."""
+    if value is None:
+        return None
+    if kind in ("strings", "integers"):
+        items = value if isinstance(value, list) else [value]
+        convert = to_string if kind == "strings" else to_integer
+        return [convert(item) for item in items]
+    if kind == "boolean":
+        return to_boolean(value)
+    if kind == "integer":
+        return to_integer(value)
+    return to_string(value)
+
+
+def flatten_record(record: Dict) -> Dict:
+    return {
+        field: flatten_value(field_kind(field), value)
+        for field, value in record.items()
+    }
+
+
+def repo_records(repo: Path) -> Iterable[Dict]:
+    """Flattened Aardvark records of a repository, each with its relative file."""
+    for path in sorted(iter_json_files(repo)):
+        try:
+            data = load(path)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Skipping unreadable file {path}: {e}")
+            continue
+        for record in data if isinstance(data, list) else [data]:
+            if isinstance(record, dict) and record.get("gbl_mdVersion_s") == "Aardvark":
+                row = flatten_record(record)
+                row[FILE_COLUMN] = path.relative_to(repo).as_posix()
+                yield row
+
+
+def repo_signature(repo: Path) -> str:
+    """Hash of every file's relative path, size and mtime under a repository."""
+    digest = hashlib.sha256()
+    for path in sorted(iter_json_files(repo)):
+        stat = path.stat()
+        digest.update(
+            f"{path.relative_to(repo).as_posix()}\0{stat.st_size}\0"
+            f"{stat.st_mtime_ns}\n".encode("utf-8")
+        )
+    return digest.hexdigest()
+
+
+def arrow_type(kind: str):
+    return {
+        "strings": pa.list_(pa.string()),
+        "integers": pa.list_(pa.int64()),
+        "boolean": pa.bool_(),
+        "integer": pa.int64(),
+        "string": pa.string(),
+    }[kind]
+
+
+def records_table(rows: List[Dict]):
+    """A pyarrow Table with one typed column per field seen in rows."""
+    require_pyarrow()
+    fields = sorted({field for row in rows for field in row if field != FILE_COLUMN})
+    if rows:
+        fields.insert(0, FILE_COLUMN)
+    columns, schema = [], []
+    for field in fields:
+        kind = field_kind(field) if field != FILE_COLUMN else "string"
+        columns.append(
+            pa.array([row.get(field) for row in rows], type=arrow_type(kind))
+        )
+        schema.append(pa.field(field, arrow_type(kind)))
+    return pa.Table.from_arrays(columns, schema=pa.schema(schema))
+
+
+def partition_dir(output: Path, repo_name: str) -> Path:
+    return output / f"repo={quote(repo_name, safe='')}"
+
+
+def export_repo(repo: Path, output: Path, repo_name: str) -> int:
+    """Write one repository's partition, replacing the previous one."""
+    table = records_table(list(repo_records(repo)))
+    target = partition_dir(output, repo_name)
+    staging = Path(tempfile.mkdtemp(dir=output, prefix=".staging-"))
+    try:
+        pq.write_table(table, staging / "part-0.parquet", compression="zstd")
+        if target.exists():
+            shutil.rmtree(target)
+        staging.rename(target)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return table.num_rows
+
+
+def find_repos(root: Path) -> Dict[str, Path]:
+    """The repositories of an OGM tree: its immediate subdirectories."""
+    return {
+        path.name: path
+        for path in sorted(root.iterdir())
+        if path.is_dir() and not path.name.startswith(".")
+    }
+
+
+def export_corpus(
+    root: Path, output: Path, repos: Optional[List[str]] = None, force: bool = False
+) -> ExportStats:
+    """
+    Export every repository under root (or only the named ones) to output,
+    skipping repositories whose files are unchanged since the last export.
+    """
+    require_pyarrow()
+    start = time.perf_counter()
+    found = find_repos(root)
+    unknown = sorted(set(repos or []) - set(found))
+    if unknown:
+        raise ValueError(f"No repository {', '.join(unknown)} under {root}")
+    output.mkdir(parents=True, exist_ok=True)
+    manifest_path = output / MANIFEST
+    manifest = load(manifest_path) if manifest_path.exists() else {}
+    selected = found if repos is None else {name: found[name] for name in repos}
+
+    written, unchanged, records = [], [], 0
+    for name, repo in selected.items():
+        signature = repo_signature(repo)
+        entry = manifest.get(name)
+        if (
+            not force
+            and entry
+            and entry["signature"] == signature
+            and partition_dir(output, name).exists()
+        ):
+            unchanged.append(name)
+            continue
+        count = export_repo(repo, output, name)
+        manifest[name] = {"signature": signature, "records": count}
+        written.append(name)
+        records += count
+        logging.info(f"Exported {count} records from {name}")
+
+    removed = []
+    if repos is None:
+        for name in sorted(set(manifest) - set(found)):
+            shutil.rmtree(partition_dir(output, name), ignore_errors=True)
+            del manifest[name]
+            removed.append(name)
+    write_json_atomically(manifest_path, manifest)
+    return ExportStats(
+        written, unchanged, removed, records, time.perf_counter() - start
+    )
+
+
+def load_corpus(
+    output: Path,
+    columns: Optional[List[str]] = None,
+    repos: Optional[List[str]] = None,
+):
+    """
+    Read exported partitions into one pyarrow Table with a "repo" column.
+    Columns present in only some partitions are null elsewhere.
+    """
+    require_pyarrow()
+    files = sorted(output.glob("repo=*/*.parquet"))
+    if repos is not None:
+        wanted = {partition_dir(output, name) for name in repos}
+        files = [path for path in files if path.parent in wanted]
+    if not files:
+        return pa.table({"repo": pa.array([], pa.string())})
+    schema = pa.unify_schemas([pq.read_schema(path) for path in files])
+    schema = schema.append(pa.field("repo", pa.string()))
+    dataset = ds.dataset(
+        [str(path) for path in files],
+        schema=schema,
+        format="parquet",
+        partitioning=ds.partitioning(
+            pa.schema([pa.field("repo", pa.string())]), flavor="hive"
+        ),
+        partition_base_dir=str(output),
+    )
+    # Partition values are percent-decoded by the hive partitioning.
+    return dataset.to_table(columns=columns)
+
+
+def load_dataframe(output: Path, columns: Optional[List[str]] = None, repos=None):
+    """load_corpus() as a pandas DataFrame, list columns as Python lists."""
+    return load_corpus(output, columns, repos).to_pandas()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    with open(CONFIG_DIR / "config.yaml", "r", encoding="utf-8") as file:
+        config = yaml.safe_load(file)
+    arg_parser = argparse.ArgumentParser(
+        description="Export Aardvark records to partitioned Parquet."
+    )
+    arg_parser.add_argument(
+        "root",
+        type=Path,
+        nargs="?",
+        default=(
+            CONFIG_DIR / os.getenv("OGM_PATH", config["paths"]["ogm_path"])
+        ).resolve(),
+        help="OGM tree whose subdirectories are the repositories "
+        "(default: paths.ogm_path)",
+    )
+    arg_parser.add_argument(
+        "--output",
+        type=Path,
+        default=CONFIG_DIR / config["paths"].get("parquet", "tmp/parquet"),
+        help="Partitioned dataset directory (default: paths.parquet)",
+    )
+    arg_parser.add_argument(
+        "--repo", action="append", help="Only export this repository (repeatable)"
+    )
+    arg_parser.add_argument(
+        "--force", action="store_true", help="Rewrite unchanged repositories too"
+    )
+    args = arg_parser.parse_args(argv)
+    if not args.root.is_dir():
+        arg_parser.error(f"{args.root} is not a directory")
+    if args.repo:
+        unknown = sorted(set(args.repo) - set(find_repos(args.root)))
+        if unknown:
+            arg_parser.error(
+                f"unknown --repo {', '.join(unknown)}; the repositories are the "
+                f"subdirectories of {args.root}"
+            )
+
+    stats = export_corpus(args.root, args.output, args.repo, args.force)
+    print(
+        f"Wrote {stats.records} records from {len(stats.written)} repositories "
+        f"in {stats.seconds:.2f}s; {len(stats.unchanged)} unchanged, "
+        f"{len(stats.removed)} removed"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -0,0 +1,165 @@
+"""
+profiling.py
+Opt-in timers for the DCAT harvest.
+
+HarvestProfiler wraps selected methods of the harvest classes with wall-clock
+timers only when profiling is enabled, so a normal harvest pays nothing for it.
+Timed calls nest into stacks ("record;Aardvark._process_spatial;...") whose
+self time is written in the folded format understood by flamegraph.pl and
+speedscope. Per-record totals are kept in a bounded heap so the slowest records
+of a run can be reported, and an optional cProfile run is dumped for pstats.
+"""
+
+import cProfile
+import functools
+import heapq
+import logging
+import pstats
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class HarvestProfiler:
+    def __init__(self, top_n: int = 20, use_cprofile: bool = True):
+        self.enabled = False
+        self.top_n = top_n
+        self.use_cprofile = use_cprofile
+        self.step_totals: Dict[str, float] = defaultdict(float)
+        self.step_counts: Dict[str, int] = defaultdict(int)
+        self.folded: Dict[str, float] = defaultdict(float)
+        self._stack: List[list] = []
+        self._slowest: List[Tuple[float, int, str]] = []
+        self._records_seen = 0
+        self._cprofile: Optional[cProfile.Profile] = None
+        self._instrumented: List[Tuple[type, str, object]] = []
+
+    def enable(self) -> None:
+        self.enabled = True
+        if self.use_cprofile:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    def disable(self) -> None:
+        if self._cprofile is not None:
+            self._cprofile.disable()
+        self.enabled = False
+
+    @contextmanager
+    def _timed(self, name: str):
+        # Each frame is [name, child time, elapsed] so self time can be derived.
+        frame = [name, 0.0, 0.0]
+        self._stack.append(frame)
+        start = time.perf_counter()
+        try:
+            yield frame
+        finally:
+            elapsed = time.perf_counter() - start
+            frame[2] = elapsed
+            stack_key = ";".join(entry[0] for entry in self._stack)
+            self._stack.pop()
+            self.folded[stack_key] += max(elapsed - frame[1], 0.0)
+            self.step_totals[name] += elapsed
+            self.step_counts[name] += 1
+            if self._stack:
+                self._stack[-1][1] += elapsed
+
+    def step(self, name: str):
+        """Time a named block; a no-op context when profiling is disabled."""
+        if not self.enabled:
+            return nullcontext()
+        return self._timed(name)
+
+    @contextmanager
+    def _timed_record(self, record_id: str):
+        with self._timed("record") as frame:
+            yield
+        self._records_seen += 1
+        entry = (frame[2], self._records_seen, record_id)
+        if len(self._slowest) < self.top_n:
+            heapq.heappush(self._slowest, entry)
+        else:
+            heapq.heappushpop(self._slowest, entry)
+
+    def record(self, record_id: str):
+        """Time the construction and output of a single record."""
+        if not self.enabled:
+            return nullcontext()
+        return self._timed_record(record_id)
+
+    def instrument(self, owner: type, names: Iterable[str]) -> None:
+        """Wrap methods (including staticmethods) of owner with step timers."""
+        for name in names:
+            original = owner.__dict__[name]
+            is_static = isinstance(original, staticmethod)
+            function = original.__func__ if is_static else original
+            wrapped = self._wrap(f"{owner.__name__}.{name}", function)
+            setattr(owner, name, staticmethod(wrapped) if is_static else wrapped)
+            self._instrumented.append((owner, name, original))
+
+    def uninstrument(self) -> None:
+        for owner, name, original in reversed(self._instrumented):
+            setattr(owner, name, original)
+        self._instrumented = []
+
+    def _wrap(self, label: str, function):
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            with self._timed(label):
+                return function(*args, **kwargs)
+
+        return timed
+
+    def slowest_records(self) -> List[Tuple[str, float]]:
+        return [
+            (record_id, elapsed)
+            for elapsed, _order, record_id in sorted(self._slowest, reverse=True)
+        ]
+
+    def summary(self) -> str:
+        lines = [f"Profiled {self._records_seen} records."]
+        lines.append("")
+        lines.append(f"{'step':<60} {'calls':>8} {'total s':>10} {'mean ms':>10}")
+        for name, total in sorted(
+            self.step_totals.items(), key=lambda item: item[1], reverse=True
+        ):
+            calls = self.step_counts[name]
+            mean_ms = total / calls * 1000 if calls else 0.0
+            lines.append(f"{name:<60} {calls:>8} {total:>10.3f} {mean_ms:>10.3f}")
+
+        lines.append("")
+        lines.append(f"Slowest {len(self._slowest)} records:")
+        for record_id, elapsed in self.slowest_records():
+            lines.append(f"{elapsed * 1000:>10.3f} ms  {record_id}")
+        return "\n".join(lines)
+
+    def write_folded(self, path: Path) -> Path:
+        """Write self time per stack in microseconds, one stack per line."""
+        with open(path, "w", encoding="utf-8") as folded_file:
+            for stack, seconds in sorted(self.folded.items()):
+                microseconds = int(round(seconds * 1_000_000))
+                if microseconds > 0:
+                    folded_file.write(f"{stack} {microseconds}\n")
+        return path
+
+    def write_report(self, output_dir: Path, prefix: str) -> List[Path]:
+        """Write the text summary, folded stacks and pstats dump for one run."""
+        output_dir.mkdir(parents=True, exist_ok=True)
+        written = []
+
+        summary_path = output_dir / f"{prefix}.txt"
+        summary_path.write_text(self.summary() + "\n", encoding="utf-8")
+        written.append(summary_path)
+
+        written.append(self.write_folded(output_dir / f"{prefix}.folded"))
+
+        if self._cprofile is not None:
+            pstats_path = output_dir / f"{prefix}.pstats"
+            pstats.Stats(self._cprofile).dump_stats(str(pstats_path))
+            written.append(pstats_path)
+
+        for path in written:
+            logging.info(f"Wrote harvest profile to {path}")
+        return written
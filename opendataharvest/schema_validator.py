@@ -0,0 +1,326 @@
+"""
+schema_validator.py
+Dependencies: jsonschema and requests are not part of the standard library.
+Description: Fast validation of records against the Aardvark JSON schema.
+jsonschema.validate() checks the schema itself and then walks it generically
+for every record. CompiledValidator instead turns the schema once into a
+Python function of plain type, required-key, enum, pattern and length checks,
+generated for this schema's fields, which answers "is this record valid" for
+the common case. Only records that fail it are handed to jsonschema, so the
+reported errors are exactly the ones jsonschema.validate() would raise. A
+schema using keywords the compiler does not handle ($ref, anyOf, ...) is
+validated with jsonschema alone.
+
+Usage: python schema_validator.py [--schema PATH_OR_URL] FILE [FILE ...]
+"""
+
+import argparse
+import itertools
+import logging
+import re
+import sys
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+import yaml
+from jsonschema.exceptions import ValidationError, best_match
+from jsonschema.validators import validator_for
+
+from http_config import shared_client
+from jsonio import load, loads
+
+CONFIG_DIR = Path(__file__).resolve().parent
+
+MISSING = object()
+
+
+class UnsupportedSchema(Exception):
+    pass
+
+
+class Failure(NamedTuple):
+    index: int
+    id: Optional[str]
+    errors: List[ValidationError]
+
+
+class SchemaCompiler:
+    """Generate the source of check(data) -> bool for a JSON schema."""
+
+    def __init__(self, validator_class):
+        self.validator_class = validator_class
+        self.constants: Dict[str, object] = {}
+        self._names = itertools.count()
+        # Draft 6 and later count 1.0 as an integer.
+        self.integral_floats = validator_class.TYPE_CHECKER.is_type(1.0, "integer")
+
+    def source(self, schema) -> str:
+        lines = ["def check(data):"]
+        lines += self.compile(schema, "data", 1)
+        lines.append("    return True")
+        return "\n".join(lines) + "\n"
+
+    def name(self, prefix: str) -> str:
+        return f"{prefix}{next(self._names)}"
+
+    def constant(self, prefix: str, value) -> str:
+        name = self.name(prefix)
+        self.constants[name] = value
+        return name
+
+    def compile(self, schema, var: str, depth: int) -> List[str]:
+        if schema is True:
+            return []
+        if schema is False:
+            return [self.indent(depth, "return False")]
+        if not isinstance(schema, dict):
+            raise UnsupportedSchema(f"schema {schema!r}")
+        lines = []
+        for keyword, value in schema.items():
+            # Anything jsonschema does not validate is an annotation; format
+            # is only checked when a FormatChecker is passed, which
+            # jsonschema.validate() does not do.
+            if keyword not in self.validator_class.VALIDATORS or keyword == "format":
+                continue
+            method = getattr(self, f"keyword_{keyword}", None)
+            if method is None:
+                raise UnsupportedSchema(f"keyword {keyword!r}")
+            lines += method(value, schema, var, depth)
+        return lines
+
+    @staticmethod
+    def indent(depth: int, line: str) -> str:
+        return "    " * depth + line
+
+    def fail_if(self, condition: str, depth: int) -> List[str]:
+        return [
+            self.indent(depth, f"if {condition}:"),
+            self.indent(depth + 1, "return False"),
+        ]
+
+    def type_condition(self, kind: str, var: str) -> str:
+        conditions = {
+            "string": f"type({var}) is str",
+            "integer": f"type({var}) is int",
+            "number": f"type({var}) in (int, float)",
+            "boolean": f"({var} is True or {var} is False)",
+            "null": f"{var} is None",
+            "object": f"type({var}) is dict",
+            "array": f"type({var}) is list",
+        }
+        if kind not in conditions:
+            raise UnsupportedSchema(f"type {kind!r}")
+        if kind == "integer" and self.integral_floats:
+            return (
+                f"(type({var}) is int or type({var}) is float and {var}.is_integer())"
+            )
+        return conditions[kind]
+
+    def keyword_type(self, value, schema, var, depth):
+        kinds = [value] if isinstance(value, str) else value
+        condition = " or ".join(self.type_condition(kind, var) for kind in kinds)
+        return self.fail_if(f"not ({condition})", depth)
+
+    def keyword_enum(self, value, schema, var, depth):
+        if not all(type(member) is str for member in value):
+            raise UnsupportedSchema("enum with non-string members")
+        name = self.constant("ENUM", frozenset(value))
+        return self.fail_if(f"type({var}) is not str or {var} not in {name}", depth)
+
+    def keyword_const(self, value, schema, var, depth):
+        if type(value) is not str:
+            raise UnsupportedSchema("const with a non-string value")
+        return self.fail_if(f"type({var}) is not str or {var} != {value!r}", depth)
+
+    def keyword_pattern(self, value, schema, var, depth):
+        name = self.constant("PATTERN", re.compile(value))
+        return self.fail_if(
+            f"isinstance({var}, str) and not {name}.search({var})", depth
+        )
+
+    def length(self, kind: str, operator: str, value, var, depth):
+        return self.fail_if(
+            f"isinstance({var}, {kind}) and len({var}) {operator} {int(value)}", depth
+        )
+
+    def keyword_minLength(self, value, schema, var, depth):
+        return self.length("str", "<", value, var, depth)
+
+    def keyword_maxLength(self, value, schema, var, depth):
+        return self.length("str", ">", value, var, depth)
+
+    def keyword_minItems(self, value, schema, var, depth):
+        return self.length("list", "<", value, var, depth)
+
+    def keyword_maxItems(self, value, schema, var, depth):
+        return self.length("list", ">", value, var, depth)
+
+    def bound(self, operator: str, value, var, depth):
+        if type(value) not in (int, float):
+            raise UnsupportedSchema(f"numeric bound {value!r}")
+        return self.fail_if(
+            f"isinstance({var}, (int, float)) and not isinstance({var}, bool)"
+            f" and {var} {operator} {value!r}",
+            depth,
+        )
+
+    def keyword_minimum(self, value, schema, var, depth):
+        return self.bound("<", value, var, depth)
+
+    def keyword_maximum(self, value, schema, var, depth):
+        return self.bound(">", value, var, depth)
+
+    def keyword_exclusiveMinimum(self, value, schema, var, depth):
+        return self.bound("<=", value, var, depth)
+
+    def keyword_exclusiveMaximum(self, value, schema, var, depth):
+        return self.bound(">=", value, var, depth)
+
+    def keyword_required(self, value, schema, var, depth):
+        if not isinstance(value, list):
+            raise UnsupportedSchema("draft 3 style required")
+        name = self.constant("REQUIRED", frozenset(value))
+        return self.fail_if(
+            f"isinstance({var}, dict) and not {name} <= {var}.keys()", depth
+        )
+
+    def keyword_properties(self, value, schema, var, depth):
+        body = []
+        for key, subschema in value.items():
+            item = self.name("value")
+            checks = self.compile(subschema, item, depth + 2)
+            if checks:
+                body.append(
+                    self.indent(depth + 1, f"{item} = {var}.get({key!r}, MISSING)")
+                )
+                body.append(self.indent(depth + 1, f"if {item} is not MISSING:"))
+                body += checks
+        if not body:
+            return []
+        return [self.indent(depth, f"if isinstance({var}, dict):")] + body
+
+    def keyword_additionalProperties(self, value, schema, var, depth):
+        if value is True:
+            return []
+        allowed = self.constant("ALLOWED", frozenset(schema.get("properties", {})))
+        if value is False:
+            return self.fail_if(
+                f"isinstance({var}, dict) and not {var}.keys() <= {allowed}", depth
+            )
+        key, item = self.name("key"), self.name("value")
+        checks = self.compile(value, item, depth + 3)
+        if not checks:
+            return []
+        return [
+            self.indent(depth, f"if isinstance({var}, dict):"),
+            self.indent(depth + 1, f"for {key}, {item} in {var}.items():"),
+            self.indent(depth + 2, f"if {key} not in {allowed}:"),
+        ] + checks
+
+    def keyword_items(self, value, schema, var, depth):
+        if not isinstance(value, (dict, bool)):
+            raise UnsupportedSchema("items given as a list of schemas")
+        item = self.name("item")
+        checks = self.compile(value, item, depth + 2)
+        if not checks:
+            return []
+        return [
+            self.indent(depth, f"if isinstance({var}, list):"),
+            self.indent(depth + 1, f"for {item} in {var}:"),
+        ] + checks
+
+
+class CompiledValidator:
+    def __init__(self, schema: Dict):
+        self.schema = schema
+        validator_class = validator_for(schema)
+        validator_class.check_schema(schema)
+        self.validator = validator_class(schema)
+        compiler = SchemaCompiler(validator_class)
+        try:
+            self.source = compiler.source(schema)
+        except UnsupportedSchema as e:
+            logging.info(f"Validating with jsonschema only; cannot compile {e}")
+            self.source = None
+            self.check = self.validator.is_valid
+            return
+        namespace = dict(compiler.constants, MISSING=MISSING)
+        exec(compile(self.source, "<compiled schema>", "exec"), namespace)
+        self.check = namespace["check"]
+
+    @property
+    def compiled(self) -> bool:
+        return self.source is not None
+
+    def is_valid(self, record) -> bool:
+        # The compiled checks may be stricter (str subclasses, for example);
+        # jsonschema has the final word on records they reject.
+        return self.check(record) or self.validator.is_valid(record)
+
+    def iter_errors(self, record) -> Iterator[ValidationError]:
+        if self.check(record):
+            return iter(())
+        return self.validator.iter_errors(record)
+
+    def best_error(self, record) -> Optional[ValidationError]:
+        """The error jsonschema.validate() would raise, or None."""
+        return best_match(self.iter_errors(record))
+
+    def validate(self, record) -> None:
+        error = self.best_error(record)
+        if error is not None:
+            raise error
+
+    def validate_many(self, records: Iterable[Dict]) -> List[Failure]:
+        """Validate a batch; returns the failing records with all their errors."""
+        failures = []
+        for index, record in enumerate(records):
+            if self.check(record):
+                continue
+            errors = list(self.validator.iter_errors(record))
+            if errors:
+                record_id = record.get("id") if isinstance(record, dict) else None
+                failures.append(Failure(index, record_id, errors))
+        return failures
+
+
+def load_schema(location: str, timeout: float = 10) -> Dict:
+    """Read a JSON schema from a URL or a local path."""
+    if location.startswith(("http://", "https://")):
+        response = shared_client().get(location, timeout=timeout)
+        response.raise_for_status()
+        return loads(response.content)
+    return load(Path(location))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    with open(CONFIG_DIR / "config.yaml", "r", encoding="utf-8") as file:
+        config = yaml.safe_load(file)
+    arg_parser = argparse.ArgumentParser(
+        description="Validate Aardvark JSON files against the schema."
+    )
+    arg_parser.add_argument("files", nargs="+", type=Path)
+    arg_parser.add_argument(
+        "--schema",
+        default=config["CONFIG"]["SCHEMA"],
+        help="Schema path or URL (default: CONFIG.SCHEMA)",
+    )
+    args = arg_parser.parse_args(argv)
+
+    validator = CompiledValidator(load_schema(args.schema))
+    failed = 0
+    for path in args.files:
+        data = load(path)
+        for failure in validator.validate_many(
+            data if isinstance(data, list) else [data]
+        ):
+            failed += 1
+            for error in failure.errors:
+                location = "/".join(str(part) for part in error.absolute_path)
+                print(f"{path}: {failure.id}: {location or '<root>'}: {error.message}")
+    print(f"{failed} invalid records in {len(args.files)} files")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
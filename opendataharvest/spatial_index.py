@@ -0,0 +1,288 @@
+"""
+spatial_index.py
+Dependencies: numpy (through envelope.py) is not part of the standard library.
+Description: In-memory spatial index of named places for the harvesters.
+PlaceIndex loads the county, city, region and Great Lakes extents from
+default_bbox.csv, plus any GeoJSON boundary files listed under
+CONFIG.SPATIAL_BOUNDARIES, into a Sort-Tile-Recursive packed R-tree. Queries
+answer "which named places does this envelope intersect" by walking only the
+tree nodes whose extents overlap the envelope; places loaded from boundary
+files are then checked against their actual polygons rather than their
+bounding boxes. The harvester uses it to add the intersecting counties and
+cities to dct_spatial_sm and to reject envelopes that touch no known place.
+Bounds are (west, south, east, north) in decimal degrees throughout; a box
+crossing the 180° meridian (west > east) is queried as its two halves.
+"""
+
+import csv
+import json
+import math
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from envelope import Bounds, split_bounds
+
+
+class Place(NamedTuple):
+    name: str
+    kind: str
+    bounds: Bounds
+    # Polygons as lists of rings of (x, y); None for bbox-only places.
+    polygons: Optional[List[List[List[Tuple[float, float]]]]] = None
+
+
+def place_kind(fips: int) -> str:
+    """Classify a default_bbox.csv row by its fips range."""
+    if fips < 1000:
+        return "county"
+    if fips < 2000:
+        return "city"
+    if fips < 3000:
+        return "region"
+    if fips < 4000:
+        return "lake"
+    return "state"
+
+
+def place_label(name: str, kind: str) -> str:
+    """Name a place the way dct_spatial_sm does ("Milwaukee County")."""
+    if kind != "county":
+        return name
+    if name.endswith("County"):
+        name = name[: -len("County")].rstrip()
+    return f"{name} County"
+
+
+def intersects(a: Bounds, b: Bounds) -> bool:
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def union(bounds: Iterable[Bounds]) -> Bounds:
+    wests, souths, easts, norths = zip(*bounds)
+    return (min(wests), min(souths), max(easts), max(norths))
+
+
+def overlap_area(a: Bounds, b: Bounds) -> float:
+    width = min(a[2], b[2]) - max(a[0], b[0])
+    height = min(a[3], b[3]) - max(a[1], b[1])
+    return max(width, 0.0) * max(height, 0.0)
+
+
+class STRtree:
+    """Read-only R-tree bulk loaded with Sort-Tile-Recursive packing."""
+
+    def __init__(self, entries: Sequence[Tuple[Bounds, object]], node_capacity=8):
+        self.node_capacity = node_capacity
+        self.size = len(entries)
+        # A node is (bounds, children, is_leaf); leaf children are payloads.
+        level = [(bounds, payload, True) for bounds, payload in entries]
+        self.root = None
+        if not level:
+            return
+        leaves = True
+        while len(level) > 1 or leaves:
+            level = self._pack(level, leaves)
+            leaves = False
+        self.root = level[0]
+
+    def _pack(self, nodes, leaves):
+        capacity = self.node_capacity
+        node_count = math.ceil(len(nodes) / capacity)
+        slab_size = math.ceil(math.sqrt(node_count)) * capacity
+        nodes = sorted(nodes, key=lambda node: node[0][0] + node[0][2])
+        packed = []
+        for start in range(0, len(nodes), slab_size):
+            slab = sorted(
+                nodes[start : start + slab_size],
+                key=lambda node: node[0][1] + node[0][3],
+            )
+            for group_start in range(0, len(slab), capacity):
+                group = slab[group_start : group_start + capacity]
+                children = [node[1] for node in group] if leaves else group
+                packed.append((union(node[0] for node in group), children, leaves))
+        return packed
+
+    def query(self, bounds: Bounds) -> List[object]:
+        """Return the payloads whose bounds intersect bounds."""
+        if self.root is None or not intersects(self.root[0], bounds):
+            return []
+        found = []
+        stack = [self.root]
+        while stack:
+            _node_bounds, children, is_leaf = stack.pop()
+            if is_leaf:
+                found.extend(
+                    payload
+                    for payload in children
+                    if intersects(payload.bounds, bounds)
+                )
+            else:
+                stack.extend(
+                    child for child in children if intersects(child[0], bounds)
+                )
+        return found
+
+
+def _point_in_rings(x: float, y: float, rings) -> bool:
+    """Even-odd test across every ring, so holes are excluded."""
+    inside = False
+    for ring in rings:
+        for (x1, y1), (x2, y2) in zip(ring, ring[1:] + ring[:1]):
+            if (y1 > y) != (y2 > y) and x < (x2 - x1) * (y - y1) / (y2 - y1) + x1:
+                inside = not inside
+    return inside
+
+
+def _segments_cross(p1, p2, q1, q2) -> bool:
+    def orientation(a, b, c):
+        value = (b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0])
+        return (value > 0) - (value < 0)
+
+    splits_q = orientation(p1, p2, q1) != orientation(p1, p2, q2)
+    splits_p = orientation(q1, q2, p1) != orientation(q1, q2, p2)
+    return splits_q and splits_p
+
+
+def polygon_intersects_bounds(polygons, bounds: Bounds) -> bool:
+    west, south, east, north = bounds
+    corners = [(west, south), (east, south), (east, north), (west, north)]
+    box_edges = list(zip(corners, corners[1:] + corners[:1]))
+    for rings in polygons:
+        for ring in rings:
+            if any(west <= x <= east and south <= y <= north for x, y in ring):
+                return True
+        if any(_point_in_rings(x, y, rings) for x, y in corners):
+            return True
+        for ring in rings:
+            for edge in zip(ring, ring[1:] + ring[:1]):
+                if any(_segments_cross(*edge, *box_edge) for box_edge in box_edges):
+                    return True
+    return False
+
+
+def _geojson_polygons(geometry: Dict):
+    if geometry["type"] == "Polygon":
+        polygons = [geometry["coordinates"]]
+    elif geometry["type"] == "MultiPolygon":
+        polygons = geometry["coordinates"]
+    else:
+        return None
+    return [
+        [[(float(x), float(y)) for x, y, *_rest in ring] for ring in polygon]
+        for polygon in polygons
+    ]
+
+
+class PlaceIndex:
+    def __init__(self, places: Iterable[Place]):
+        self.places = list(places)
+        self.tree = STRtree([(place.bounds, place) for place in self.places])
+
+    def __len__(self) -> int:
+        return len(self.places)
+
+    @staticmethod
+    def read_bbox_csv(path: Path) -> List[Place]:
+        with open(path, newline="", encoding="utf-8") as default_csv:
+            return [
+                Place(
+                    place_label(row["name"], place_kind(int(row["fips"]))),
+                    place_kind(int(row["fips"])),
+                    tuple(
+                        float(row[key]) for key in ("west", "south", "east", "north")
+                    ),
+                )
+                for row in csv.DictReader(default_csv)
+            ]
+
+    @staticmethod
+    def read_boundaries(
+        path: Path, name_property: str = "NAME", kind: str = "boundary"
+    ) -> List[Place]:
+        """Read named Polygon/MultiPolygon features from a GeoJSON file."""
+        with open(path, encoding="utf-8") as boundary_file:
+            collection = json.load(boundary_file)
+        places = []
+        for feature in collection.get("features", []):
+            name = (feature.get("properties") or {}).get(name_property)
+            polygons = _geojson_polygons(feature.get("geometry") or {"type": None})
+            if not name or not polygons:
+                continue
+            points = [point for rings in polygons for point in rings[0]]
+            xs = [x for x, _y in points]
+            ys = [y for _x, y in points]
+            places.append(
+                Place(name, kind, (min(xs), min(ys), max(xs), max(ys)), polygons)
+            )
+        return places
+
+    @classmethod
+    def from_config(
+        cls, bbox_csv: Path, boundaries: Optional[List[Dict]], base_dir: Path
+    ) -> "PlaceIndex":
+        places = cls.read_bbox_csv(bbox_csv)
+        for boundary in boundaries or []:
+            path = Path(boundary["path"])
+            if not path.is_absolute():
+                path = base_dir / path
+            places.extend(
+                cls.read_boundaries(
+                    path,
+                    boundary.get("name_property", "NAME"),
+                    boundary.get("kind", "boundary"),
+                )
+            )
+        return cls(places)
+
+    def intersecting(
+        self, bounds: Bounds, kinds: Optional[Iterable[str]] = None
+    ) -> List[Place]:
+        """Return the places intersecting bounds, optionally limited to kinds."""
+        kinds = set(kinds) if kinds else None
+        found = {}
+        for part in split_bounds(bounds):
+            for place in self.tree.query(part):
+                if (kinds is None or place.kind in kinds) and (
+                    place.polygons is None
+                    or polygon_intersects_bounds(place.polygons, part)
+                ):
+                    found.setdefault(id(place), place)
+        return list(found.values())
+
+    def query_many(
+        self, bounds_list: Iterable[Optional[Bounds]], kinds=None
+    ) -> List[List[Place]]:
+        """Intersect every envelope of a site in one pass; None yields []."""
+        return [
+            self.intersecting(bounds, kinds) if bounds else [] for bounds in bounds_list
+        ]
+
+    def spatial_terms(
+        self,
+        bounds: Bounds,
+        base: Sequence[str],
+        max_places: int = 3,
+        min_overlap: float = 0.1,
+        kinds: Iterable[str] = ("county", "city", "boundary"),
+        places: Optional[List[Place]] = None,
+    ) -> List[str]:
+        """
+        Prepend the places that cover at least min_overlap of bounds to the
+        site's base terms. Nothing is added when more than max_places qualify,
+        so statewide layers keep just the site's terms.
+        """
+        kinds = set(kinds)
+        candidates = self.intersecting(bounds) if places is None else places
+        parts = split_bounds(bounds)
+        area = sum(overlap_area(part, part) for part in parts)
+        names = []
+        for place in candidates:
+            if place.kind not in kinds or place.name in base or place.name in names:
+                continue
+            overlap = sum(overlap_area(place.bounds, part) for part in parts)
+            if area > 0 and overlap / area < min_overlap:
+                continue
+            names.append(place.name)
+        if len(names) > max_places:
+            return list(base)
+        return sorted(names) + list(base)
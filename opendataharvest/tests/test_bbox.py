@@ -0,0 +1,120 @@
+import sys
+import unittest
+from pathlib import Path
+
+OPENDATAHARVEST_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(OPENDATAHARVEST_ROOT))
+# The shared HTTP client, as `pip install -e ../geometadataedit` would provide.
+sys.path.insert(0, str(OPENDATAHARVEST_ROOT.parent / "geometadataedit"))
+
+from DCAT_Harvester import Site
+from DCAT_Harvester import check_site_spatial
+from bbox import DEGENERATE
+from bbox import LATITUDE_RANGE
+from bbox import LONGITUDE_RANGE
+from bbox import NON_CONFORMING
+from bbox import OK
+from bbox import OUTSIDE_DEFAULT
+from bbox import process_spatial
+from bbox import validate_bboxes
+
+WISCONSIN = {
+    "west": -92.889241,
+    "east": -86.804798,
+    "north": 47.080775,
+    "south": 42.491966,
+}
+
+
+class ValidateBboxesTest(unittest.TestCase):
+    def test_codes_and_envelopes_for_a_catalog(self):
+        spatial_strings = [
+            "-89.3219,43.6477,-87.7342,44.8530",
+            "-87.7342,44.8530,-89.3219,43.6477",
+            "-89,43,-87,44",
+            "{{extent:computeSpatialProperty}}",
+            None,
+            "-189.5,43.0,-87.0,44.0",
+            "-89.5,93.0,-87.0,44.0",
+            "-89.5,43.0,-89.5,44.0",
+            "-100.5,43.0,-87.0,44.0",
+            "-250.0,95.0,-89.5,44.0",
+        ]
+        batch = validate_bboxes(spatial_strings, WISCONSIN)
+
+        self.assertEqual(batch.bounds.shape, (10, 4))
+        self.assertEqual(
+            batch.errors.tolist(),
+            [
+                OK,
+                OK,
+                NON_CONFORMING,
+                NON_CONFORMING,
+                NON_CONFORMING,
+                LONGITUDE_RANGE,
+                LATITUDE_RANGE,
+                DEGENERATE,
+                OUTSIDE_DEFAULT,
+                LONGITUDE_RANGE,
+            ],
+        )
+        envelope = "ENVELOPE(-89.3219,-87.7342,44.853,43.6477)"
+        self.assertEqual(batch.envelopes()[:3], [envelope, envelope, None])
+        self.assertEqual(
+            batch.message(5),
+            "Longitude coordinates must be between -180 and 180:\n"
+            "-189.5,43.0,-87.0,44.0",
+        )
+
+    def test_default_bbox_check_is_skipped_without_a_default(self):
+        batch = validate_bboxes(["-100.5,43.0,-87.0,44.0"], {"west": None})
+        self.assertEqual(batch.errors.tolist(), [OK])
+
+    def test_empty_catalog(self):
+        batch = validate_bboxes([], WISCONSIN)
+        self.assertEqual(batch.bounds.shape, (0, 4))
+        self.assertEqual(batch.envelopes(), [])
+
+    def test_single_record_wrapper_raises_the_batch_message(self):
+        with self.assertRaisesRegex(ValueError, "^The bounding box has matching NS"):
+            process_spatial("-89.5,43.0,-89.5,44.0", WISCONSIN)
+
+    def test_site_results_are_keyed_by_spatial_string(self):
+        website = Site(
+            "Example",
+            {"DefaultBbox": "Wisconsin"},
+            {
+                "dataset": [
+                    {"spatial": "-89.3219,43.6477,-87.7342,44.8530"},
+                    {"spatial": "-89.3219,43.6477,-87.7342,44.8530"},
+                    {"spatial": "-100.5,43.0,-87.0,44.0"},
+                    {},
+                ]
+            },
+            [],
+            [],
+            [],
+        )
+        results = check_site_spatial(website)
+
+        self.assertEqual(len(results), 2)
+        self.assertEqual(
+            results["-89.3219,43.6477,-87.7342,44.8530"],
+            ("ENVELOPE(-89.3219,-87.7342,44.853,43.6477)", None),
+        )
+        self.assertIsNone(results["-100.5,43.0,-87.0,44.0"][0])
+        self.assertIs(website.bbox_results, results)
+        self.assertEqual(
+            list(website.place_results), ["-89.3219,43.6477,-87.7342,44.8530"]
+        )
+        self.assertIn(
+            "Winnebago County",
+            [
+                place.name
+                for place in website.place_results["-89.3219,43.6477,-87.7342,44.8530"]
+            ],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+OPENDATAHARVEST_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(OPENDATAHARVEST_ROOT))
+
+from catalog_db import CatalogDB
+from catalog_db import main
+
+
+def record(record_id, **fields):
+    return {
+        "id": record_id,
+        "gbl_mdVersion_s": "Aardvark",
+        "schema_provider_s": "University of Wisconsin-Milwaukee",
+        "gbl_resourceClass_sm": ["Datasets"],
+        "dcat_bbox": "ENVELOPE(-92.9,-86.8,47.1,42.5)",
+        **fields,
+    }
+
+
+class CatalogDBTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.root = Path(self.tmpdir.name) / "repo"
+        self.write("uwm/wisconsin.json", record("wisconsin"))
+        self.write(
+            "uwm/maps.json",
+            [
+                record("map", gbl_resourceClass_sm=["Maps", "Imagery"]),
+                record("no-bbox", dcat_bbox=None, locn_geometry="POINT(1 2)"),
+            ],
+        )
+        self.write(
+            "other/fiji.json",
+            record(
+                "fiji",
+                schema_provider_s="Other",
+                dcat_bbox="ENVELOPE(177.0,-178.0,-12.0,-21.0)",
+            ),
+        )
+        self.write(
+            "legacy/old.json",
+            {
+                "geoblacklight_version": "1.0",
+                "layer_slug_s": "old",
+                "dct_provenance_s": "Other",
+                "solr_geom": "ENVELOPE(-90,-89,44,43)",
+            },
+        )
+        self.write("uwm/layers.json", {"not": "a record"})
+        self.db = CatalogDB(Path(self.tmpdir.name) / "catalog.sqlite3")
+        self.addCleanup(self.db.close)
+        self.stats = self.db.update(self.root)
+
+    def write(self, name, data):
+        path = self.root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(data), encoding="utf-8")
+        return path
+
+    def test_indexed_field_queries(self):
+        self.assertEqual(self.stats.scanned, 4)
+        self.assertEqual(self.stats.records, 5)
+        self.assertEqual(
+            sorted(self.db.ids(provider="University of Wisconsin-Milwaukee")),
+            ["map", "no-bbox", "wisconsin"],
+        )
+        self.assertEqual(self.db.ids(resource_class="Imagery"), ["map"])
+        self.assertEqual(self.db.ids(missing_bbox=True), ["no-bbox"])
+        self.assertEqual(self.db.count(md_version="1.0"), 1)
+        self.assertEqual(self.db.count(provider="Other", md_version="Aardvark"), 1)
+        self.assertEqual(
+            self.db.files(id="map"), [(self.root / "uwm" / "maps.json").resolve()]
+        )
+        self.assertEqual(
+            next(self.db.records(id="fiji"))["dcat_bbox"],
+            "ENVELOPE(177.0,-178.0,-12.0,-21.0)",
+        )
+
+    def test_json_where_clause(self):
+        self.assertEqual(
+            self.db.ids(
+                where="json_extract(record, '$.locn_geometry') LIKE ?",
+                params=["POINT%"],
+            ),
+            ["no-bbox"],
+        )
+
+    def test_bbox_queries_handle_the_antimeridian(self):
+        self.assertEqual(
+            sorted(self.db.ids(bbox="ENVELOPE(-91,-88,45,42)")),
+            ["map", "old", "wisconsin"],
+        )
+        self.assertEqual(self.db.ids(bbox="ENVELOPE(-179.5,-178.5,-15,-16)"), ["fiji"])
+        self.assertEqual(self.db.ids(bbox=(170.0, -20.0, -170.0, -10.0)), ["fiji"])
+        self.assertEqual(self.db.ids(bbox="ENVELOPE(0,10,10,0)"), [])
+
+    def test_update_rereads_only_changed_and_drops_deleted_files(self):
+        self.assertEqual(self.db.update(self.root).updated, 0)
+
+        changed = self.write("uwm/wisconsin.json", record("wisconsin", dcat_bbox=None))
+        os.utime(changed, ns=(1, 1))
+        (self.root / "uwm" / "maps.json").unlink()
+        self.write("other/broken.json", {}).write_text("{", encoding="utf-8")
+        stats = self.db.update(self.root)
+
+        self.assertEqual((stats.updated, stats.removed, stats.records), (2, 1, 1))
+        self.assertEqual(sorted(self.db.ids(missing_bbox=True)), ["wisconsin"])
+        self.assertEqual(self.db.ids(resource_class="Maps"), [])
+        self.assertEqual(self.db.sql("SELECT count(*) FROM bboxes")[0][0], 3)
+        self.assertEqual(
+            list(self.db.unreadable()),
+            [str((self.root / "other" / "broken.json").resolve())],
+        )
+
+    def test_cli_update_and_query(self):
+        db_path = str(Path(self.tmpdir.name) / "cli.sqlite3")
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            main(["--db", db_path, "update", str(self.root)])
+            main(["--db", db_path, "query", "--resource-class", "Maps"])
+            main(["--db", db_path, "query", "--missing-bbox", "--format", "count"])
+        lines = output.getvalue().splitlines()
+        self.assertRegex(lines[0], r"scanned 4 files, re-read 4, removed 0, 5 records")
+        self.assertEqual(lines[1:], ["map", "1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,183 @@
+import json
+import sys
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+OPENDATAHARVEST_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(OPENDATAHARVEST_ROOT))
+# The shared HTTP client, as `pip install -e ../geometadataedit` would provide.
+sys.path.insert(0, str(OPENDATAHARVEST_ROOT.parent / "geometadataedit"))
+
+from CKAN_Harvester import CKAN_CATALOG
+from CKAN_Harvester import CKANClient
+from CKAN_Harvester import CKANError
+from CKAN_Harvester import harvest_ckan_site
+from DCAT_Harvester import Aardvark
+
+
+def make_package(number):
+    return {
+        "id": f"0b7c5e4a-1f2d-4c3b-9a8e-{number:012d}",
+        "name": f"dataset-{number}",
+        "title": f"Dataset {number}",
+        "notes": "<p>Stand-in package</p>",
+        "metadata_created": "2022-03-04T10:00:00",
+        "metadata_modified": "2023-05-06T10:00:00",
+        "organization": {"title": "City of Example"},
+        "tags": [{"name": "boundaries"}],
+        "resources": [
+            {"format": "SHP", "name": "Shapefile", "url": "https://example.com/a.zip"},
+            {"format": "ZIP", "name": "Download", "url": "https://example.com/b.zip"},
+        ],
+    }
+
+
+class StubCKANServer:
+    """A local stand-in for the CKAN Action API used by the tests."""
+
+    def __init__(self, packages):
+        self.packages = {package["name"]: package for package in packages}
+        self.search_calls = []
+        self.show_calls = []
+        self.active_shows = 0
+        self.max_active_shows = 0
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.handler())
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def send_json(self, payload, status=200):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                params = {
+                    key: values[0] for key, values in parse_qs(parsed.query).items()
+                }
+                action = parsed.path.rsplit("/", 1)[-1]
+                if action == "package_search":
+                    stub.search_calls.append(params)
+                    names = sorted(stub.packages)
+                    start = int(params.get("start", 0))
+                    rows = int(params.get("rows", 10))
+                    results = [{"name": name} for name in names[start : start + rows]]
+                    self.send_json(
+                        {
+                            "success": True,
+                            "result": {"count": len(names), "results": results},
+                        }
+                    )
+                elif action == "package_show":
+                    with stub.lock:
+                        stub.show_calls.append(params["id"])
+                        stub.active_shows += 1
+                        stub.max_active_shows = max(
+                            stub.max_active_shows, stub.active_shows
+                        )
+                    time.sleep(0.02)
+                    with stub.lock:
+                        stub.active_shows -= 1
+                    package = stub.packages.get(params["id"])
+                    if package is None:
+                        self.send_json(
+                            {"success": False, "error": {"message": "Not found"}}, 404
+                        )
+                    else:
+                        self.send_json({"success": True, "result": package})
+                else:
+                    self.send_json(
+                        {"success": False, "error": {"message": action}}, 400
+                    )
+
+        return Handler
+
+
+class CKANHarvesterTest(unittest.TestCase):
+    def test_package_search_is_paged_with_rows_and_start(self):
+        with StubCKANServer([make_package(n) for n in range(5)]) as stub:
+            client = CKANClient(stub.url, rows=2, concurrency=2)
+            names = list(client.iter_package_names())
+
+        self.assertEqual(names, [f"dataset-{n}" for n in range(5)])
+        self.assertEqual([call["start"] for call in stub.search_calls], ["0", "2", "4"])
+        self.assertTrue(all(call["rows"] == "2" for call in stub.search_calls))
+
+    def test_package_show_concurrency_is_bounded(self):
+        with StubCKANServer([make_package(n) for n in range(12)]) as stub:
+            client = CKANClient(stub.url, rows=5, concurrency=3)
+            website = harvest_ckan_site(
+                {"SiteURL": stub.url, "SiteName": "Example"}, client
+            )
+
+        self.assertEqual(len(website.site_json["dataset"]), 12)
+        self.assertEqual(len(stub.show_calls), 12)
+        self.assertLessEqual(stub.max_active_shows, 3)
+        self.assertGreater(stub.max_active_shows, 1)
+
+    def test_configured_datasets_become_aardvark_records(self):
+        # The shipped site, with its zoning entry standing in for dataset-1.
+        shipped = CKAN_CATALOG["Milwaukee_OpenData"]
+        details = dict(shipped)
+        details["Datasets"] = {
+            "dataset-1": shipped["Datasets"]["zoning"],
+            "missing-dataset": {"title": "Not on the portal"},
+        }
+        with StubCKANServer([make_package(n) for n in range(3)]) as stub:
+            details["SiteURL"] = stub.url
+            with self.assertLogs(level="WARNING") as captured:
+                website = harvest_ckan_site(
+                    details, CKANClient(stub.url, concurrency=2)
+                )
+
+        self.assertEqual(stub.show_calls, ["dataset-1"])
+        self.assertIn("missing-dataset", captured.output[0])
+
+        record = Aardvark(website.site_json["dataset"][0], website)
+        self.assertEqual(record.id, "Milwaukee-0b7c5e4a1f2d4c3b9a8e000000000001")
+        self.assertEqual(
+            record.dct_title_s, "City of Milwaukee - Zoning Milwaukee, Wisconsin"
+        )
+        self.assertEqual(record.dct_publisher_sm, ["City of Example"])
+        self.assertEqual(
+            record.dct_spatial_sm, ["Milwaukee County", *shipped["Spatial"]]
+        )
+        self.assertEqual(record.dcat_theme_sm, ["Property"])
+        self.assertEqual(record.dct_format_s, "Shapefile")
+        self.assertEqual(
+            record.locn_geometry, "ENVELOPE(-88.0655,-87.8123,43.1989,42.9645)"
+        )
+        self.assertIn("http://schema.org/downloadUrl", record.dct_references_s)
+
+    def test_unsuccessful_action_raises(self):
+        with StubCKANServer([]) as stub:
+            client = CKANClient(stub.url)
+            with self.assertRaises(CKANError):
+                client.action("organization_list")
+
+
+if __name__ == "__main__":
+    unittest.main()
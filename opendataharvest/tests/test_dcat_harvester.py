@@ -4,6 +4,8 @@ from pathlib import Path
 
 OPENDATAHARVEST_ROOT = Path(__file__).resolve().parents[1]
 sys.path.insert(0, str(OPENDATAHARVEST_ROOT))
+# The shared HTTP client, as `pip install -e ../geometadataedit` would provide.
+sys.path.insert(0, str(OPENDATAHARVEST_ROOT.parent / "geometadataedit"))
 
 from DCAT_Harvester import Aardvark
 from DCAT_Harvester import AardvarkDataProcessor
@@ -129,6 +131,45 @@ class ResourceClassificationTest(unittest.TestCase):
         self.assertEqual(RESOURCECLASS, original_resource_class)
 
 
+class RecordModelTest(unittest.TestCase):
+    def make_record(self, **dataset):
+        website = Site(
+            "Example",
+            {"CreatedBy": "Example Agency", "Spatial": ["Wisconsin"]},
+            {},
+            [],
+            [],
+            [],
+        )
+        dataset = {
+            "identifier": "https://www.arcgis.com/home/item.html?id=abc123",
+            "title": "Parcels",
+            "description": "",
+            "keyword": [],
+            "landingPage": "https://example.com/datasets/parcels",
+            "distribution": [],
+            **dataset,
+        }
+        return Aardvark(dataset, website)
+
+    def test_records_have_no_instance_dict(self):
+        record = self.make_record()
+        self.assertFalse(hasattr(record, "__dict__"))
+        with self.assertRaises(AttributeError):
+            record.unexpected_field = "value"
+
+    def test_to_dict_follows_field_order_and_skips_empty_values(self):
+        record = self.make_record()
+        serialized = record.to_dict()
+        self.assertEqual(
+            list(serialized),
+            [field for field in Aardvark.FIELDS if field in serialized],
+        )
+        self.assertEqual(serialized["id"], "Example-abc123")
+        self.assertNotIn("locn_geometry", serialized)
+        self.assertNotIn("dct_relation_sm", serialized)
+
+
 class SkipListTest(unittest.TestCase):
     def setUp(self):
         self.dataset = {
@@ -160,6 +201,15 @@ class SkipListTest(unittest.TestCase):
 
         self.assertFalse(record._process_id(self.dataset, website))
 
+    def test_dashed_guid_keeps_the_existing_id(self):
+        # Records already in OGM were named from the GUID up to its first dash.
+        self.assertEqual(
+            AardvarkDataProcessor.extract_id_sublayer(
+                "https://example.com/home/item.html?id=0b7c5e4a-1f2d-4c3b&sublayer=2"
+            ),
+            ("0b7c5e4a", "2"),
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
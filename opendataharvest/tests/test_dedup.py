@@ -0,0 +1,162 @@
+import json
+import sys
+import tempfile
+import unittest
+import uuid
+from pathlib import Path
+from types import SimpleNamespace
+
+OPENDATAHARVEST_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(OPENDATAHARVEST_ROOT))
+# The shared HTTP client, as `pip install -e ../geometadataedit` would provide.
+sys.path.insert(0, str(OPENDATAHARVEST_ROOT.parent / "geometadataedit"))
+
+from DCAT_Harvester import Aardvark
+from DCAT_Harvester import Site
+from dedup import DeduplicationIndex
+from dedup import merge_envelopes
+from dedup import normalize_url
+
+
+def make_record(record_id, uuid, sublayer=None, urls=(), spatial=(), envelope=None):
+    references = {f"ref{n}": url for n, url in enumerate(urls)}
+    return SimpleNamespace(
+        id=record_id,
+        uuid=uuid,
+        sublayer=sublayer,
+        dct_references_s=json.dumps(references) if references else None,
+        dct_spatial_sm=list(spatial),
+        locn_geometry=envelope,
+    )
+
+
+class DeduplicationIndexTest(unittest.TestCase):
+    def test_normalize_url_ignores_cosmetic_differences(self):
+        self.assertEqual(
+            normalize_url("https://WWW.Example.com:443/Layer/FeatureServer/0/?b=2&a=1"),
+            normalize_url("http://example.com/Layer/FeatureServer/0?a=1&b=2"),
+        )
+        self.assertIsNone(normalize_url("not a url"))
+
+    def test_same_item_matches_across_portals_but_not_across_sublayers(self):
+        index = DeduplicationIndex()
+        self.assertIsNone(index.match(make_record("County-abc0", "ABC", "0")))
+        self.assertIsNone(index.match(make_record("County-abc1", "abc", "1")))
+        self.assertEqual(
+            index.match(make_record("State-abc0", "abc", "0")), "County-abc0"
+        )
+        self.assertEqual(index.duplicates, {"County-abc0": ["State-abc0"]})
+
+    def test_shared_service_url_matches_and_is_claimed_transitively(self):
+        service = (
+            "https://services.arcgis.com/x/arcgis/rest/services/Parcels/FeatureServer/0"
+        )
+        index = DeduplicationIndex()
+        index.match(make_record("County-a", "a", urls=[service]))
+        self.assertEqual(
+            index.match(make_record("State-b", "b", urls=[service + "/"])),
+            "County-a",
+        )
+        # State-b's own uuid now resolves to the kept record as well.
+        self.assertEqual(index.match(make_record("Region-b", "b")), "County-a")
+
+    def test_random_fallback_uuid_is_not_a_key(self):
+        index = DeduplicationIndex()
+        record = make_record("County-x", uuid.uuid4(), urls=["https://example.com/a"])
+        self.assertIsNone(index.match(record))
+        self.assertEqual(len(index), 1)
+
+    def test_merge_envelopes_across_the_dateline(self):
+        self.assertEqual(
+            merge_envelopes(
+                "ENVELOPE(170.5,-170.25,10,-10)", "ENVELOPE(-175,-160,5,-20)"
+            ),
+            "ENVELOPE(170.5,-160,10,-20)",
+        )
+        # Two boxes either side of the dateline merge across it, not around.
+        self.assertEqual(
+            merge_envelopes("ENVELOPE(170,179,10,0)", "ENVELOPE(-179,-170,10,0)"),
+            "ENVELOPE(170,-170,10,0)",
+        )
+
+    def test_merge_envelopes_keeps_outer_edges(self):
+        self.assertEqual(
+            merge_envelopes(
+                "ENVELOPE(-89.3219,-87.7342,44.853,43.6477)",
+                "ENVELOPE(-90.0,-88.0,44.0,42.5)",
+            ),
+            "ENVELOPE(-90.0,-87.7342,44.853,42.5)",
+        )
+
+    def test_policies_update_the_kept_file(self):
+        original = make_record(
+            "County-a",
+            "a",
+            spatial=["Milwaukee County"],
+            envelope="ENVELOPE(-88,-87,43,42)",
+        )
+        duplicate = make_record(
+            "State-a", "a", spatial=["Wisconsin"], envelope="ENVELOPE(-92,-87,47,42)"
+        )
+        expected = {
+            "keep_first": (False, None),
+            "merge_spatial": (
+                False,
+                {
+                    "dct_spatial_sm": ["Milwaukee County", "Wisconsin"],
+                    "locn_geometry": "ENVELOPE(-92,-87,47,42)",
+                },
+            ),
+            "relation": (True, {"dct_relation_sm": ["State-a"]}),
+        }
+        for policy, (write_duplicate, kept_changes) in expected.items():
+            with self.subTest(policy=policy), tempfile.TemporaryDirectory() as tmpdir:
+                kept_path = Path(tmpdir) / "County-a.json"
+                kept = {
+                    "id": "County-a",
+                    "dct_spatial_sm": ["Milwaukee County"],
+                    "locn_geometry": "ENVELOPE(-88,-87,43,42)",
+                }
+                kept_path.write_text(json.dumps(kept), encoding="utf-8")
+
+                index = DeduplicationIndex(policy)
+                index.match(original)
+                kept_id = index.match(duplicate)
+                self.assertEqual(
+                    index.apply(duplicate, kept_id, Path(tmpdir)), write_duplicate
+                )
+                kept.update(kept_changes or {})
+                self.assertEqual(
+                    json.loads(kept_path.read_text(encoding="utf-8")), kept
+                )
+
+        self.assertEqual(duplicate.dct_relation_sm, ["County-a"])
+
+    def test_unknown_policy_is_rejected(self):
+        with self.assertRaises(ValueError):
+            DeduplicationIndex("newest")
+
+    def test_aardvark_records_expose_dedup_keys(self):
+        dataset = {
+            "title": "Parcels",
+            "description": "",
+            "identifier": (
+                "https://www.arcgis.com/home/item.html"
+                "?id=6ee1cc1bf02b4b1bbe60e0c57513b02a&sublayer=2"
+            ),
+            "landingPage": "https://county.example.com/datasets/parcels",
+            "spatial": "-90.0, 44.0, -89.0, 43.0",
+            "distribution": [],
+        }
+        details = {"CreatedBy": "Example", "Spatial": ["Wisconsin"], "DefaultBbox": ""}
+        index = DeduplicationIndex()
+        first = Aardvark(dataset, Site("County", details, {}, [], [], []))
+        dataset = dict(dataset, landingPage="https://state.example.com/d/parcels")
+        second = Aardvark(dataset, Site("State", details, {}, [], [], []))
+
+        self.assertIsNone(index.match(first))
+        self.assertEqual(index.match(second), first.id)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,156 @@
+import json
+import sys
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+OPENDATAHARVEST_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(OPENDATAHARVEST_ROOT))
+# The shared HTTP client, as `pip install -e ../geometadataedit` would provide.
+sys.path.insert(0, str(OPENDATAHARVEST_ROOT.parent / "geometadataedit"))
+
+from bbox import OK
+from bbox import OUTSIDE_DEFAULT
+from bbox import validate_bboxes
+from convert import SchemaUpdater
+from envelope import format_envelope
+from envelope import normalize_envelope
+from envelope import orient_longitudes
+from envelope import parse_envelope
+from envelope import union_envelopes
+from spatial_index import Place
+from spatial_index import PlaceIndex
+
+FIXTURES = OPENDATAHARVEST_ROOT.parent / "gbl-1_to_aardvark" / "aardvark"
+
+
+def fixture_geometry(name):
+    with open(FIXTURES / name, encoding="utf-8") as fixture:
+        return json.load(fixture)["locn_geometry"]
+
+
+class EnvelopeTest(unittest.TestCase):
+    def test_dateline_fixture_is_recognised(self):
+        envelope = parse_envelope(fixture_geometry("iiif-eastern-hemisphere.json"))
+        self.assertTrue(envelope.crosses_antimeridian)
+        self.assertAlmostEqual(envelope.width, 166.65)
+        self.assertEqual(
+            envelope.parts(),
+            [(25.0, -12.93, 180.0, 81.66), (-180.0, -12.93, -168.35, 81.66)],
+        )
+
+    def test_wide_box_is_not_a_dateline_crossing(self):
+        envelope = parse_envelope(fixture_geometry("bbox-spans-180.json"))
+        self.assertFalse(envelope.crosses_antimeridian)
+        self.assertAlmostEqual(envelope.width, 192.73333333333333)
+
+    def test_fixture_envelopes_survive_normalization(self):
+        values = [
+            json.loads(path.read_text(encoding="utf-8")).get("locn_geometry")
+            for path in sorted(FIXTURES.glob("*.json"))
+        ]
+        values = [value for value in values if value]
+        self.assertEqual([normalize_envelope(value) for value in values], values)
+
+    def test_normalization_repairs_and_rejects(self):
+        self.assertEqual(
+            normalize_envelope("ENVELOPE(25, -168.35, -12.93, 81.66)"),
+            "ENVELOPE(25, -168.35, 81.66, -12.93)",
+        )
+        for value in (
+            "ENVELOPE(-200, -168.35, 81.66, -12.93)",
+            "POLYGON((0 0, 1 1, 1 0, 0 0))",
+            None,
+        ):
+            with self.subTest(value=value):
+                with self.assertRaises(ValueError):
+                    normalize_envelope(value)
+
+    def test_format_envelope_keeps_explicit_west_and_east(self):
+        self.assertEqual(
+            format_envelope(170.5, -170.25, -10.0, 10.0),
+            "ENVELOPE(170.5,-170.25,10.0,-10.0)",
+        )
+        with self.assertRaises(ValueError):
+            format_envelope(190.0, -170.0, 10.0, -10.0)
+
+    def test_union_envelopes(self):
+        pacific = parse_envelope("ENVELOPE(170,-170,10,0)")
+        self.assertEqual(
+            union_envelopes(pacific, parse_envelope("ENVELOPE(-60,-50,5,-5)")),
+            (170.0, -50.0, 10.0, -5.0),
+        )
+        self.assertEqual(
+            union_envelopes(
+                parse_envelope("ENVELOPE(-180,10,10,0)"),
+                parse_envelope("ENVELOPE(0,180,10,0)"),
+            ),
+            (-180.0, 180.0, 10.0, 0.0),
+        )
+
+    def test_orient_longitudes(self):
+        west, east = orient_longitudes(
+            np.array([-87.7, 25.0, -124.7, 179.5]),
+            np.array([-89.3, -168.35, 68.0, -179.5]),
+        )
+        self.assertEqual(west.tolist(), [-89.3, 25.0, -124.7, 179.5])
+        self.assertEqual(east.tolist(), [-87.7, -168.35, 68.0, -179.5])
+
+
+class DatelineConsumersTest(unittest.TestCase):
+    def test_harvester_batch_keeps_dateline_boxes(self):
+        batch = validate_bboxes(
+            [
+                "25.0,-12.93,-168.35,81.66",
+                "-124.73333333333333,-53.233333333333334,68.0,62.45",
+                "-87.7342,43.6477,-89.3219,44.8530",
+            ]
+        )
+        self.assertEqual(batch.errors.tolist(), [OK, OK, OK])
+        self.assertEqual(
+            batch.envelopes(),
+            [
+                "ENVELOPE(25.0,-168.35,81.66,-12.93)",
+                "ENVELOPE(-124.73333333333333,68.0,62.45,-53.233333333333334)",
+                "ENVELOPE(-89.3219,-87.7342,44.853,43.6477)",
+            ],
+        )
+
+    def test_dateline_box_is_outside_a_default_bbox(self):
+        default = {"west": -180.0, "east": 180.0, "north": 90.0, "south": -90.0}
+        batch = validate_bboxes(["25.0,-12.93,-168.35,81.66"], default)
+        self.assertEqual(batch.errors.tolist(), [OUTSIDE_DEFAULT])
+
+    def test_convert_keeps_dateline_geometry(self):
+        data = {
+            "id": "iiif-eastern-hemisphere",
+            "locn_geometry": fixture_geometry("iiif-eastern-hemisphere.json"),
+            "dcat_bbox": "ENVELOPE(25, -168.35, -12.93, 81.66)",
+        }
+        SchemaUpdater().normalize_geometry(data)
+        self.assertEqual(data["locn_geometry"], "ENVELOPE(25, -168.35, 81.66, -12.93)")
+        self.assertEqual(data["dcat_bbox"], "ENVELOPE(25, -168.35, 81.66, -12.93)")
+
+    def test_place_index_queries_both_halves(self):
+        index = PlaceIndex(
+            [
+                Place("Fiji", "boundary", (177.0, -19.2, 180.0, -16.0)),
+                Place("Samoa", "boundary", (-172.8, -14.1, -171.4, -13.4)),
+                Place("Equator", "boundary", (-10.0, -1.0, 10.0, 1.0)),
+            ]
+        )
+        envelope = parse_envelope("ENVELOPE(170, -175, -10, -20)")
+        self.assertEqual(
+            sorted(place.name for place in index.intersecting(envelope.bounds)),
+            ["Fiji"],
+        )
+        envelope = parse_envelope("ENVELOPE(170, -171, -10, -20)")
+        self.assertEqual(
+            sorted(place.name for place in index.intersecting(envelope.bounds)),
+            ["Fiji", "Samoa"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,228 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+OPENDATAHARVEST_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(OPENDATAHARVEST_ROOT))
+# The shared HTTP client, as `pip install -e ../geometadataedit` would provide.
+sys.path.insert(0, str(OPENDATAHARVEST_ROOT.parent / "geometadataedit"))
+
+from convert import SchemaUpdater
+from git_changes import GitError
+from git_changes import mark_processed
+from git_changes import pending_changes
+from git_changes import stored_commit
+from normalize import normalize_directory
+
+GIT_ENV = {
+    "GIT_AUTHOR_NAME": "Test",
+    "GIT_AUTHOR_EMAIL": "test@example.com",
+    "GIT_COMMITTER_NAME": "Test",
+    "GIT_COMMITTER_EMAIL": "test@example.com",
+}
+
+
+def unnormalized(record_id):
+    return {
+        "id": record_id,
+        "gbl_mdVersion_s": "Aardvark",
+        "gbl_resourceType_sm": ["Index maps ", "Index maps"],
+    }
+
+
+class GitRepoTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.root = Path(self.tmpdir.name).resolve()
+        self.repo = self.root / "edu.example"
+        self.repo.mkdir()
+        self.git("init", "-q")
+
+    def git(self, *args):
+        subprocess.run(
+            ["git", "-C", str(self.repo), *args],
+            check=True,
+            env=dict(os.environ, **GIT_ENV),
+            stdout=subprocess.DEVNULL,
+        )
+
+    def write(self, name, data):
+        path = self.repo / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(data), encoding="utf-8")
+        return path
+
+    def commit(self, message="update"):
+        self.git("add", "-A")
+        self.git("commit", "-q", "-m", message)
+
+    def head(self):
+        return subprocess.run(
+            ["git", "-C", str(self.repo), "rev-parse", "HEAD"],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+
+
+class PendingChangesTest(GitRepoTestCase):
+    def test_changes_between_the_stored_commit_and_head(self):
+        self.write("metadata/a.json", {"id": "a"})
+        self.write("metadata/c.json", {"id": "c"})
+        self.commit()
+
+        first = pending_changes(self.repo, "normalize")
+        self.assertTrue(first.full_scan)
+        mark_processed(first)
+        self.assertEqual(stored_commit(self.repo, first.ref), self.head())
+
+        self.write("metadata/a.json", {"id": "a", "changed": True})
+        self.write("metadata/b.json", {"id": "b"})
+        self.write("metadata/layers.json", {})
+        self.write("README.md", {})
+        (self.repo / "metadata" / "c.json").unlink()
+        self.commit()
+
+        changes = pending_changes(self.repo, "normalize")
+        self.assertEqual(changes.base, first.head)
+        self.assertEqual(
+            sorted(path.name for path in changes.paths), ["a.json", "b.json"]
+        )
+        # Other tasks keep their own position.
+        self.assertTrue(pending_changes(self.repo, "convert").full_scan)
+
+    def test_subdirectories_are_tracked_separately(self):
+        self.write("metadata-1.0/a.json", {"id": "a"})
+        self.write("aardvark/b.json", {"id": "b"})
+        self.commit()
+        mark_processed(pending_changes(self.repo / "metadata-1.0", "convert"))
+        self.write("metadata-1.0/a.json", {"id": "a2"})
+        self.write("aardvark/b.json", {"id": "b2"})
+        self.commit()
+
+        changes = pending_changes(self.repo / "metadata-1.0", "convert")
+
+        self.assertEqual([path.name for path in changes.paths], ["a.json"])
+        self.assertTrue(pending_changes(self.repo / "aardvark", "convert").full_scan)
+
+    def test_stale_change_sets_cannot_move_the_ref(self):
+        self.write("a.json", {"id": "a"})
+        self.commit()
+        mark_processed(pending_changes(self.repo, "normalize"))
+        self.write("a.json", {"id": "a2"})
+        self.commit()
+        stale = pending_changes(self.repo, "normalize")
+        mark_processed(pending_changes(self.repo, "normalize"))
+        self.write("a.json", {"id": "a3"})
+        self.commit()
+        newer = pending_changes(self.repo, "normalize")
+        mark_processed(newer)
+
+        with self.assertRaises(GitError):
+            mark_processed(stale)
+        self.assertEqual(stored_commit(self.repo, stale.ref), newer.head)
+
+    def test_directories_outside_git_are_not_tracked(self):
+        plain = self.root / "plain"
+        plain.mkdir()
+        self.assertIsNone(pending_changes(plain, "normalize"))
+
+
+class IncrementalNormalizeTest(GitRepoTestCase):
+    def test_only_changed_files_are_normalized(self):
+        self.write("a.json", unnormalized("a"))
+        self.commit()
+        mark_processed(pending_changes(self.repo, "normalize"))
+        self.write("b.json", unnormalized("b"))
+        self.commit()
+        plain = self.root / "plain"
+        plain.mkdir()
+        (plain / "c.json").write_text(json.dumps(unnormalized("c")), encoding="utf-8")
+        top = self.root / "d.json"
+        top.write_text(json.dumps(unnormalized("d")), encoding="utf-8")
+
+        updated = normalize_directory(self.root, incremental=True)
+
+        self.assertEqual(updated, 3)
+        types = {
+            path.stem: json.loads(path.read_text(encoding="utf-8"))[
+                "gbl_resourceType_sm"
+            ]
+            for path in (
+                self.repo / "a.json",
+                self.repo / "b.json",
+                plain / "c.json",
+                top,
+            )
+        }
+        self.assertEqual(
+            types,
+            {
+                "a": ["Index maps ", "Index maps"],
+                "b": ["Index maps"],
+                "c": ["Index maps"],
+                "d": ["Index maps"],
+            },
+        )
+        self.assertEqual(
+            stored_commit(self.repo, "refs/opendataharvest/normalize"), self.head()
+        )
+        # Nothing changed in git; the directory outside it is scanned again.
+        (plain / "c.json").write_text(json.dumps(unnormalized("c")), encoding="utf-8")
+        self.assertEqual(normalize_directory(self.root, incremental=True), 1)
+
+    def test_failed_files_are_retried(self):
+        self.write("a.json", unnormalized("a"))
+        self.commit()
+        mark_processed(pending_changes(self.repo, "normalize"))
+        base = self.head()
+        self.write("b.json", unnormalized("b"))
+        (self.repo / "c.json").write_text("{", encoding="utf-8")
+        self.commit()
+
+        self.assertEqual(normalize_directory(self.repo, incremental=True), 1)
+        self.assertEqual(
+            stored_commit(self.repo, "refs/opendataharvest/normalize"), base
+        )
+
+        self.write("c.json", unnormalized("c"))
+        self.commit()
+        self.assertEqual(normalize_directory(self.repo, incremental=True), 1)
+        self.assertEqual(
+            stored_commit(self.repo, "refs/opendataharvest/normalize"), self.head()
+        )
+
+
+class IncrementalConvertTest(GitRepoTestCase):
+    def test_failed_files_are_retried(self):
+        output = self.root / "aardvark"
+        self.write("metadata-1.0/a.json", {"layer_slug_s": "a"})
+        self.commit()
+        updater = SchemaUpdater()
+        updater.update_all_schemas(self.repo / "metadata-1.0", output, True)
+        base = self.head()
+        self.write("metadata-1.0/b.json", {"layer_slug_s": "b"})
+        (self.repo / "metadata-1.0" / "c.json").write_text("{", encoding="utf-8")
+        self.commit()
+
+        updater.update_all_schemas(self.repo / "metadata-1.0", output, True)
+        ref = "refs/opendataharvest/convert/metadata-1.0"
+        self.assertEqual(stored_commit(self.repo, ref), base)
+        self.assertEqual(
+            sorted(path.name for path in output.iterdir()), ["a.json", "b.json"]
+        )
+
+        self.write("metadata-1.0/c.json", {"layer_slug_s": "c"})
+        self.commit()
+        updater.update_all_schemas(self.repo / "metadata-1.0", output, True)
+        self.assertEqual(stored_commit(self.repo, ref), self.head())
+        self.assertTrue((output / "c.json").exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
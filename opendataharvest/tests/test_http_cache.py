@@ -0,0 +1,163 @@
+import json
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+OPENDATAHARVEST_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(OPENDATAHARVEST_ROOT))
+# The shared HTTP client, as `pip install -e ../geometadataedit` would provide.
+sys.path.insert(0, str(OPENDATAHARVEST_ROOT.parent / "geometadataedit"))
+
+from http_cache import CacheMiss
+from http_cache import ResponseCache
+from geometadataedit.http_client import HttpClient
+
+
+class CatalogServer:
+    """Serves a data.json per path and honours If-None-Match."""
+
+    def __init__(self):
+        self.bodies = {}
+        self.requests = []
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.handler())
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                body = stub.bodies.get(self.path)
+                etag = f'"{hash(body)}"'
+                stub.requests.append((self.path, self.headers.get("If-None-Match")))
+                if body is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                elif self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                else:
+                    self.send_response(200)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+        return Handler
+
+
+class ResponseCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmpdir.name)
+        self.client = HttpClient(retries=0)
+
+    def tearDown(self):
+        self.client.close()
+        self.tmpdir.cleanup()
+
+    def test_fresh_entries_are_served_without_a_request(self):
+        cache = ResponseCache(self.root, ttl=60)
+        with CatalogServer() as server:
+            server.bodies["/data.json"] = json.dumps({"dataset": [1, 2]}).encode()
+            first = cache.get(self.client, f"{server.url}/data.json")
+            second = cache.get(self.client, f"{server.url}/data.json")
+
+        self.assertFalse(first.from_cache)
+        self.assertTrue(second.from_cache)
+        self.assertEqual(second.json(), {"dataset": [1, 2]})
+        self.assertEqual(len(server.requests), 1)
+
+    def test_stale_entries_are_revalidated_with_etag(self):
+        cache = ResponseCache(self.root, ttl=0)
+        with CatalogServer() as server:
+            server.bodies["/data.json"] = b'{"dataset": []}'
+            cache.get(self.client, f"{server.url}/data.json")
+            unchanged = cache.get(self.client, f"{server.url}/data.json")
+            server.bodies["/data.json"] = b'{"dataset": [3]}'
+            changed = cache.get(self.client, f"{server.url}/data.json")
+
+        self.assertIsNone(server.requests[0][1])
+        self.assertIsNotNone(server.requests[1][1])
+        self.assertTrue(unchanged.from_cache)
+        self.assertEqual(unchanged.text, '{"dataset": []}')
+        self.assertFalse(changed.from_cache)
+        self.assertEqual(changed.json(), {"dataset": [3]})
+
+    def test_identical_bodies_share_one_object(self):
+        cache = ResponseCache(self.root, ttl=60)
+        with CatalogServer() as server:
+            server.bodies["/a.json"] = server.bodies["/b.json"] = b'{"same": true}'
+            cache.get(self.client, f"{server.url}/a.json")
+            cache.get(self.client, f"{server.url}/b.json")
+
+        self.assertEqual(len(list((self.root / "index").glob("*.json"))), 2)
+        self.assertEqual(len(list((self.root / "objects").glob("*/*"))), 1)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = ResponseCache(self.root, ttl=60, max_bytes=250)
+        with CatalogServer() as server:
+            for name in ("a", "b", "c"):
+                server.bodies[f"/{name}.json"] = name.encode() * 100
+            cache.get(self.client, f"{server.url}/a.json")
+            time.sleep(0.01)
+            cache.get(self.client, f"{server.url}/b.json")
+            time.sleep(0.01)
+            cache.get(self.client, f"{server.url}/a.json")
+            time.sleep(0.01)
+            cache.get(self.client, f"{server.url}/c.json")
+
+        offline = ResponseCache(self.root, offline=True)
+        self.assertEqual(
+            offline.get(self.client, f"{server.url}/a.json").content[:1], b"a"
+        )
+        self.assertEqual(
+            offline.get(self.client, f"{server.url}/c.json").content[:1], b"c"
+        )
+        with self.assertRaises(CacheMiss):
+            offline.get(self.client, f"{server.url}/b.json")
+        self.assertEqual(len(list((self.root / "objects").glob("*/*"))), 2)
+
+    def test_offline_mode_replays_without_network(self):
+        with CatalogServer() as server:
+            url = f"{server.url}/data.json"
+            server.bodies["/data.json"] = b'{"dataset": ["replayed"]}'
+            ResponseCache(self.root, ttl=0).get(self.client, url)
+
+        # The server is gone; an expired entry is still replayed offline.
+        replay = ResponseCache(self.root, ttl=0, offline=True).get(self.client, url)
+        self.assertTrue(replay.from_cache)
+        self.assertEqual(replay.json(), {"dataset": ["replayed"]})
+
+    def test_errors_are_not_cached(self):
+        cache = ResponseCache(self.root, ttl=60)
+        with CatalogServer() as server:
+            response = cache.get(self.client, f"{server.url}/missing.json")
+            cache.get(self.client, f"{server.url}/missing.json")
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(len(server.requests), 2)
+        self.assertEqual(list((self.root / "index").glob("*.json")), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+OPENDATAHARVEST_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(OPENDATAHARVEST_ROOT))
+
+import jsonio
+from jsonio import dumps
+from jsonio import load
+from jsonio import loads
+from jsonio import write_json_atomically
+
+FIXTURES = OPENDATAHARVEST_ROOT.parent / "gbl-1_to_aardvark" / "aardvark"
+
+
+def stdlib_pretty(data):
+    return json.dumps(data, indent=2)
+
+
+class PrettyOutputTest(unittest.TestCase):
+    def test_fixture_records_match_the_standard_library(self):
+        for path in sorted(FIXTURES.glob("*.json")):
+            with self.subTest(path=path.name):
+                data = json.loads(path.read_text(encoding="utf-8"))
+                self.assertEqual(dumps(data, pretty=True), stdlib_pretty(data))
+
+    def test_escapes_match_the_standard_library(self):
+        data = {
+            "dct_title_s": "Carte de l'Afrique é   \U0001f5fa \x7f \x1f",
+            "dct_description_sm": ['quote " and backslash \\ and /'],
+            "Москва": [],
+            "empty": {},
+        }
+        self.assertEqual(dumps(data, pretty=True), stdlib_pretty(data))
+
+    def test_values_formatted_differently_by_orjson_fall_back(self):
+        for value in (1e16, 1e-05, 1.5e300, float("nan"), float("inf"), 2**70):
+            with self.subTest(value=value):
+                data = {"value": [value, 0.5]}
+                self.assertEqual(dumps(data, pretty=True), stdlib_pretty(data))
+        self.assertEqual(dumps({1: "a"}, pretty=True), stdlib_pretty({1: "a"}))
+
+    def test_compact_output_keeps_standard_separators(self):
+        data = {"id": "example", "dct_spatial_sm": ["Wisconsin"]}
+        self.assertEqual(dumps(data), json.dumps(data))
+
+    def test_standard_library_backend(self):
+        data = {"dct_title_s": "é", "gbl_indexYear_im": [2024]}
+        with patch.object(jsonio, "orjson", None):
+            self.assertEqual(dumps(data, pretty=True), stdlib_pretty(data))
+            self.assertEqual(loads(b'{"a": [1, 2.5]}'), {"a": [1, 2.5]})
+
+
+class LoadsTest(unittest.TestCase):
+    def test_values_orjson_rejects_still_parse(self):
+        data = loads('{"big": 123456789012345678901234567890, "nan": NaN}')
+        self.assertEqual(data["big"], 123456789012345678901234567890)
+        self.assertNotEqual(data["nan"], data["nan"])
+
+    def test_invalid_documents_raise_json_decode_error(self):
+        with self.assertRaises(json.JSONDecodeError):
+            loads(b"{not json")
+
+
+class WriteJsonAtomicallyTest(unittest.TestCase):
+    def test_writes_the_ogm_format_and_leaves_no_temporary_files(self):
+        data = {"id": "example", "dct_title_s": "Café", "gbl_indexYear_im": []}
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "nested" / "example.json"
+            write_json_atomically(path, data)
+
+            self.assertEqual(
+                path.read_bytes(), (stdlib_pretty(data) + "\n").encode("utf-8")
+            )
+            self.assertEqual(load(path), data)
+            self.assertEqual(
+                [child.name for child in path.parent.iterdir()], [path.name]
+            )
+
+    def test_unserializable_data_keeps_the_original_file(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "example.json"
+            path.write_text('{"id": "example"}\n', encoding="utf-8")
+
+            with self.assertRaises(TypeError):
+                write_json_atomically(path, {"id": object()})
+
+            self.assertEqual(path.read_text(encoding="utf-8"), '{"id": "example"}\n')
+            self.assertEqual(len(list(Path(tmpdir).iterdir())), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+OPENDATAHARVEST_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(OPENDATAHARVEST_ROOT))
+
+import parquet_export
+from parquet_export import export_corpus
+from parquet_export import flatten_record
+from parquet_export import load_corpus
+
+FIXTURES = OPENDATAHARVEST_ROOT.parent / "gbl-1_to_aardvark" / "aardvark"
+
+
+class FlattenRecordTest(unittest.TestCase):
+    def test_columns_follow_the_solr_suffixes(self):
+        row = flatten_record(
+            {
+                "id": "example",
+                "dct_spatial_sm": "Wisconsin",
+                "dct_subject_sm": ["Maps", 5],
+                "gbl_indexYear_im": [2024, "1999", 2001.0, "c. 1900", True, "--5", "²"],
+                "gbl_dateRange_drsim": ["[1990 TO 2000]"],
+                "gbl_suppressed_b": "true",
+                "gbl_georeferenced_b": "maybe",
+                "gbl_wxsIdentifier_i": "12",
+                "dct_references_s": {"http://schema.org/url": "https://example.com"},
+                "dct_format_s": None,
+            }
+        )
+        self.assertEqual(
+            row,
+            {
+                "id": "example",
+                "dct_spatial_sm": ["Wisconsin"],
+                "dct_subject_sm": ["Maps", "5"],
+                "gbl_indexYear_im": [2024, 1999, 2001, None, None, None, None],
+                "gbl_dateRange_drsim": ["[1990 TO 2000]"],
+                "gbl_suppressed_b": True,
+                "gbl_georeferenced_b": None,
+                "gbl_wxsIdentifier_i": 12,
+                "dct_references_s": '{"http://schema.org/url": "https://example.com"}',
+                "dct_format_s": None,
+            },
+        )
+
+
+@unittest.skipIf(parquet_export.pa is None, "pyarrow is not installed")
+class ExportCorpusTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.root = Path(self.tmpdir.name) / "ogm"
+        self.output = Path(self.tmpdir.name) / "parquet"
+        self.fixtures = sorted(FIXTURES.glob("*.json"))
+        for index, path in enumerate(self.fixtures):
+            repo = "edu.example" if index % 2 else "gov.example"
+            target = self.root / repo / "metadata" / path.name
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy(path, target)
+        self.write(
+            "gov.example/extra.json",
+            {
+                "id": "extra",
+                "gbl_mdVersion_s": "Aardvark",
+                "gbl_indexYear_im": [1999],
+                "local_note_s": "only here",
+            },
+        )
+        self.write("gov.example/legacy.json", {"geoblacklight_version": "1.0"})
+
+    def write(self, name, data):
+        path = self.root / name
+        path.write_text(json.dumps(data), encoding="utf-8")
+        return path
+
+    def test_round_trip_with_list_columns(self):
+        stats = export_corpus(self.root, self.output)
+        self.assertEqual(stats.written, ["edu.example", "gov.example"])
+        self.assertEqual(stats.records, len(self.fixtures) + 1)
+
+        table = load_corpus(self.output)
+        self.assertEqual(table.num_rows, len(self.fixtures) + 1)
+        rows = {row["id"]: row for row in table.to_pylist()}
+        for path in self.fixtures:
+            record = json.loads(path.read_text(encoding="utf-8"))
+            row = rows[record["id"]]
+            for field, value in record.items():
+                if field.endswith(("_sm", "_im")):
+                    self.assertEqual(row[field], value, (path.name, field))
+        self.assertEqual(rows["extra"]["repo"], "gov.example")
+        self.assertEqual(rows["extra"]["file"], "extra.json")
+        self.assertEqual(rows["extra"]["gbl_indexYear_im"], [1999])
+        # A column only one repository has is null in the others.
+        self.assertEqual(
+            {row["repo"] for row in rows.values() if row["local_note_s"] is None},
+            {"edu.example", "gov.example"},
+        )
+
+    def test_unchanged_repositories_are_not_rewritten(self):
+        export_corpus(self.root, self.output)
+        edu_part = self.output / "repo=edu.example" / "part-0.parquet"
+        edu_written = edu_part.stat().st_mtime_ns
+
+        changed = self.write(
+            "gov.example/extra.json",
+            {"id": "extra-2", "gbl_mdVersion_s": "Aardvark"},
+        )
+        os.utime(changed, ns=(1, 1))
+        stats = export_corpus(self.root, self.output)
+
+        self.assertEqual(
+            (stats.written, stats.unchanged), (["gov.example"], ["edu.example"])
+        )
+        self.assertEqual(edu_part.stat().st_mtime_ns, edu_written)
+        ids = load_corpus(self.output, columns=["id"], repos=["gov.example"])
+        self.assertIn("extra-2", ids["id"].to_pylist())
+        self.assertNotIn("extra", ids["id"].to_pylist())
+
+    def test_unknown_repositories_are_usage_errors(self):
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr), self.assertRaises(SystemExit) as exit:
+            parquet_export.main(
+                [str(self.root), "--output", str(self.output), "--repo", "edu.exampel"]
+            )
+
+        self.assertEqual(exit.exception.code, 2)
+        self.assertIn("unknown --repo edu.exampel", stderr.getvalue())
+        self.assertFalse(self.output.exists())
+        with self.assertRaises(ValueError):
+            export_corpus(self.root, self.output, ["edu.exampel"])
+
+    def test_removed_repositories_are_dropped(self):
+        export_corpus(self.root, self.output)
+        shutil.rmtree(self.root / "edu.example")
+
+        stats = export_corpus(self.root, self.output)
+
+        self.assertEqual(stats.removed, ["edu.example"])
+        self.assertEqual(
+            set(load_corpus(self.output)["repo"].to_pylist()), {"gov.example"}
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
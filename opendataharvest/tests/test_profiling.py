@@ -0,0 +1,61 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+OPENDATAHARVEST_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(OPENDATAHARVEST_ROOT))
+
+from profiling import HarvestProfiler
+
+
+class Steps:
+    @staticmethod
+    def helper(value):
+        return value * 2
+
+    def outer(self, value):
+        return Steps.helper(value) + 1
+
+
+class HarvestProfilerTest(unittest.TestCase):
+    def test_disabled_profiler_leaves_methods_untouched(self):
+        profiler = HarvestProfiler()
+        original = Steps.__dict__["outer"]
+
+        with profiler.record("record-1"):
+            Steps().outer(1)
+
+        self.assertIs(Steps.__dict__["outer"], original)
+        self.assertEqual(profiler.slowest_records(), [])
+        self.assertEqual(dict(profiler.folded), {})
+
+    def test_nested_steps_are_folded_and_records_ranked(self):
+        profiler = HarvestProfiler(top_n=2, use_cprofile=False)
+        profiler.instrument(Steps, ["helper", "outer"])
+        profiler.enable()
+        try:
+            for record_id in ["a", "b", "c"]:
+                with profiler.record(record_id):
+                    self.assertEqual(Steps().outer(2), 5)
+        finally:
+            profiler.disable()
+            profiler.uninstrument()
+
+        self.assertIsInstance(Steps.__dict__["helper"], staticmethod)
+        self.assertEqual(profiler.step_counts["Steps.outer"], 3)
+        self.assertEqual(profiler.step_counts["Steps.helper"], 3)
+        self.assertIn("record;Steps.outer;Steps.helper", profiler.folded)
+        self.assertEqual(len(profiler.slowest_records()), 2)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            written = profiler.write_report(Path(tmpdir), "profile")
+            self.assertEqual([path.suffix for path in written], [".txt", ".folded"])
+            for line in written[1].read_text(encoding="utf-8").splitlines():
+                stack, microseconds = line.rsplit(" ", 1)
+                self.assertTrue(stack.startswith("record"))
+                self.assertGreater(int(microseconds), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
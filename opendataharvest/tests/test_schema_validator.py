@@ -0,0 +1,227 @@
+import contextlib
+import copy
+import io
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import jsonschema
+
+OPENDATAHARVEST_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(OPENDATAHARVEST_ROOT))
+# The shared HTTP client, as `pip install -e ../geometadataedit` would provide.
+sys.path.insert(0, str(OPENDATAHARVEST_ROOT.parent / "geometadataedit"))
+
+from convert import SchemaUpdater
+from schema_validator import CompiledValidator
+from schema_validator import main
+
+FIXTURES = OPENDATAHARVEST_ROOT.parent / "gbl-1_to_aardvark" / "aardvark"
+
+ENVELOPE = r"ENVELOPE\(-?\d+(\.\d+)?(, ?-?\d+(\.\d+)?){3}\)"
+
+# The parts of the Aardvark schema the compiler specializes.
+SCHEMA = {
+    "$schema": "http://json-schema.org/draft-07/schema#",
+    "$id": "https://example.com/geoblacklight-schema-aardvark.json",
+    "title": "OpenGeoMetadata Aardvark",
+    "type": "object",
+    "properties": {
+        "id": {"type": "string", "minLength": 1},
+        "dct_title_s": {"type": "string"},
+        "dct_alternative_sm": {"type": "array", "items": {"type": "string"}},
+        "gbl_resourceClass_sm": {
+            "type": "array",
+            "minItems": 1,
+            "items": {
+                "type": "string",
+                "enum": [
+                    "Collections",
+                    "Datasets",
+                    "Imagery",
+                    "Maps",
+                    "Web services",
+                    "Websites",
+                    "Other",
+                ],
+            },
+        },
+        "dct_accessRights_s": {"type": "string", "enum": ["Public", "Restricted"]},
+        "gbl_mdVersion_s": {"type": "string", "const": "Aardvark"},
+        "gbl_mdModified_dt": {"type": "string", "format": "date-time"},
+        "locn_geometry": {
+            "type": "string",
+            "pattern": f"^({ENVELOPE}|POLYGON|MULTIPOLYGON|POINT|LINESTRING)",
+        },
+        "dcat_bbox": {"type": "string", "pattern": f"^{ENVELOPE}$"},
+        "gbl_indexYear_im": {
+            "type": "array",
+            "items": {"type": "integer", "minimum": 0, "maximum": 9999},
+        },
+        "gbl_suppressed_b": {"type": "boolean"},
+        "gbl_georeferenced_b": {"type": ["boolean", "null"]},
+    },
+    "required": [
+        "id",
+        "dct_title_s",
+        "gbl_resourceClass_sm",
+        "dct_accessRights_s",
+        "gbl_mdVersion_s",
+    ],
+}
+
+
+def jsonschema_error(record):
+    try:
+        jsonschema.validate(record, SCHEMA)
+    except jsonschema.ValidationError as error:
+        return error
+    return None
+
+
+class CompiledValidatorTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.validator = CompiledValidator(SCHEMA)
+        cls.records = [
+            json.loads(path.read_text(encoding="utf-8"))
+            for path in sorted(FIXTURES.glob("*.json"))
+        ]
+
+    def assertMatchesJsonschema(self, record):
+        expected = jsonschema_error(record)
+        error = self.validator.best_error(record)
+        self.assertEqual(self.validator.is_valid(record), expected is None)
+        if expected is None:
+            self.assertIsNone(error)
+        else:
+            self.assertEqual(error.message, expected.message)
+            self.assertEqual(list(error.absolute_path), list(expected.absolute_path))
+
+    def test_schema_is_compiled(self):
+        self.assertTrue(self.validator.compiled)
+        self.assertIn("ENUM", self.validator.source)
+
+    def test_fixture_records_agree_with_jsonschema(self):
+        for record in self.records:
+            with self.subTest(id=record.get("id")):
+                self.assertMatchesJsonschema(record)
+                # Valid fixtures must pass the compiled fast path on its own.
+                if jsonschema_error(record) is None:
+                    self.assertTrue(self.validator.check(record))
+
+    def test_invalid_records_get_the_jsonschema_error(self):
+        valid = {
+            "id": "example",
+            "dct_title_s": "Example",
+            "gbl_resourceClass_sm": ["Datasets"],
+            "dct_accessRights_s": "Public",
+            "gbl_mdVersion_s": "Aardvark",
+            "locn_geometry": "ENVELOPE(-92.9,-86.8,47.1,42.5)",
+            "gbl_indexYear_im": [2024],
+        }
+        self.assertMatchesJsonschema(valid)
+        mutations = [
+            ("id", None),
+            ("id", ""),
+            ("dct_title_s", ["Example"]),
+            ("gbl_resourceClass_sm", ["Dataset"]),
+            ("gbl_resourceClass_sm", []),
+            ("gbl_resourceClass_sm", "Datasets"),
+            ("dct_accessRights_s", "public"),
+            ("gbl_mdVersion_s", "1.0"),
+            ("locn_geometry", "ENVELOPE(-92.9,-86.8,47.1)"),
+            ("dcat_bbox", "ENVELOPE(1, 2, 3, 4) "),
+            ("gbl_indexYear_im", [2024.0]),
+            ("gbl_indexYear_im", [2024.5]),
+            ("gbl_indexYear_im", [True]),
+            ("gbl_indexYear_im", [-1]),
+            ("gbl_suppressed_b", 0),
+            ("gbl_georeferenced_b", None),
+            ("gbl_georeferenced_b", "false"),
+            ("gbl_mdModified_dt", "not a date"),
+        ]
+        for field, value in mutations:
+            with self.subTest(field=field, value=value):
+                record = dict(valid, **{field: value})
+                self.assertMatchesJsonschema(record)
+        for field in SCHEMA["required"]:
+            with self.subTest(missing=field):
+                record = copy.deepcopy(valid)
+                del record[field]
+                self.assertMatchesJsonschema(record)
+        self.assertMatchesJsonschema(["not", "an", "object"])
+
+    def test_validate_raises_like_jsonschema(self):
+        with self.assertRaisesRegex(
+            jsonschema.ValidationError, "'id' is a required property"
+        ):
+            self.validator.validate({})
+
+    def test_validate_many_reports_each_failing_record(self):
+        records = self.records[:3] + [{"id": "broken"}, {"id": 5}]
+        failures = self.validator.validate_many(records)
+
+        expected = [
+            index
+            for index, record in enumerate(records)
+            if jsonschema_error(record) is not None
+        ]
+        self.assertEqual([failure.index for failure in failures], expected)
+        self.assertEqual(failures[-1].id, 5)
+        self.assertEqual(
+            sorted(error.message for error in failures[-2].errors),
+            sorted(
+                error.message
+                for error in jsonschema.Draft7Validator(SCHEMA).iter_errors(records[-2])
+            ),
+        )
+
+    def test_unsupported_keywords_fall_back_to_jsonschema(self):
+        schema = {
+            "$schema": "http://json-schema.org/draft-07/schema#",
+            "properties": {"id": {"anyOf": [{"type": "string"}, {"type": "null"}]}},
+        }
+        validator = CompiledValidator(schema)
+
+        self.assertFalse(validator.compiled)
+        self.assertTrue(validator.is_valid({"id": None}))
+        self.assertFalse(validator.is_valid({"id": 5}))
+
+
+class ConsumersTest(unittest.TestCase):
+    def test_convert_logs_records_failing_the_schema(self):
+        updater = SchemaUpdater(validator=CompiledValidator(SCHEMA))
+        with self.assertLogs(level="WARNING") as captured:
+            updater.check_schema({"id": "legacy", "dct_accessRights_s": "public"})
+        self.assertIn(
+            "Record legacy fails schema validation at <root>: "
+            "'dct_title_s' is a required property",
+            captured.output[0],
+        )
+
+    def test_cli_reports_failures_and_exit_status(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            schema_path = Path(tmpdir) / "schema.json"
+            schema_path.write_text(json.dumps(SCHEMA), encoding="utf-8")
+            record_path = Path(tmpdir) / "records.json"
+            record_path.write_text(
+                json.dumps([{"id": "a"}, {"id": "b", "dct_title_s": 5}]),
+                encoding="utf-8",
+            )
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                status = main(["--schema", str(schema_path), str(record_path)])
+
+        self.assertEqual(status, 1)
+        lines = output.getvalue().splitlines()
+        self.assertIn(
+            f"{record_path}: b: dct_title_s: 5 is not of type 'string'", lines
+        )
+        self.assertEqual(lines[-1], "2 invalid records in 1 files")
+
+
+if __name__ == "__main__":
+    unittest.main()
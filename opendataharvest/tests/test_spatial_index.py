@@ -0,0 +1,147 @@
+import json
+import random
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+OPENDATAHARVEST_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(OPENDATAHARVEST_ROOT))
+# The shared HTTP client, as `pip install -e ../geometadataedit` would provide.
+sys.path.insert(0, str(OPENDATAHARVEST_ROOT.parent / "geometadataedit"))
+
+from DCAT_Harvester import Aardvark
+from DCAT_Harvester import DEFAULTBBOX
+from DCAT_Harvester import Site
+from envelope import envelope_bounds
+from spatial_index import Place
+from spatial_index import PlaceIndex
+from spatial_index import STRtree
+from spatial_index import intersects
+
+
+class STRtreeTest(unittest.TestCase):
+    def test_query_matches_a_linear_scan(self):
+        rng = random.Random(7)
+        places = []
+        for number in range(500):
+            west, south = rng.uniform(-180, 170), rng.uniform(-90, 80)
+            bounds = (
+                west,
+                south,
+                west + rng.uniform(0, 10),
+                south + rng.uniform(0, 10),
+            )
+            places.append(Place(str(number), "test", bounds))
+        tree = STRtree([(place.bounds, place) for place in places], node_capacity=4)
+
+        for _ in range(50):
+            west, south = rng.uniform(-180, 160), rng.uniform(-90, 70)
+            query = (west, south, west + 20, south + 20)
+            expected = {
+                place.name for place in places if intersects(place.bounds, query)
+            }
+            self.assertEqual({place.name for place in tree.query(query)}, expected)
+
+    def test_empty_tree(self):
+        self.assertEqual(STRtree([]).query((0, 0, 1, 1)), [])
+
+
+class PlaceIndexTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.index = PlaceIndex.from_config(DEFAULTBBOX, [], OPENDATAHARVEST_ROOT)
+
+    def test_default_bbox_rows_are_labelled_by_kind(self):
+        downtown = (-87.93, 43.03, -87.90, 43.05)
+        names = {place.name: place.kind for place in self.index.intersecting(downtown)}
+        self.assertEqual(names["Milwaukee County"], "county")
+        self.assertEqual(names["Milwaukee"], "city")
+        self.assertEqual(names["Wisconsin"], "state")
+        self.assertNotIn("Dane County", names)
+
+    def test_spatial_terms_add_local_places_only(self):
+        base = ["Wisconsin", "United States"]
+        downtown = (-87.93, 43.03, -87.90, 43.05)
+        self.assertEqual(
+            self.index.spatial_terms(downtown, base),
+            ["Milwaukee", "Milwaukee County", "Wisconsin", "United States"],
+        )
+        statewide = envelope_bounds("ENVELOPE(-92.8,-86.9,47.0,42.5)")
+        self.assertEqual(self.index.spatial_terms(statewide, base), base)
+
+    def test_query_many_handles_missing_envelopes(self):
+        results = self.index.query_many([(-89.5, 43.0, -89.3, 43.1), None])
+        self.assertIn("Dane County", [place.name for place in results[0]])
+        self.assertEqual(results[1], [])
+
+    def test_boundary_polygons_refine_bbox_hits(self):
+        # An L-shaped place whose bbox covers the empty north-east corner.
+        feature = {
+            "type": "Feature",
+            "properties": {"NAME": "Elbow"},
+            "geometry": {
+                "type": "Polygon",
+                "coordinates": [
+                    [[0, 0], [10, 0], [10, 2], [2, 2], [2, 10], [0, 10], [0, 0]]
+                ],
+            },
+        }
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "boundaries.geojson"
+            path.write_text(
+                json.dumps({"type": "FeatureCollection", "features": [feature]}),
+                encoding="utf-8",
+            )
+            index = PlaceIndex(PlaceIndex.read_boundaries(path, kind="city"))
+
+        self.assertEqual(index.places[0].bounds, (0.0, 0.0, 10.0, 10.0))
+        self.assertEqual(index.intersecting((5, 5, 8, 8)), [])
+        self.assertEqual(len(index.intersecting((1, 5, 8, 8))), 1)
+        self.assertEqual(len(index.intersecting((-1, -1, 11, 11))), 1)
+        self.assertEqual(len(index.intersecting((0.5, 0.5, 1, 1))), 1)
+
+
+class HarvesterSpatialTest(unittest.TestCase):
+    def make_record(self, spatial):
+        website = Site(
+            "Example",
+            {
+                "CreatedBy": "Example Agency",
+                "Spatial": ["Wisconsin", "United States"],
+                "DefaultBbox": "Wisconsin",
+            },
+            {},
+            [],
+            [],
+            [],
+        )
+        dataset = {
+            "title": "Parcels",
+            "identifier": "https://example.com/item.html?id=6ee1cc1bf02b4b1bbe60e0c57513b02a",
+            "description": "",
+            "landingPage": "https://example.com/datasets/parcels",
+            "spatial": spatial,
+            "distribution": [],
+        }
+        return Aardvark(dataset, website)
+
+    def test_record_gets_intersecting_county(self):
+        record = self.make_record("-89.5,43.0,-89.3,43.1")
+        self.assertIn("Dane County", record.dct_spatial_sm)
+        self.assertEqual(record.dct_spatial_sm[-2:], ["Wisconsin", "United States"])
+
+    def test_box_touching_no_known_place_falls_back_to_default(self):
+        # Inside the 1 degree buffer around Wisconsin, but in Minnesota.
+        with self.assertLogs(level="WARNING") as captured:
+            record = self.make_record("-93.8,44.0,-93.5,44.5")
+        self.assertIn("does not intersect any known place", captured.output[0])
+        self.assertEqual(
+            record.locn_geometry,
+            "ENVELOPE(-92.889241,-86.804798,47.080775,42.491966)",
+        )
+        self.assertEqual(record.dct_spatial_sm, ["Wisconsin", "United States"])
+
+
+if __name__ == "__main__":
+    unittest.main()
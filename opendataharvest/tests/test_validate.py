@@ -0,0 +1,147 @@
+import contextlib
+import io
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+OPENDATAHARVEST_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(OPENDATAHARVEST_ROOT))
+# The shared HTTP client, as `pip install -e ../geometadataedit` would provide.
+sys.path.insert(0, str(OPENDATAHARVEST_ROOT.parent / "geometadataedit"))
+
+from validate import main
+from validate import validate_repos
+
+SCHEMA = {
+    "$schema": "http://json-schema.org/draft-07/schema#",
+    "type": "object",
+    "properties": {
+        "id": {"type": "string"},
+        "gbl_resourceClass_sm": {
+            "type": "array",
+            "items": {"type": "string", "enum": ["Datasets", "Maps"]},
+        },
+        "dct_accessRights_s": {"type": "string", "enum": ["Public", "Restricted"]},
+    },
+    "required": ["id", "gbl_resourceClass_sm", "dct_accessRights_s"],
+}
+
+
+def record(record_id, **fields):
+    return {
+        "id": record_id,
+        "gbl_mdVersion_s": "Aardvark",
+        "gbl_resourceClass_sm": ["Datasets"],
+        "dct_accessRights_s": "Public",
+        **fields,
+    }
+
+
+class ValidateReposTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        root = Path(self.tmpdir.name)
+        self.repos = [root / "edu.example", root / "gov.example"]
+        files = {
+            "edu.example/a/valid.json": record("valid"),
+            "edu.example/a/bad-class.json": record(
+                "bad-class", gbl_resourceClass_sm=["Datasets", "Dataset"]
+            ),
+            "edu.example/b/bad-rights.json": record(
+                "bad-rights", dct_accessRights_s="public"
+            ),
+            "gov.example/bad-both.json": record(
+                "bad-both", gbl_resourceClass_sm=["Maps", "Map"], dct_accessRights_s=1
+            ),
+            "gov.example/legacy.json": {"geoblacklight_version": "1.0", "id": "old"},
+            "gov.example/unversioned.json": {
+                key: value
+                for key, value in record("unversioned").items()
+                if key != "gbl_mdVersion_s"
+            },
+            "gov.example/list.json": [record("listed"), record("listed-bad", id=7)],
+            "gov.example/layers.json": {"not": "a record"},
+            # Same id as b/bad-rights.json, and two records without an id.
+            "edu.example/b/copies.json": [
+                record("bad-rights", dct_accessRights_s="public"),
+                {key: value for key, value in record("").items() if key != "id"},
+                {key: value for key, value in record("").items() if key != "id"},
+            ],
+        }
+        for name, data in files.items():
+            path = root / name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(data), encoding="utf-8")
+        (root / "gov.example" / "broken.json").write_text("{", encoding="utf-8")
+
+    def check_report(self, report):
+        self.assertEqual(report["files"], 9)
+        self.assertEqual(report["records"], 10)
+        self.assertEqual(report["skipped"], 1)
+        self.assertEqual(report["valid"], 2)
+        self.assertEqual(report["invalid"], 8)
+        self.assertEqual(len(report["unreadable"]), 1)
+        groups = {
+            (group["path"], group["validator"]): sorted(map(str, group["ids"]))
+            for group in report["groups"]
+        }
+        self.assertEqual(
+            groups,
+            {
+                ("gbl_resourceClass_sm/*", "enum"): ["bad-both", "bad-class"],
+                ("dct_accessRights_s", "enum"): [
+                    "bad-both",
+                    "bad-rights",
+                    "bad-rights",
+                ],
+                ("dct_accessRights_s", "type"): ["bad-both"],
+                ("id", "type"): ["7"],
+                ("<root>", "required"): ["None", "None", "unversioned"],
+            },
+        )
+        for group in report["groups"]:
+            self.assertEqual(group["count"], len(group["ids"]))
+
+    def test_in_process(self):
+        self.check_report(validate_repos(self.repos, SCHEMA, workers=1))
+
+    def test_process_pool_with_small_chunks(self):
+        self.check_report(validate_repos(self.repos, SCHEMA, workers=2, chunk_size=2))
+
+    def test_cli_text_and_json_reports(self):
+        schema_path = Path(self.tmpdir.name) / "schema.json"
+        schema_path.write_text(json.dumps(SCHEMA), encoding="utf-8")
+        report_path = Path(self.tmpdir.name) / "report.json"
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            status = main(
+                [str(repo) for repo in self.repos]
+                + ["--schema", str(schema_path), "--workers", "1"]
+                + ["--json", str(report_path)]
+            )
+
+        self.assertEqual(status, 1)
+        lines = output.getvalue().splitlines()
+        self.assertRegex(
+            lines[0],
+            r"^Validated 10 records in 9 files in [\d.]+s: 2 valid, 8 invalid, "
+            r"1 skipped, 1 unreadable files$",
+        )
+        self.assertIn(
+            "dct_accessRights_s (enum): 3 records, e.g. "
+            "'public' is not one of ['Public', 'Restricted']",
+            lines,
+        )
+        self.assertIn("    bad-both, bad-class", lines)
+        copies = str(self.repos[0] / "b" / "copies.json")
+        self.assertIn(f"    {copies}, {copies}, unversioned", lines)
+        report = json.loads(report_path.read_text(encoding="utf-8"))
+        self.assertEqual(report["invalid"], 8)
+        self.assertEqual(report["schema"], str(schema_path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,294 @@
+"""
+validate.py
+Dependencies: the schema_validator.py dependencies.
+Description: Validates whole OGM repositories against the Aardvark schema.
+JSON files are found with normalize.iter_json_files() and validated in
+chunks by a process pool; each worker compiles the schema once, and the
+schema itself is fetched once (through the http_cache section when it is
+enabled). Failing records are reported grouped by the field path and keyword
+of their errors, with array positions collapsed to "*", and --json writes the
+full report for CI. The exit status is 1 when any record is invalid or any
+file is unreadable.
+
+Usage: python validate.py [REPO ...] [--schema PATH_OR_URL] [--json REPORT]
+"""
+
+import argparse
+import itertools
+import logging
+import os
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import yaml
+
+from http_cache import ResponseCache
+from http_config import shared_client
+from jsonio import dumps, load, loads
+from normalize import iter_json_files
+from schema_validator import CompiledValidator, load_schema
+
+CONFIG_DIR = Path(__file__).resolve().parent
+
+with open(CONFIG_DIR / "config.yaml", "r", encoding="utf-8") as file:
+    config = yaml.safe_load(file)
+
+CHUNK_SIZE = 200
+# Ids listed per error group in the text report; --json lists all of them.
+REPORT_IDS = 10
+
+# Reported for records without gbl_mdVersion_s, as jsonschema words it, so
+# they group with the schema's own required errors.
+MISSING_VERSION = {
+    "path": "<root>",
+    "validator": "required",
+    "message": "'gbl_mdVersion_s' is a required property",
+}
+
+# Compiled once in each worker process by init_worker().
+VALIDATOR: Optional[CompiledValidator] = None
+
+
+def fetch_schema(location: str) -> Dict:
+    """Load the schema, through the on-disk HTTP cache when it is enabled."""
+    cache = ResponseCache.from_config(config.get("http_cache") or {}, CONFIG_DIR)
+    if cache is not None and location.startswith(("http://", "https://")):
+        response = cache.get(shared_client(), location, timeout=10)
+        response.raise_for_status()
+        return loads(response.content)
+    return load_schema(location)
+
+
+def init_worker(schema: Dict) -> None:
+    global VALIDATOR
+    VALIDATOR = CompiledValidator(schema)
+
+
+def error_path(error) -> str:
+    """The field path of an error with array positions collapsed to "*"."""
+    parts = [
+        "*" if isinstance(part, int) else str(part) for part in error.absolute_path
+    ]
+    return "/".join(parts) or "<root>"
+
+
+def validate_files(paths: List[str], schema_version: str) -> Dict:
+    """Validate a chunk of files; runs in a worker process."""
+    result = {"files": 0, "records": 0, "skipped": 0, "unreadable": [], "failures": []}
+    for path in paths:
+        result["files"] += 1
+        try:
+            data = load(path)
+        except (OSError, ValueError) as e:
+            result["unreadable"].append({"file": path, "error": str(e)})
+            continue
+        records = []
+        # Positions in records of the ones that declare no schema version.
+        unversioned = set()
+        for record in data if isinstance(data, list) else [data]:
+            record_schema = (
+                record.get("gbl_mdVersion_s") or record.get("geoblacklight_version")
+                if isinstance(record, dict)
+                else None
+            )
+            if record_schema is None:
+                unversioned.add(len(records))
+            elif record_schema != schema_version:
+                result["skipped"] += 1
+                continue
+            records.append(record)
+        result["records"] += len(records)
+        failures = {
+            failure.index: failure for failure in VALIDATOR.validate_many(records)
+        }
+        for index in sorted(failures.keys() | unversioned):
+            failure = failures.get(index)
+            errors = [
+                {
+                    "path": error_path(error),
+                    "validator": error.validator,
+                    "message": error.message,
+                }
+                for error in (failure.errors if failure else [])
+            ]
+            if index in unversioned and MISSING_VERSION not in errors:
+                errors.insert(0, MISSING_VERSION)
+            record = records[index]
+            result["failures"].append(
+                {
+                    "file": path,
+                    "id": record.get("id") if isinstance(record, dict) else None,
+                    "errors": errors,
+                }
+            )
+    return result
+
+
+def chunked(paths: Iterable[Path], size: int) -> Iterator[List[str]]:
+    paths = iter(paths)
+    while True:
+        chunk = [str(path) for path in itertools.islice(paths, size)]
+        if not chunk:
+            return
+        yield chunk
+
+
+def validate_repos(
+    repos: List[Path],
+    schema: Dict,
+    schema_version: str = "Aardvark",
+    workers: Optional[int] = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> Dict:
+    """Validate every JSON file under repos and return the combined report."""
+    start = time.perf_counter()
+    chunks = chunked(
+        itertools.chain.from_iterable(iter_json_files(repo) for repo in repos),
+        chunk_size,
+    )
+    report = {"files": 0, "records": 0, "skipped": 0, "unreadable": [], "failures": []}
+
+    if workers == 1:
+        init_worker(schema)
+        for chunk in chunks:
+            merge_result(report, validate_files(chunk, schema_version))
+    else:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=init_worker, initargs=(schema,)
+        ) as executor:
+            for result in executor.map(
+                validate_files, chunks, itertools.repeat(schema_version)
+            ):
+                merge_result(report, result)
+
+    report["invalid"] = len(report["failures"])
+    report["valid"] = report["records"] - report["invalid"]
+    report["groups"] = group_failures(report["failures"])
+    report["seconds"] = round(time.perf_counter() - start, 3)
+    return report
+
+
+def merge_result(report: Dict, result: Dict) -> None:
+    for key in ("files", "records", "skipped"):
+        report[key] += result[key]
+    report["unreadable"].extend(result["unreadable"])
+    report["failures"].extend(result["failures"])
+
+
+def group_failures(failures: List[Dict]) -> List[Dict]:
+    """Group failing records by error path and keyword, largest groups first."""
+    # Keyed by failure, one per record, so records sharing an id (or without
+    # one) are each counted and a record's repeated errors only once.
+    groups = defaultdict(lambda: {"records": {}, "example": None})
+    for position, failure in enumerate(failures):
+        for error in failure["errors"]:
+            group = groups[(error["path"], error["validator"])]
+            group["records"].setdefault(position, failure)
+            group["example"] = group["example"] or error["message"]
+    report = []
+    for (path, validator), group in sorted(
+        groups.items(), key=lambda item: (-len(item[1]["records"]), item[0])
+    ):
+        records = sorted(
+            group["records"].values(),
+            key=lambda failure: (str(failure["id"]), failure["file"]),
+        )
+        report.append(
+            {
+                "path": path,
+                "validator": validator,
+                "count": len(records),
+                "example": group["example"],
+                "ids": [failure["id"] for failure in records],
+                "files": [failure["file"] for failure in records],
+            }
+        )
+    return report
+
+
+def format_report(report: Dict) -> str:
+    lines = [
+        f"Validated {report['records']} records in {report['files']} files "
+        f"in {report['seconds']:.1f}s: {report['valid']} valid, "
+        f"{report['invalid']} invalid, {report['skipped']} skipped, "
+        f"{len(report['unreadable'])} unreadable files"
+    ]
+    for group in report["groups"]:
+        ids = ", ".join(
+            file if record_id is None else str(record_id)
+            for record_id, file in zip(group["ids"][:REPORT_IDS], group["files"])
+        )
+        more = group["count"] - REPORT_IDS
+        lines.append(
+            f"{group['path']} ({group['validator']}): {group['count']} records, "
+            f"e.g. {group['example']}"
+        )
+        lines.append(f"    {ids}" + (f" and {more} more" if more > 0 else ""))
+    for unreadable in report["unreadable"]:
+        lines.append(f"Unreadable: {unreadable['file']}: {unreadable['error']}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    arg_parser = argparse.ArgumentParser(
+        description="Validate OGM repositories against the Aardvark schema."
+    )
+    arg_parser.add_argument(
+        "repos",
+        type=Path,
+        nargs="*",
+        default=[
+            (CONFIG_DIR / os.getenv("OGM_PATH", config["paths"]["ogm_path"])).resolve()
+        ],
+        help="Repository directories to validate (default: paths.ogm_path)",
+    )
+    arg_parser.add_argument(
+        "--schema",
+        default=config["CONFIG"]["SCHEMA"],
+        help="Schema path or URL (default: CONFIG.SCHEMA)",
+    )
+    arg_parser.add_argument(
+        "--schema_version",
+        default=os.getenv("SCHEMA_VERSION", "Aardvark"),
+        help="Only validate records matching this schema version",
+    )
+    arg_parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Worker processes (default: one per CPU; 1 validates in-process)",
+    )
+    arg_parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    arg_parser.add_argument(
+        "--json",
+        type=Path,
+        help="Also write the full report as JSON to this file ('-' for stdout)",
+    )
+    args = arg_parser.parse_args(argv)
+
+    report = validate_repos(
+        args.repos,
+        fetch_schema(args.schema),
+        args.schema_version,
+        args.workers,
+        args.chunk_size,
+    )
+    report["schema"] = args.schema
+    report["repos"] = [str(repo) for repo in args.repos]
+
+    if args.json and str(args.json) == "-":
+        print(dumps(report, pretty=True))
+    else:
+        print(format_report(report))
+        if args.json:
+            args.json.write_text(dumps(report, pretty=True) + "\n", encoding="utf-8")
+    return 1 if report["invalid"] or report["unreadable"] else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    sys.exit(main())